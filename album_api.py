@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+合集列表接口（appmsgalbum）的请求参数和响应解析，以及文章链接的规范化
+
+只依赖标准库，下载器和轻量的 check_accounts 共用。
+"""
+
+from urllib.parse import parse_qs, urlencode, urlparse, urlunparse
+
+# 文章链接中标识文章的参数，其余（chksm、scene 等）规范化时去掉
+_URL_KEEP_PARAMS = ('__biz', 'mid', 'idx', 'sn')
+
+# 请求头，模拟微信浏览器
+REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 MicroMessenger/7.0.20.1781(0x6700143B) NetType/WIFI MiniProgramEnv/Windows WindowsWechat/WMPF WindowsWechat(0x63090a13)',
+    'Referer': 'https://mp.weixin.qq.com/',
+    'Accept': 'application/json, text/plain, */*',
+    'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+}
+
+
+def parse_album_url(album_url):
+    """从合集链接中取 (列表接口地址, __biz, album_id)；列表接口与合集链接同源（基准测试时指向本地模拟服务器）"""
+    parsed = urlparse(album_url)
+    params = parse_qs(parsed.query)
+    api_url = f"{parsed.scheme or 'https'}://{parsed.netloc or 'mp.weixin.qq.com'}/mp/appmsgalbum"
+    return api_url, params.get('__biz', [''])[0], params.get('album_id', [''])[0]
+
+
+def album_params(biz, album_id, count=10, reverse=None, begin_msgid=None, begin_itemidx=None):
+    """列表接口的查询参数：reverse=True 时加 is_reverse=1，reverse=False 时不加"""
+    params = {
+        '__biz': biz,
+        'action': 'getalbum',
+        'album_id': album_id,
+        'count': count,
+        'f': 'json',
+    }
+    if reverse is True:
+        params['is_reverse'] = 1
+    if begin_msgid and begin_itemidx:
+        params['begin_msgid'] = begin_msgid
+        params['begin_itemidx'] = begin_itemidx
+    return params
+
+
+def normalize_article_list(article_list):
+    """把微信接口返回的 article_list 兼容性归一为 list。
+
+    微信接口在不同场景下可能返回：
+    - list：常规多篇文章
+    - dict：单篇文章对象（例如 count=1 时），或以索引为 key 的 map（例如 {"0": {...}}）
+    """
+    if not article_list:
+        return []
+
+    if isinstance(article_list, list):
+        return article_list
+
+    if isinstance(article_list, dict):
+        # 1) 单篇文章对象：直接包装成 list
+        if any(k in article_list for k in ('create_time', 'title', 'msgid', 'itemidx', 'url')):
+            return [article_list]
+
+        # 2) 以索引为 key 的 map：按 key 排序后取 value
+        keys = list(article_list.keys())
+        if keys and all(str(k).isdigit() for k in keys):
+            items = list(article_list.items())
+            items.sort(key=lambda kv: int(kv[0]))
+            return [v for _, v in items]
+
+        # 3) 兜底：结构不明，返回空
+        return []
+
+    return []
+
+
+def first_article(data):
+    """从列表接口响应中取第一篇文章"""
+    if not data:
+        return None
+    article_list = normalize_article_list(data.get('getalbum_resp', {}).get('article_list', []))
+    return article_list[0] if article_list else None
+
+
+def parse_time(create_time):
+    """解析时间戳，支持字符串和整数"""
+    if isinstance(create_time, str):
+        create_time = int(create_time)
+    return create_time
+
+
+def normalize_article_url(url):
+    """规范化文章链接：统一 https，去掉 fragment 和 chksm、scene 等不标识文章的参数"""
+    parsed = urlparse(url.strip())
+    if parsed.scheme in ('', 'http') and parsed.netloc:
+        parsed = parsed._replace(scheme='https')
+    params = parse_qs(parsed.query)
+    query = urlencode([(k, params[k][0]) for k in _URL_KEEP_PARAMS if k in params])
+    return urlunparse(parsed._replace(query=query, fragment=''))
+
+
+def article_key_from_url(url):
+    """文章在清单中的主键：链接带 mid/idx 时与合集列表的 (msgid, itemidx) 一致，否则为规范化链接"""
+    params = parse_qs(urlparse(url).query)
+    mid = params.get('mid', [''])[0]
+    if mid:
+        return mid, params.get('idx', [''])[0]
+    return normalize_article_url(url), ''
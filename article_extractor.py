@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+文章正文提取与 Markdown 后处理
+
+- extract_article：用字符串查找定位 js_content（备选 rich_media_content）的起始 div，
+  再只扫描 <div> / </div> 标签按嵌套层级找到正文结束位置，不做任何回溯；
+  正文结束后立即停止，不再处理页面后面的大段脚本。图片地址在同一次 sub 中替换为占位符
+- render_markdown：html2text 之后一次正则扫描完成占位符还原、图片前后补空行和多余空行清理
+"""
+
+import re
+
+# 正文起始 div 的标记：优先 js_content，其次 rich_media_content
+_CONTENT_MARKERS = ('id="js_content"', 'class="rich_media_content')
+
+_DIV_TAG_PATTERN = re.compile(r'<(/?)div\b[^>]*>', re.IGNORECASE)
+
+# 与旧实现一致：取 img 标签里最后一个 *src="..."（通常是 data-src）
+_IMG_SRC_PATTERN = re.compile(r'<img[^>]+src=["\']([^"\']+)["\']')
+
+_PLACEHOLDER_PATTERN = re.compile(r'__IMAGE_PLACEHOLDER_(\d+)__')
+
+# 图片 Markdown、单独出现的占位符、3 个以上的连续换行
+_RENDER_PATTERN = re.compile(r'!\[[^\]\n]*\]\([^)\n]*\)|__IMAGE_PLACEHOLDER_(\d+)__|\n{3,}')
+
+
+def create_html2text():
+    """创建 HTML 转 Markdown 转换器（下载和重新渲染使用同一套配置）；html2text 在这里才导入，只检查更新时不加载"""
+    import html2text
+
+    h2t = html2text.HTML2Text()
+    h2t.ignore_links = False
+    h2t.ignore_images = False
+    h2t.body_width = 0  # 不换行
+    return h2t
+
+
+def image_placeholder(index):
+    return f"__IMAGE_PLACEHOLDER_{index}__"
+
+
+def _find_content_start(html_content):
+    """返回正文起始 div 的 '<' 位置，找不到返回 -1"""
+    for marker in _CONTENT_MARKERS:
+        pos = html_content.find(marker)
+        while pos >= 0:
+            tag_start = html_content.rfind('<', 0, pos)
+            if html_content.startswith('<div', tag_start) and '>' not in html_content[tag_start:pos]:
+                return tag_start
+            pos = html_content.find(marker, pos + len(marker))
+    return -1
+
+
+def extract_article(html_content):
+    """
+    提取文章正文
+
+    Returns:
+        (content_html, img_urls)：图片 src 已替换为 __IMAGE_PLACEHOLDER_n__，
+        img_urls[n] 为对应的原始地址；找不到正文时返回 ("", [])
+    """
+    start = _find_content_start(html_content)
+    if start < 0:
+        return "", []
+
+    body_start = html_content.find('>', start) + 1
+    body_end = len(html_content)  # 正文没有闭合时取到页面末尾
+    depth = 1
+    for match in _DIV_TAG_PATTERN.finditer(html_content, body_start):
+        if match.group(1):
+            depth -= 1
+            if depth == 0:
+                body_end = match.start()
+                break
+        elif not match.group(0).endswith('/>'):
+            depth += 1
+
+    img_urls = []
+
+    def replace_img(match):
+        img_urls.append(match.group(1))
+        return f'<img src="{image_placeholder(len(img_urls) - 1)}"'
+
+    content_html = _IMG_SRC_PATTERN.sub(replace_img, html_content[body_start:body_end])
+    return content_html, img_urls
+
+
+def render_markdown(markdown_content, img_paths):
+    """
+    一次扫描完成 Markdown 后处理：
+    - 占位符还原为 img_paths[n]
+    - 图片与文本之间保证有空行
+    - 3 个以上连续换行压缩为 2 个
+    """
+    text = markdown_content
+    length = len(text)
+    adjacent_images = False
+
+    def restore(match):
+        index = int(match.group(1))
+        return img_paths[index] if index < len(img_paths) else match.group(0)
+
+    def replace(match):
+        nonlocal adjacent_images
+        token = match.group(0)
+        if token[0] == '\n':
+            return '\n\n'
+        if match.group(1) is not None:
+            return restore(match)
+
+        start, end = match.span()
+        before = text[start - 1] if start > 0 else ''
+        after = text[end] if end < length else ''
+        prefix = '\n\n' if before != '\n' and after and not after.isspace() else ''
+        suffix = '' if after == '\n' else '\n\n'
+        if after == '!':
+            adjacent_images = True
+        return prefix + _PLACEHOLDER_PATTERN.sub(restore, token) + suffix
+
+    text = _RENDER_PATTERN.sub(replace, text)
+    if adjacent_images:
+        # 紧挨着的两张图片各自补了空行，合并成一个
+        text = re.sub(r'\n{3,}', '\n\n', text)
+    return text.strip()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+公众号文章清单（SQLite）
+
+每个公众号目录下一个 .manifest.sqlite，以 (msgid, itemidx) 为主键记录已下载文章的
+链接、发布时间、标题、输出文件、内容哈希、图片列表和状态。
+增量下载时直接查清单判断是否已下载，不再扫描目录、也不依赖文件名匹配。
+同时记录规范化图片 URL → 内容哈希 / 本地文件的映射，供 image_store 去重；
+以及列表接口顺序、增量水位线等少量同步状态，和下载失败的文章 / 图片的重试队列。
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+MANIFEST_FILENAME = '.manifest.sqlite'
+
+# 文章状态
+STATUS_DONE = 'done'        # 已下载成功
+STATUS_FAILED = 'failed'    # 正文获取失败（写入了占位文件，已加入重试队列）
+
+# 重试队列中的条目类型
+RETRY_ARTICLE = 'article'   # 主键为 "msgid/itemidx"
+RETRY_IMAGE = 'image'       # 主键为规范化图片 URL
+
+
+def article_key(article):
+    """文章在清单中的主键：(msgid, itemidx)，缺失 msgid 时退化为 URL"""
+    msgid = article.get('msgid')
+    itemidx = article.get('itemidx')
+    if msgid:
+        return str(msgid), str(itemidx or '')
+    return article.get('url', ''), ''
+
+
+def content_hash(text):
+    """计算内容哈希（sha256）"""
+    if isinstance(text, str):
+        text = text.encode('utf-8')
+    return hashlib.sha256(text).hexdigest()
+
+
+class ArticleManifest:
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, MANIFEST_FILENAME)
+        os.makedirs(output_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS articles (
+                msgid TEXT NOT NULL,
+                itemidx TEXT NOT NULL,
+                url TEXT,
+                create_time INTEGER,
+                title TEXT,
+                output_path TEXT,
+                content_hash TEXT,
+                images TEXT,
+                status TEXT,
+                updated_at INTEGER,
+                PRIMARY KEY (msgid, itemidx)
+            )
+        """)
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_articles_create_time ON articles (create_time)')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS images (
+                url TEXT PRIMARY KEY,
+                hash TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS retry_queue (
+                kind TEXT NOT NULL,
+                item TEXT NOT NULL,
+                payload TEXT,
+                attempts INTEGER NOT NULL,
+                next_attempt INTEGER NOT NULL,
+                last_error TEXT,
+                PRIMARY KEY (kind, item)
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS state (
+                name TEXT PRIMARY KEY,
+                value TEXT
+            )
+        """)
+        self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def count(self):
+        with self._lock:
+            return self.conn.execute('SELECT COUNT(*) FROM articles').fetchone()[0]
+
+    def known_keys(self):
+        """所有已记录文章的主键集合"""
+        with self._lock:
+            rows = self.conn.execute('SELECT msgid, itemidx FROM articles').fetchall()
+        return set(rows)
+
+    def get(self, key):
+        """按主键读取一条记录，不存在返回 None"""
+        with self._lock:
+            cursor = self.conn.execute('SELECT * FROM articles WHERE msgid = ? AND itemidx = ?', key)
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            record = dict(zip([c[0] for c in cursor.description], row))
+        record['images'] = json.loads(record['images'] or '[]')
+        return record
+
+    def latest_create_time(self):
+        """清单中最新文章的发布时间戳，清单为空返回 None"""
+        with self._lock:
+            return self.conn.execute('SELECT MAX(create_time) FROM articles').fetchone()[0]
+
+    def recent_create_times(self, limit=60):
+        """最近 limit 篇文章的发布时间戳（从新到旧），用于估计发文规律"""
+        with self._lock:
+            rows = self.conn.execute('SELECT create_time FROM articles WHERE create_time > 0 '
+                                     'ORDER BY create_time DESC LIMIT ?', (limit,)).fetchall()
+        return [row[0] for row in rows]
+
+    def upsert(self, key, url, create_time, title, output_path, content_hash, images, status):
+        """新增或更新一条记录"""
+        msgid, itemidx = key
+        with self._lock:
+            self.conn.execute("""
+                INSERT INTO articles (msgid, itemidx, url, create_time, title, output_path,
+                                      content_hash, images, status, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (msgid, itemidx) DO UPDATE SET
+                    url = excluded.url,
+                    create_time = excluded.create_time,
+                    title = excluded.title,
+                    output_path = excluded.output_path,
+                    content_hash = excluded.content_hash,
+                    images = excluded.images,
+                    status = excluded.status,
+                    updated_at = excluded.updated_at
+            """, (msgid, itemidx, url, int(create_time), title, output_path, content_hash,
+                  json.dumps(images or [], ensure_ascii=False), status, int(time.time())))
+            self.conn.commit()
+
+    def get_image(self, url):
+        """按规范化 URL 读取图片记录，不存在返回 None"""
+        with self._lock:
+            row = self.conn.execute('SELECT hash, path, size FROM images WHERE url = ?', (url,)).fetchone()
+        if row is None:
+            return None
+        return {'hash': row[0], 'path': row[1], 'size': row[2]}
+
+    def get_state(self, name, default=None):
+        """读取一项同步状态（JSON 值）"""
+        with self._lock:
+            row = self.conn.execute('SELECT value FROM state WHERE name = ?', (name,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_state(self, name, value):
+        """保存一项同步状态（JSON 值）"""
+        with self._lock:
+            self.conn.execute('INSERT OR REPLACE INTO state (name, value) VALUES (?, ?)',
+                              (name, json.dumps(value, ensure_ascii=False)))
+            self.conn.commit()
+
+    def image_paths(self):
+        """所有已下载图片的 {规范化 URL: 相对路径}"""
+        with self._lock:
+            rows = self.conn.execute('SELECT url, path FROM images').fetchall()
+        return dict(rows)
+
+    def put_image(self, url, digest, path, size):
+        """记录图片 URL 对应的内容哈希和本地文件"""
+        with self._lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO images (url, hash, path, size) VALUES (?, ?, ?, ?)',
+                (url, digest, path, size))
+            self.conn.commit()
+
+    def replace_image_paths(self, replacements):
+        """图片转码后改指向新文件：replacements 为 {旧相对路径: (新相对路径, 内容哈希, 字节数)}"""
+        with self._lock:
+            self.conn.executemany(
+                'UPDATE images SET path = ?, hash = ?, size = ? WHERE path = ?',
+                [(path, digest, size, old_path) for old_path, (path, digest, size) in replacements.items()])
+            self.conn.commit()
+
+    def failed_articles(self):
+        """状态为 failed（写入了占位文件）的文章记录"""
+        with self._lock:
+            cursor = self.conn.execute('SELECT * FROM articles WHERE status = ?', (STATUS_FAILED,))
+            columns = [c[0] for c in cursor.description]
+            rows = cursor.fetchall()
+        return [dict(zip(columns, row)) for row in rows]
+
+    def schedule_retry(self, kind, item, payload, backoff, error=None):
+        """
+        把下载失败的条目加入重试队列（已在队列中则失败次数加一），backoff(失败次数) 秒后可以重试；
+        payload 为重试需要的信息（JSON 值），返回累计失败次数
+        """
+        with self._lock:
+            row = self.conn.execute('SELECT attempts FROM retry_queue WHERE kind = ? AND item = ?',
+                                    (kind, item)).fetchone()
+            attempts = (row[0] if row else 0) + 1
+            self.conn.execute(
+                'INSERT OR REPLACE INTO retry_queue (kind, item, payload, attempts, next_attempt, last_error) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (kind, item, json.dumps(payload, ensure_ascii=False), attempts, int(time.time() + backoff(attempts)),
+                 error))
+            self.conn.commit()
+        return attempts
+
+    def get_retry(self, kind, item):
+        """读取重试队列中的一个条目，不存在返回 None"""
+        with self._lock:
+            row = self.conn.execute('SELECT payload, attempts, next_attempt, last_error FROM retry_queue '
+                                    'WHERE kind = ? AND item = ?', (kind, item)).fetchone()
+        if row is None:
+            return None
+        return {'kind': kind, 'item': item, 'payload': json.loads(row[0] or 'null'), 'attempts': row[1],
+                'next_attempt': row[2], 'last_error': row[3]}
+
+    def due_retries(self, kind, max_attempts, now=None):
+        """已到重试时间、且失败次数未超过 max_attempts 的条目（最早到期的在前）"""
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self.conn.execute(
+                'SELECT item, payload, attempts, next_attempt, last_error FROM retry_queue '
+                'WHERE kind = ? AND next_attempt <= ? AND attempts < ? ORDER BY next_attempt',
+                (kind, int(now), max_attempts)).fetchall()
+        return [{'kind': kind, 'item': item, 'payload': json.loads(payload or 'null'), 'attempts': attempts,
+                 'next_attempt': next_attempt, 'last_error': last_error}
+                for item, payload, attempts, next_attempt, last_error in rows]
+
+    def remove_retry(self, kind, item):
+        """重试成功后移出队列"""
+        with self._lock:
+            self.conn.execute('DELETE FROM retry_queue WHERE kind = ? AND item = ?', (kind, item))
+            self.conn.commit()
+
+    def retry_summary(self, max_attempts):
+        """重试队列概况 {类型: {'pending'（等待重试）, 'gave_up'（已达最大次数）}}"""
+        with self._lock:
+            rows = self.conn.execute(
+                'SELECT kind, SUM(attempts < ?), SUM(attempts >= ?) FROM retry_queue GROUP BY kind',
+                (max_attempts, max_attempts)).fetchall()
+        return {kind: {'pending': pending, 'gave_up': gave_up} for kind, pending, gave_up in rows}
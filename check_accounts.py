@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+快速检查各公众号是否有新文章（不下载）
+
+用法示例：
+  python3 check_accounts.py                  检查所有公众号
+  python3 check_accounts.py 金渐层            只检查指定公众号
+  python3 check_accounts.py --timeout 3      单次请求的读取超时（秒）
+  python3 download_wechat_articles.py all --check   等价
+
+所有公众号并发检查，每个公众号通常只请求一次列表接口（count=1，按清单里保存的列表顺序；
+没有保存过顺序时两种顺序各请求一次），连接 / 读取超时都很短、不重试、不走 HTTP 缓存。
+只导入 requests、SQLite 清单和合集接口解析，不加载 html2text 等下载用的依赖；
+不存在清单的目录不会创建任何文件。
+
+退出码（方便定时任务判断是否需要运行下载）：
+  0   所有公众号都已是最新
+  10  至少一个公众号有新文章（优先于出错）
+  2   有公众号检查出错，其余已是最新
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+from album_api import REQUEST_HEADERS, album_params, first_article, parse_album_url, parse_time
+from article_manifest import ArticleManifest, MANIFEST_FILENAME, article_key
+from http_transport import get_session
+from rate_limiter import is_throttle_response
+from wechat_accounts import WECHAT_ACCOUNTS
+
+CONNECT_TIMEOUT = 3.05
+DEFAULT_READ_TIMEOUT = 5.0
+
+EXIT_UP_TO_DATE = 0
+EXIT_ERROR = 2
+EXIT_NEW_ARTICLES = 10
+
+# 检查结果
+STATUS_NEW = 'new'
+STATUS_UP_TO_DATE = 'up_to_date'
+STATUS_ERROR = 'error'
+
+_STATUS_LABELS = {
+    STATUS_NEW: '🆕 有新文章',
+    STATUS_UP_TO_DATE: '✅ 已是最新',
+    STATUS_ERROR: '❌ 出错',
+}
+
+_FILENAME_DATE = re.compile(r'^(\d{4}-\d{2}-\d{2})_.+\.md$')
+
+
+class CheckError(Exception):
+    """列表接口返回了无法判断的结果（被限流、结构不对、没有文章）"""
+
+
+def _fetch_latest(session, api_url, biz, album_id, reverse, timeout):
+    """按指定顺序请求一篇文章（不重试），返回该顺序下的第一篇"""
+    response = session.get(api_url, params=album_params(biz, album_id, count=1, reverse=reverse),
+                           headers=REQUEST_HEADERS, timeout=(CONNECT_TIMEOUT, timeout))
+    if is_throttle_response(response):
+        raise CheckError('被限流')
+    response.raise_for_status()
+    return first_article(response.json())
+
+
+def _newer(article1, article2):
+    """两种顺序返回的文章中较新的一篇，以及它是否来自 is_reverse=1"""
+    if article1 and article2:
+        use_reverse = parse_time(article2.get('create_time', 0)) >= parse_time(article1.get('create_time', 0))
+        return (article2 if use_reverse else article1), use_reverse
+    return article1 or article2, None
+
+
+def _local_latest_date(output_dir, manifest):
+    """本地最新文章日期：优先查清单，没有清单记录时取文件名中的日期"""
+    latest_time = manifest.latest_create_time() if manifest is not None else None
+    if latest_time:
+        return datetime.fromtimestamp(latest_time).strftime('%Y-%m-%d')
+    if not os.path.isdir(output_dir):
+        return None
+    dates = [match.group(1) for match in map(_FILENAME_DATE.match, os.listdir(output_dir)) if match]
+    return max(dates) if dates else None
+
+
+def check_account(name, config, session=None, timeout=DEFAULT_READ_TIMEOUT):
+    """
+    检查一个公众号，判断方式与 WeChatAlbumDownloader.check_if_latest_exists 一致
+
+    Returns:
+        {'account', 'status', 'online_date', 'online_title', 'local_date', 'requests', 'elapsed', 'error'}
+    """
+    start_time = time.monotonic()
+    session = session or get_session()
+    result = {'account': name, 'status': STATUS_ERROR, 'online_date': None, 'online_title': None,
+              'local_date': None, 'requests': 0, 'elapsed': 0.0, 'error': None}
+    output_dir = config['output_dir']
+    api_url, biz, album_id = parse_album_url(config['url'])
+
+    def fetch(reverse):
+        result['requests'] += 1
+        return _fetch_latest(session, api_url, biz, album_id, reverse, timeout)
+
+    manifest = None
+    try:
+        if os.path.exists(os.path.join(output_dir, MANIFEST_FILENAME)):
+            manifest = ArticleManifest(output_dir)
+        saved = manifest.get_state('use_reverse') if manifest is not None else None
+        local_latest_time = manifest.latest_create_time() if manifest is not None else None
+
+        if saved is None:
+            latest, use_reverse = _newer(fetch(False), fetch(True))
+        else:
+            latest, use_reverse = fetch(saved), saved
+            if latest and local_latest_time and parse_time(latest.get('create_time', 0)) < local_latest_time:
+                # 保存的顺序返回了比本地还旧的文章，说明接口顺序变了，换另一种顺序再请求一次
+                other = fetch(not saved)
+                latest, use_reverse = _newer(*((other, latest) if saved else (latest, other)))
+        if not latest:
+            raise CheckError('列表接口没有返回文章')
+        if manifest is not None and use_reverse is not None and use_reverse != saved:
+            manifest.set_state('use_reverse', use_reverse)
+
+        create_time = parse_time(latest.get('create_time', 0))
+        result['online_date'] = datetime.fromtimestamp(create_time).strftime('%Y-%m-%d')
+        result['online_title'] = latest.get('title', '无标题')
+        result['local_date'] = _local_latest_date(output_dir, manifest)
+
+        watermark = manifest.get_state('watermark') if manifest is not None else None
+        if not result['local_date']:
+            has_latest = False
+        elif manifest is not None and manifest.get(article_key(latest)) is not None:
+            has_latest = True
+        elif watermark:
+            has_latest = create_time < watermark['create_time']
+        else:
+            has_latest = result['online_date'] <= result['local_date']
+        result['status'] = STATUS_UP_TO_DATE if has_latest else STATUS_NEW
+    except requests.Timeout:
+        result['error'] = '请求超时'
+    except requests.ConnectionError:
+        result['error'] = '连接失败'
+    except Exception as e:
+        result['error'] = str(e) or type(e).__name__
+    finally:
+        if manifest is not None:
+            manifest.close()
+        result['elapsed'] = time.monotonic() - start_time
+    return result
+
+
+def check_accounts(names, timeout=DEFAULT_READ_TIMEOUT):
+    """并发检查多个公众号，按传入顺序返回结果"""
+    session = get_session()
+    with ThreadPoolExecutor(max_workers=max(1, len(names))) as pool:
+        return list(pool.map(lambda name: check_account(name, WECHAT_ACCOUNTS[name], session, timeout), names))
+
+
+def exit_code(results):
+    """检查结果对应的退出码：有新文章 10，否则有出错 2，全部已是最新 0"""
+    statuses = {result['status'] for result in results}
+    if STATUS_NEW in statuses:
+        return EXIT_NEW_ARTICLES
+    if STATUS_ERROR in statuses:
+        return EXIT_ERROR
+    return EXIT_UP_TO_DATE
+
+
+def _display_width(text):
+    """显示宽度（中文、emoji 按两个字符宽度）"""
+    return sum(2 if unicodedata.east_asian_width(ch) in 'WF' else 1 for ch in text)
+
+
+def _pad(text, width):
+    return text + ' ' * max(0, width - _display_width(text))
+
+
+def print_check_table(results, elapsed):
+    """打印每个公众号的检查结果"""
+    name_width = max([_display_width(result['account']) for result in results] + [6])
+    print(f"{_pad('公众号', name_width)}  {_pad('状态', 12)}  {_pad('线上最新', 10)}  {_pad('本地最新', 10)}  耗时")
+    for result in results:
+        line = (f"{_pad(result['account'], name_width)}  {_pad(_STATUS_LABELS[result['status']], 12)}  "
+                f"{_pad(result['online_date'] or '-', 10)}  {_pad(result['local_date'] or '-', 10)}  "
+                f"{result['elapsed']:.2f}s")
+        if result['status'] == STATUS_NEW and result['online_title']:
+            line += f"  {result['online_title']}"
+        elif result['error']:
+            line += f"  {result['error']}"
+        print(line)
+    counts = {status: sum(result['status'] == status for result in results) for status in _STATUS_LABELS}
+    print(f"\n共 {len(results)} 个公众号：有新文章 {counts[STATUS_NEW]}，已是最新 {counts[STATUS_UP_TO_DATE]}，"
+          f"出错 {counts[STATUS_ERROR]}；总耗时 {elapsed:.2f}s")
+
+
+def run_check(names=None, timeout=DEFAULT_READ_TIMEOUT):
+    """检查并打印结果表，返回退出码"""
+    names = names or list(WECHAT_ACCOUNTS)
+    unknown = [name for name in names if name not in WECHAT_ACCOUNTS]
+    if unknown:
+        print(f"未知公众号: {', '.join(unknown)}")
+        print(f"可用的公众号: {', '.join(WECHAT_ACCOUNTS)}")
+        return EXIT_ERROR
+    start_time = time.monotonic()
+    results = check_accounts(names, timeout)
+    print_check_table(results, time.monotonic() - start_time)
+    return exit_code(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并发检查各公众号是否有新文章（不下载），退出码 0 已是最新 / 10 有新文章 / 2 出错")
+    parser.add_argument("accounts", nargs="*", help="公众号名，默认全部（all 同样表示全部）")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_READ_TIMEOUT,
+                        help=f"单次请求的读取超时（秒），默认 {DEFAULT_READ_TIMEOUT:g}")
+    args = parser.parse_args()
+
+    names = [name for name in args.accounts if name != 'all'] or list(WECHAT_ACCOUNTS)
+    unknown = [name for name in names if name not in WECHAT_ACCOUNTS]
+    if unknown:
+        parser.error(f"未知公众号: {', '.join(unknown)}（可用: {', '.join(WECHAT_ACCOUNTS)}）")
+    sys.exit(run_check(names, args.timeout))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import { defineClientConfig, useRoute, withBase } from 'vuepress/client'
+import { useThemeData } from '@vuepress/plugin-theme-data/client'
+import { watch } from 'vue'
+import SearchBox from './components/SearchBox.vue'
+import Layout from './layouts/Layout.vue'
+
+// 侧边栏分片按需加载：config.js 只放每个公众号的年份分组（shard 为分片文件），
+// 打开某个公众号的页面时先加载当前文章所在年份（公众号首页为最新一年）的分片，
+// 页面显示后再在空闲时加载这个公众号的其余年份；其他公众号的分片不会请求。
+
+const shardRequests = new Map()
+
+const fetchShard = (file) => {
+  if (!shardRequests.has(file)) {
+    const request = fetch(withBase(`/sidebar/${file}`))
+      .then((response) => {
+        if (!response.ok) throw new Error(`${response.status} ${file}`)
+        return response.json()
+      })
+      .catch((error) => {
+        // 失败的请求不缓存，下次切换页面时重试
+        shardRequests.delete(file)
+        throw error
+      })
+    shardRequests.set(file, request)
+  }
+  return shardRequests.get(file)
+}
+
+const fillGroup = (group) =>
+  fetchShard(group.shard).then((items) => {
+    if (!group.children.length) group.children = items
+  })
+
+const whenIdle = (callback) =>
+  (window.requestIdleCallback ?? ((fn) => setTimeout(fn, 200)))(callback)
+
+// 当前路径所在的公众号分组和年份，例如 /金渐层/2025-01-02_标题.html → ('/金渐层/', '2025')
+const parseRoute = (routePath) => {
+  const match = decodeURI(routePath).match(/^(\/[^/]+\/)(?:(\d{4})-\d{2}-\d{2}_)?/)
+  return match ? { prefix: match[1], year: match[2] } : null
+}
+
+export default defineClientConfig({
+  enhance({ app }) {
+    // 默认主题在导航栏显示全局组件 SearchBox
+    app.component('SearchBox', SearchBox)
+  },
+  // 默认布局加上文章页底部的相关文章
+  layouts: { Layout },
+  setup() {
+    if (__VUEPRESS_SSR__) return
+    const route = useRoute()
+    const themeData = useThemeData()
+
+    watch(
+      () => route.path,
+      (routePath) => {
+        const current = parseRoute(routePath)
+        const sidebar = current && themeData.value.sidebar?.[current.prefix]
+        if (!Array.isArray(sidebar) || !sidebar.length) return
+        const groups = sidebar[0].children.filter((group) => group.shard)
+        if (!groups.length) return
+
+        const active = groups.find((group) => group.text.startsWith(`${current.year}（`)) ?? groups[0]
+        fillGroup(active)
+          .then(() => whenIdle(() => groups.filter((group) => group !== active).forEach(fillGroup)))
+          .catch((error) => console.warn('侧边栏分片加载失败', error))
+      },
+      { immediate: true },
+    )
+  },
+})
@@ -6,10 +6,24 @@ import { readFileSync } from 'fs'
 
 const __dirname = getDirname(import.meta.url)
 
-// 读取侧边栏配置
-const sidebarConfig = JSON.parse(
-  readFileSync(path.resolve(__dirname, '../../sidebar_config.json'), 'utf-8')
-)
+// 侧边栏按公众号、年份分片（由 generate_sidebar.py 生成），构建时只读 index.json（年份和文章数），
+// 每年的文章列表由 client.js 在浏览器里按当前页面 fetch 对应的分片后填入
+const sidebarIndex = JSON.parse(readFileSync(path.resolve(__dirname, 'public/sidebar/index.json'), 'utf-8'))
+
+// 某个公众号的侧边栏骨架：每年一个可折叠分组，shard 为分片文件（相对 public/sidebar/）
+const loadAccountSidebar = (name) => {
+  const account = sidebarIndex[name]
+  if (!account) return []
+  return [{
+    text: account.text,
+    children: account.years.map((year) => ({
+      text: `${year.year}（${year.count} 篇）`,
+      collapsible: true,
+      shard: year.file,
+      children: [],
+    })),
+  }]
+}
 
 export default defineUserConfig({
   lang: 'zh-CN',
@@ -54,11 +68,11 @@ export default defineUserConfig({
     
     // 侧边栏配置 - 按公众号组织
     sidebar: {
-      '/金渐层/': [sidebarConfig['金渐层']],
-      '/只做主升不做调整/': [sidebarConfig['只做主升不做调整']],
-      '/社会观察从业者/': [sidebarConfig['社会观察从业者']],
-      '/财务自由那些事/': [sidebarConfig['财务自由那些事']],
-      '/美投investing/': [sidebarConfig['美投investing']],
+      '/金渐层/': loadAccountSidebar('金渐层'),
+      '/只做主升不做调整/': loadAccountSidebar('只做主升不做调整'),
+      '/社会观察从业者/': loadAccountSidebar('社会观察从业者'),
+      '/财务自由那些事/': loadAccountSidebar('财务自由那些事'),
+      '/美投investing/': loadAccountSidebar('美投investing'),
       '/': [],
     },
     
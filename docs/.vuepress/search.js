@@ -0,0 +1,137 @@
+import { withBase } from 'vuepress/client'
+
+// 浏览器端查询 search_index.py 生成的静态索引，分词、分片和 BM25 与 search_index.py 保持一致：
+// 先读 meta.json（文档列表、实体别名），再只请求查询词所在的 terms-NN.json 分片。
+
+const BM25_K1 = 1.2
+const BM25_B = 0.75
+
+const CJK_RUN = /[㐀-䶿一-鿿]+/g
+const WORD = /[a-z0-9]+/g
+const ASCII_ALIAS = /^[a-z0-9]+$/
+
+const encoder = new TextEncoder()
+
+// 32 位 FNV-1a（UTF-8 字节），与 search_index.fnv1a 相同
+export const fnv1a = (text) => {
+  let value = 0x811c9dc5
+  for (const byte of encoder.encode(text)) {
+    value = Math.imul(value ^ byte, 0x01000193) >>> 0
+  }
+  return value
+}
+
+// 汉字二元组（单字成段时为单字）+ 英文/数字单词，与 search_index.tokenize 相同
+export const tokenize = (text) => {
+  text = text.toLowerCase()
+  const tokens = []
+  for (const run of text.match(CJK_RUN) ?? []) {
+    const chars = [...run]
+    if (chars.length === 1) tokens.push(run)
+    else for (let i = 0; i < chars.length - 1; i++) tokens.push(chars[i] + chars[i + 1])
+  }
+  tokens.push(...(text.match(WORD) ?? []))
+  return tokens
+}
+
+const escapeRegExp = (text) => text.replace(/[.*+?^${}()|[\]\\]/g, '\\$&')
+
+// 查询串 → 词列表；包含实体名称时改为匹配实体词，与 SearchIndex.query_terms 相同
+export const queryTerms = (query, aliases) => {
+  let text = query.toLowerCase()
+  const terms = []
+  const words = new Set(text.match(WORD) ?? [])
+  const sorted = Object.entries(aliases).sort((a, b) => b[0].length - a[0].length)
+  for (const [alias, entity] of sorted) {
+    const ascii = ASCII_ALIAS.test(alias)
+    if (!(ascii ? words.has(alias) : text.includes(alias))) continue
+    terms.push('$' + entity.toLowerCase())
+    text = ascii
+      ? text.replace(new RegExp(`(?<![\\p{L}\\p{N}_])${escapeRegExp(alias)}(?![\\p{L}\\p{N}_])`, 'gu'), ' ')
+      : text.split(alias).join(' ')
+    words.delete(alias)
+  }
+  terms.push(...tokenize(text))
+  return [...new Set(terms)]
+}
+
+const fetchJson = (file) =>
+  fetch(withBase(`/search/${file}`)).then((response) => {
+    if (!response.ok) throw new Error(`${response.status} ${file}`)
+    return response.json()
+  })
+
+let metaRequest = null
+const shardRequests = new Map()
+
+const loadMeta = () => {
+  metaRequest ??= fetchJson('meta.json').catch((error) => {
+    metaRequest = null
+    throw error
+  })
+  return metaRequest
+}
+
+const loadShard = (shard) => {
+  if (!shardRequests.has(shard)) {
+    const file = `terms-${String(shard).padStart(2, '0')}.json`
+    shardRequests.set(shard, fetchJson(file).catch((error) => {
+      shardRequests.delete(shard)
+      throw error
+    }))
+  }
+  return shardRequests.get(shard)
+}
+
+// [增量, 词频, 增量, 词频, ...] → Map(文档号 → 词频)
+const decodePostings = (encoded = []) => {
+  const postings = new Map()
+  let docId = 0
+  for (let i = 0; i < encoded.length; i += 2) {
+    docId += encoded[i]
+    postings.set(docId, encoded[i + 1])
+  }
+  return postings
+}
+
+/**
+ * BM25 排序；默认要求包含全部查询词，没有结果时退回到包含任一查询词
+ * 返回 [{ link, title, date, account, score }]，同分时新文章在前
+ */
+export const search = async (query, limit = 10) => {
+  const meta = await loadMeta()
+  const terms = queryTerms(query, meta.entities ?? {})
+  if (!terms.length) return []
+
+  const termPostings = await Promise.all(terms.map(async (term) => {
+    const shard = fnv1a(term) % meta.shards
+    return decodePostings((await loadShard(shard))[term])
+  }))
+
+  let candidates = [...termPostings[0].keys()].filter((docId) => termPostings.every((p) => p.has(docId)))
+  if (!candidates.length) {
+    candidates = [...new Set(termPostings.flatMap((p) => [...p.keys()]))]
+  }
+
+  const total = meta.docs.length
+  const avgLength = meta.avg_length || 1
+  const scores = new Map()
+  for (const postings of termPostings) {
+    if (!postings.size) continue
+    const idf = Math.log(1 + (total - postings.size + 0.5) / (postings.size + 0.5))
+    for (const docId of candidates) {
+      const tf = postings.get(docId)
+      if (!tf) continue
+      const norm = BM25_K1 * (1 - BM25_B + BM25_B * meta.docs[docId][4] / avgLength)
+      scores.set(docId, (scores.get(docId) ?? 0) + idf * tf * (BM25_K1 + 1) / (tf + norm))
+    }
+  }
+
+  return [...scores.entries()]
+    .sort((a, b) => b[1] - a[1] || b[0] - a[0])
+    .slice(0, limit)
+    .map(([docId, score]) => {
+      const [link, title, date, account] = meta.docs[docId]
+      return { link, title, date, account, score }
+    })
+}
@@ -9,134 +9,307 @@ import json
 import time
 import os
 import re
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from datetime import datetime
-from urllib.parse import parse_qs, urlparse
+from pathlib import Path
+from urllib.parse import urlparse
 from html import unescape
-import html2text
+
+from album_api import (REQUEST_HEADERS, album_params, article_key_from_url, first_article, normalize_article_list,
+                       parse_album_url, parse_time)
+from article_manifest import (ArticleManifest, article_key, content_hash, STATUS_DONE, STATUS_FAILED, RETRY_ARTICLE,
+                              RETRY_IMAGE)
+from image_store import ImageStore, ImageTooLargeError, canonical_image_url, DEFAULT_MAX_IMAGE_BYTES
+from http_cache import HttpCache, CacheMissError
+from http_transport import get_session, print_transport_stats
+from article_extractor import create_html2text, extract_article, render_markdown
+from html_archive import save_html
+from near_duplicates import (REFERENCE_THRESHOLD, date_order, minhash_signature, normalize_text, reference_html,
+                             shared_index)
+from rate_limiter import RateController, backoff_delay
+from run_metrics import RunMetrics
+from wechat_accounts import WECHAT_ACCOUNTS
+
+# 待下载的文章至少这么多篇时（--force、补全历史）才启用 Markdown 转换进程池
+CONVERT_POOL_MIN_ARTICLES = 8
+
+# 重试队列：第 n 次失败后约 RETRY_BASE_DELAY * 2^(n-1) 秒再试（带抖动，最长 RETRY_MAX_DELAY），
+# 失败 RETRY_MAX_ATTEMPTS 次后不再自动重试
+RETRY_BASE_DELAY = 10 * 60
+RETRY_MAX_DELAY = 3 * 24 * 3600
+RETRY_MAX_ATTEMPTS = 8
+RETRY_WORKERS = 4
+
+# 正文获取失败时写入的占位内容
+PLACEHOLDER_TEXT = "*内容获取失败，请访问原文链接查看*"
+
+# Markdown 头部的标题、发布时间和原文链接（扫描旧的占位文件时使用）
+_HEADER_PATTERN = re.compile(r'^# (.*)\n\n\*\*发布时间\*\*: ([\d\- :]+)\n\n\*\*原文链接\*\*: \[([^\]]+)\]')
+
+# 转换进程池中每个工作进程各自持有一个 html2text 转换器
+_worker_h2t = None
+
+
+def _retry_delay(attempts):
+    """第 attempts 次失败后距下次重试的秒数"""
+    return backoff_delay(attempts - 1, base=RETRY_BASE_DELAY, cap=RETRY_MAX_DELAY)
+
+
+def _retry_item(key):
+    """文章主键 (msgid, itemidx) 在重试队列中的表示"""
+    return '/'.join(key)
+
+
+class ImageFetchError(Exception):
+    """图片重试后仍下载失败（超过大小上限、离线缓存缺失不算）"""
+
+
+def _init_convert_worker():
+    global _worker_h2t
+    _worker_h2t = create_html2text()
+
+
+def _convert_in_worker(content_html, img_paths):
+    """在工作进程中把正文 HTML 转为 Markdown，返回 (Markdown, 耗时)"""
+    start = time.monotonic()
+    markdown_content = render_markdown(_worker_h2t.handle(content_html), img_paths)
+    return markdown_content, time.monotonic() - start
+
+
+class RequestBudget:
+    """
+    多个下载器共享的全局请求预算：只限制总并发数。
+    请求速率由 RateController 按域名分组限制（mp 与 mmbiz 图片 CDN 各自的上限），这里不限速率
+    """
+
+    def __init__(self, max_concurrent=8):
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+
+    @contextmanager
+    def slot(self):
+        """占用一个请求名额，名额用完时等待"""
+        self._semaphore.acquire()
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
 
 class WeChatAlbumDownloader:
-    def __init__(self, album_url, output_dir="articles"):
+    def __init__(self, album_url, output_dir="articles", image_workers=8, per_host_limit=4, budget=None, http_cache=None,
+                 max_image_bytes=DEFAULT_MAX_IMAGE_BYTES, metrics=None, rate_controller=None, session=None,
+                 dedupe=True):
         self.album_url = album_url
         self.output_dir = output_dir
-        self.session = requests.Session()
         
-        # 解析URL参数
-        parsed = urlparse(album_url)
-        params = parse_qs(parsed.query)
-        self.biz = params.get('__biz', [''])[0]
-        self.album_id = params.get('album_id', [''])[0]
+        # 与 docs/ 下已有文章（所有公众号）近似重复的文章只写引用，见 near_duplicates
+        self.dedupe = dedupe
+        self.docs_dir = os.path.dirname(os.path.normpath(output_dir)) or '.'
+        # 本次运行中将被重新下载（覆盖）、还没处理到的已有文件，不能作为引用目标
+        self._redownloading = set()
+        
+        # 所有公众号、所有工具共享的 Session（按域名的连接池、长连接复用、压缩传输），见 http_transport
+        self.session = session if session is not None else get_session()
+        
+        # 全局请求预算（多个公众号并发时共享），为 None 时不限制
+        self.budget = budget
+        
+        # 合集列表和文章 HTML 的磁盘缓存，为 None 时不缓存
+        self.http_cache = http_cache
+        
+        # 分阶段统计（多个公众号并发时共享）
+        self.metrics = metrics if metrics is not None else RunMetrics()
+        
+        # 按域名自适应限速（多个公众号并发时共享），取代固定的翻页、文章间隔
+        self.rate_controller = rate_controller if rate_controller is not None else RateController()
+        
+        # 图片并发下载：线程池大小 + 单个域名的并发上限 + 单张图片大小上限
+        self.image_workers = image_workers
+        self.per_host_limit = per_host_limit
+        self.max_image_bytes = max_image_bytes
+        self._host_semaphores = {}
+        self._host_lock = threading.Lock()
+        
+        # 解析URL参数；列表接口与合集链接同源（基准测试时指向本地模拟服务器）
+        self.api_url, self.biz, self.album_id = parse_album_url(album_url)
         
         # 设置请求头，模拟微信浏览器
-        self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 MicroMessenger/7.0.20.1781(0x6700143B) NetType/WIFI MiniProgramEnv/Windows WindowsWechat/WMPF WindowsWechat(0x63090a13)',
-            'Referer': 'https://mp.weixin.qq.com/',
-            'Accept': 'application/json, text/plain, */*',
-            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-        }
+        self.headers = dict(REQUEST_HEADERS)
         
         # 创建输出目录
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
         
-        # HTML转Markdown转换器
-        self.h2t = html2text.HTML2Text()
-        self.h2t.ignore_links = False
-        self.h2t.ignore_images = False
-        self.h2t.body_width = 0  # 不换行
-
-    def normalize_article_list(self, article_list):
-        """把微信接口返回的 article_list 兼容性归一为 list。
+        # 文章清单（SQLite）和按内容寻址的图片存储，首次使用时打开
+        self._manifest = None
+        self._image_store = None
+        
+        # 本次运行已确定的列表顺序和已探测到的最新文章，避免重复探测
+        self._use_reverse = None
+        self._probed_latest = None
+        self._listing_complete = False
+        
+        # HTML转Markdown转换器（首次转换时创建，只检查更新时不需要）；批量下载时改用进程池，每个工作进程一个转换器
+        self._h2t = None
+        self.convert_workers = os.cpu_count() or 1
 
-        微信接口在不同场景下可能返回：
-        - list：常规多篇文章
-        - dict：单篇文章对象（例如 count=1 时），或以索引为 key 的 map（例如 {"0": {...}}）
+    def _send(self, url, stage='other', **kwargs):
         """
-        if not article_list:
-            return []
-
-        if isinstance(article_list, list):
-            return article_list
+        实际发出 HTTP 请求：先按域名限速，再占用全局并发名额
+        （限速等待、被限流后的暂停期间不占名额，不会挡住其他域名的请求）
+        """
+        kwargs.setdefault('headers', self.headers)
+        waited = self.rate_controller.acquire(url)
+        if waited:
+            self.metrics.observe('rate_wait_seconds', waited, stage)
+        if self.budget is None:
+            return self._timed_get(url, stage, **kwargs)
+        with self.budget.slot():
+            return self._timed_get(url, stage, **kwargs)
 
-        if isinstance(article_list, dict):
-            # 1) 单篇文章对象：直接包装成 list
-            if any(k in article_list for k in ('create_time', 'title', 'msgid', 'itemidx', 'url')):
-                return [article_list]
+    def _timed_get(self, url, stage, **kwargs):
+        """
+        发请求，记录请求数、耗时、字节数和限流/服务端错误（不含等待的时间），
+        并把响应反馈给限速器
+        """
+        start = time.monotonic()
+        try:
+            response = self.session.get(url, **kwargs)
+        except requests.RequestException:
+            self.metrics.incr('request_errors', stage=stage)
+            self.rate_controller.record_error(url)
+            raise
+        finally:
+            self.metrics.incr('requests', stage=stage)
+            self.metrics.observe('request_seconds', time.monotonic() - start, stage)
+        if self.rate_controller.record(url, response, inspect_body=not kwargs.get('stream')):
+            self.metrics.incr('throttled', stage=stage)
+        elif response.status_code >= 500:
+            self.metrics.incr('server_errors', stage=stage)
+        if not kwargs.get('stream'):
+            self.metrics.incr('bytes', len(response.content), stage=stage)
+        return response
 
-            # 2) 以索引为 key 的 map：按 key 排序后取 value
-            keys = list(article_list.keys())
-            if keys and all(str(k).isdigit() for k in keys):
-                items = list(article_list.items())
-                items.sort(key=lambda kv: int(kv[0]))
-                return [v for _, v in items]
+    def _get(self, url, cache_kind=None, validate=None, **kwargs):
+        """所有 HTTP 请求的统一入口，cache_kind 不为空时先查 HTTP 缓存；stage 为统计用的阶段名"""
+        kwargs.setdefault('headers', self.headers)
+        if self.http_cache is None:
+            return self._send(url, **kwargs)
+        if cache_kind:
+            response = self.http_cache.fetch(self._send, url, cache_kind, validate=validate, **kwargs)
+            if getattr(response, 'from_cache', False):
+                self.metrics.incr('cache_hits', stage=kwargs.get('stage', 'other'))
+            return response
+        if self.http_cache.offline:
+            raise CacheMissError(f"离线模式下不发请求: {url}")
+        return self._send(url, **kwargs)
 
-            # 3) 兜底：结构不明，返回空
-            return []
+    def _is_offline(self):
+        return self.http_cache is not None and self.http_cache.offline
 
-        return []
+    def normalize_article_list(self, article_list):
+        """把微信接口返回的 article_list 兼容性归一为 list（见 album_api.normalize_article_list）"""
+        return normalize_article_list(article_list)
 
     def get_album_articles(self, count=10, begin_msgid=None, begin_itemidx=None, reverse=None, retry=3):
         """获取合集文章列表"""
-        api_url = "https://mp.weixin.qq.com/mp/appmsgalbum"
+        params = album_params(self.biz, self.album_id, count, reverse, begin_msgid, begin_itemidx)
         
-        params = {
-            '__biz': self.biz,
-            'action': 'getalbum',
-            'album_id': self.album_id,
-            'count': count,
-            'f': 'json',
-        }
+        with self.metrics.timer('listing'):
+            for attempt in range(retry):
+                try:
+                    response = self._get(self.api_url, cache_kind='album', params=params, timeout=60, stage='listing')
+                    response.raise_for_status()
+                    data = response.json()
+                    return data
+                except CacheMissError as e:
+                    print(f"获取文章列表失败: {e}")
+                    return None
+                except Exception as e:
+                    if attempt < retry - 1:
+                        wait_time = backoff_delay(attempt)  # 指数退避加抖动
+                        print(f"    获取失败 ({attempt+1}/{retry}): {e}，{wait_time:.1f}秒后重试...")
+                        self.metrics.incr('retries', stage='listing')
+                        time.sleep(wait_time)
+                    else:
+                        print(f"获取文章列表失败（已重试{retry}次）: {e}")
+                        self.metrics.incr('failures', stage='listing')
+                        return None
+        return None
+
+    def _first_article(self, data):
+        """从列表接口响应中取第一篇文章"""
+        return first_article(data)
+
+    def probe_ordering(self, default=True):
+        """
+        两种顺序各请求一篇，判断哪种顺序先返回最新文章
         
-        # reverse=True 时加 is_reverse=1，reverse=False 时不加
-        if reverse is True:
-            params['is_reverse'] = 1
+        Returns:
+            (use_reverse, 最新文章)；两次都成功时把选择的顺序保存到清单
+        """
+        article1 = self._first_article(self.get_album_articles(count=1, reverse=False))
+        article2 = self._first_article(self.get_album_articles(count=1, reverse=True))
         
-        if begin_msgid and begin_itemidx:
-            params['begin_msgid'] = begin_msgid
-            params['begin_itemidx'] = begin_itemidx
+        if article1 and article2:
+            time1 = self.parse_time(article1.get('create_time', 0))
+            time2 = self.parse_time(article2.get('create_time', 0))
+            use_reverse = time2 >= time1  # 用返回更新文章的那个
+            self.get_manifest().set_state('use_reverse', use_reverse)
+            latest = article2 if use_reverse else article1
+        else:
+            use_reverse = default
+            latest = article1 or article2
         
-        for attempt in range(retry):
-            try:
-                response = self.session.get(api_url, params=params, headers=self.headers, timeout=60)
-                response.raise_for_status()
-                data = response.json()
-                return data
-            except Exception as e:
-                if attempt < retry - 1:
-                    wait_time = 2 ** attempt  # 指数退避
-                    print(f"    获取失败 ({attempt+1}/{retry}): {e}，{wait_time}秒后重试...")
-                    time.sleep(wait_time)
-                else:
-                    print(f"获取文章列表失败（已重试{retry}次）: {e}")
-                    return None
-        return None
+        self._use_reverse = use_reverse
+        self._probed_latest = latest
+        return use_reverse, latest
+
+    def resolve_ordering(self, default=True):
+        """确定列表顺序：本次已确定的 > 清单中保存的 > 重新探测"""
+        if self._use_reverse is None:
+            saved = self.get_manifest().get_state('use_reverse')
+            if saved is None:
+                self.probe_ordering(default)
+            else:
+                self._use_reverse = saved
+        return self._use_reverse
 
-    def get_all_articles(self, reverse=True, stop_at_date=None):
-        """获取文章列表，可按日期提前终止"""
+    def get_watermark(self):
+        """上次完整同步到的最新文章 {'msgid', 'itemidx', 'create_time'}，没有时返回 None"""
+        return self.get_manifest().get_state('watermark')
+
+    def save_watermark(self, article):
+        """把 article 记为新的水位线（只会前移）"""
+        create_time = self.parse_time(article.get('create_time', 0))
+        watermark = self.get_watermark()
+        if watermark and create_time < watermark['create_time']:
+            return
+        msgid, itemidx = article_key(article)
+        self.get_manifest().set_state('watermark', {'msgid': msgid, 'itemidx': itemidx, 'create_time': create_time})
+
+    def get_all_articles(self, reverse=True, stop_at_date=None, watermark=None):
+        """
+        获取文章列表，可提前终止
+        
+        Args:
+            reverse: 无法确定列表顺序时的默认顺序
+            stop_at_date: 遇到早于等于该日期的文章就停止（没有水位线时的兼容方式）
+            watermark: 遇到水位线文章本身或更早的文章就停止
+        """
         all_articles = []
         begin_msgid = None
         begin_itemidx = None
         page = 1
         stop_flag = False
+        self._listing_complete = False
         
-        # 先探测哪种 reverse 参数能获取到最新文章
-        data1 = self.get_album_articles(count=1, reverse=False)
-        data2 = self.get_album_articles(count=1, reverse=True)
-        
-        raw_list1 = data1.get('getalbum_resp', {}).get('article_list', []) if data1 else []
-        raw_list2 = data2.get('getalbum_resp', {}).get('article_list', []) if data2 else []
-
-        list1 = self.normalize_article_list(raw_list1)
-        list2 = self.normalize_article_list(raw_list2)
-
-        art1 = list1[0] if list1 else None
-        art2 = list2[0] if list2 else None
-        
-        if art1 and art2:
-            t1 = self.parse_time(art1.get('create_time', 0))
-            t2 = self.parse_time(art2.get('create_time', 0))
-            use_reverse = t2 >= t1  # 用返回更新文章的那个
-        else:
-            use_reverse = reverse
+        # 列表顺序：优先用已保存的，只有第一次才需要探测
+        use_reverse = self.resolve_ordering(default=reverse)
+        watermark_key = (watermark['msgid'], watermark['itemidx']) if watermark else None
         
         print("正在获取文章列表...")
         
@@ -153,23 +326,30 @@ class WeChatAlbumDownloader:
             if not article_list:
                 break
             
-            # 按接口返回顺序遍历，遇到早于等于 stop_at_date 的就停止
+            # 按接口返回顺序遍历，遇到水位线（或早于等于 stop_at_date）的就停止
             for article in article_list:
                 create_time = self.parse_time(article.get('create_time', 0))
-                date_str = datetime.fromtimestamp(create_time).strftime('%Y-%m-%d')
-                if stop_at_date and date_str <= stop_at_date:
-                    stop_flag = True
-                    break
+                if watermark:
+                    if article_key(article) == watermark_key or create_time < watermark['create_time']:
+                        stop_flag = True
+                        break
+                elif stop_at_date:
+                    date_str = datetime.fromtimestamp(create_time).strftime('%Y-%m-%d')
+                    if date_str <= stop_at_date:
+                        stop_flag = True
+                        break
                 all_articles.append(article)
             
             print(f"  已获取 {len(all_articles)} 篇文章")
             
             if stop_flag:
+                self._listing_complete = True
                 break
             
             # 检查是否还有更多
             continue_flag = data.get('getalbum_resp', {}).get('continue_flag', 0)
             if continue_flag == 0:
+                self._listing_complete = True
                 break
             
             # 获取下一页的起始位置
@@ -178,7 +358,6 @@ class WeChatAlbumDownloader:
             begin_itemidx = last_article.get('itemidx')
             
             page += 1
-            time.sleep(1)  # 避免请求过快
         
         print(f"\n共获取 {len(all_articles)} 篇文章")
         
@@ -187,120 +366,289 @@ class WeChatAlbumDownloader:
         
         return all_articles
 
-    def download_image(self, img_url, article_date, article_title, img_counter, retry=2):
-        """下载单张图片"""
+    def get_image_store(self):
+        """获取本公众号的图片存储"""
+        if self._image_store is None:
+            self._image_store = ImageStore(self.output_dir, self.get_manifest(), max_bytes=self.max_image_bytes)
+        return self._image_store
+
+    def download_image(self, img_url, retry=2, raise_errors=False):
+        """下载单张图片，已下载过的 URL 直接复用本地文件；失败返回 None（raise_errors 时抛出 ImageFetchError）"""
+        store = self.get_image_store()
+        local_path = store.lookup(img_url)
+        if local_path:
+            self.metrics.incr('reused', stage='images')
+            return local_path
+        
+        # 其他线程正在下载同一张图片时等它完成，下载成功则直接复用
+        with store.download_lock(img_url):
+            local_path = store.lookup(img_url)
+            if local_path:
+                self.metrics.incr('reused', stage='images')
+                return local_path
+            with self.metrics.timer('images'):
+                try:
+                    return self._fetch_image(store, img_url, retry)
+                except ImageFetchError:
+                    if raise_errors:
+                        raise
+                    return None
+
+    def _fetch_image(self, store, img_url, retry):
         for attempt in range(retry):
             try:
-                response = self.session.get(img_url, headers=self.headers, timeout=30)
-                response.raise_for_status()
-                
-                # 创建图片目录
-                img_dir = os.path.join(self.output_dir, 'images')
-                if not os.path.exists(img_dir):
-                    os.makedirs(img_dir)
-                
-                # 确定文件扩展名
-                content_type = response.headers.get('content-type', '')
-                if 'png' in content_type:
-                    ext = '.png'
-                elif 'jpg' in content_type or 'jpeg' in content_type:
-                    ext = '.jpg'
-                elif 'gif' in content_type:
-                    ext = '.gif'
-                elif 'webp' in content_type:
-                    ext = '.webp'
-                else:
-                    # 从URL获取扩展名
-                    url_path = img_url.split('?')[0]
-                    ext = os.path.splitext(url_path)[1] or '.jpg'
-                
-                # 保存图片，包含日期+标题+计数器以避免冲突
-                safe_title = self.sanitize_filename(article_title)[:30]  # 限制长度
-                filename = f"{article_date}_{safe_title}_img{img_counter}{ext}"
-                filepath = os.path.join(img_dir, filename)
+                # 有未完成的临时文件时用 Range 续传
+                headers = self.headers
+                offset = store.resume_offset(img_url)
+                if offset:
+                    headers = dict(self.headers, Range=f"bytes={offset}-")
                 
-                with open(filepath, 'wb') as f:
-                    f.write(response.content)
-                
-                # 返回相对路径
-                return f"images/{filename}"
+                with self._get(img_url, headers=headers, stream=True, timeout=30, stage='images') as response:
+                    if response.status_code == 416:
+                        # 续传位置无效，丢弃临时文件后重新下载
+                        store.discard_partial(img_url)
+                    response.raise_for_status()
+                    
+                    # 流式写入并按内容哈希保存，返回相对路径
+                    rel_path = store.put_stream(img_url, response)
+                    self.metrics.incr('bytes', response.raw.tell(), stage='images')
+                    self.metrics.incr('saved', stage='images')
+                    return rel_path
+            except ImageTooLargeError as e:
+                print(f"      跳过图片 ({img_url}): {e}")
+                self.metrics.incr('too_large', stage='images')
+                return None
+            except CacheMissError:
+                return None
             except Exception as e:
                 if attempt < retry - 1:
-                    time.sleep(1)
+                    self.metrics.incr('retries', stage='images')
+                    time.sleep(backoff_delay(attempt))
                 else:
                     print(f"      下载图片失败 ({img_url}): {e}")
+                    self.metrics.incr('failures', stage='images')
+                    raise ImageFetchError(str(e) or type(e).__name__) from e
         return None
 
+    def _host_semaphore(self, url):
+        """获取某个域名对应的并发信号量"""
+        host = urlparse(url).netloc
+        with self._host_lock:
+            semaphore = self._host_semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.per_host_limit)
+                self._host_semaphores[host] = semaphore
+            return semaphore
+
+    def download_images(self, img_urls, failed=None):
+        """
+        并发下载一篇文章的所有图片，返回与 img_urls 一一对应的本地路径（失败为 None）；
+        failed 不为 None 时记录下载失败的图片 {原始 URL: 错误}
+        """
+        if not img_urls:
+            return []
+        
+        # 同一篇文章里重复出现的图片只下载一次（按规范化 URL 去重，请求仍使用原始 URL）
+        unique_urls = {}
+        for img_url in img_urls:
+            unique_urls.setdefault(canonical_image_url(img_url), img_url)
+        
+        def fetch(img_url):
+            with self._host_semaphore(img_url):
+                try:
+                    return self.download_image(img_url, raise_errors=True)
+                except ImageFetchError as e:
+                    if failed is not None:
+                        failed[img_url] = str(e)
+                    return None
+        
+        workers = max(1, min(self.image_workers, len(unique_urls)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            paths = dict(zip(unique_urls, pool.map(fetch, unique_urls.values())))
+        return [paths[canonical_image_url(img_url)] for img_url in img_urls]
+
+    @staticmethod
+    def _has_article_body(response):
+        """只缓存包含正文的文章页，避免把验证页、错误页缓存下来"""
+        return 'js_content' in response.text or 'rich_media_content' in response.text
+
     def download_article_content(self, url, article_date, article_title, retry=2):
         """下载单篇文章内容，下载图片到本地"""
+        markdown_content, _ = self.fetch_article_content(url, article_date, article_title, retry=retry)
+        return markdown_content
+
+    def fetch_article_content(self, url, article_date, article_title, retry=2):
+        """下载单篇文章内容，返回 (Markdown 正文, 本地图片路径列表)"""
+        content_html, img_paths, images = self.fetch_article_html(url, article_date, article_title, retry=retry)
+        if not content_html:
+            return "", []
+        return self.convert_article(content_html, img_paths), images
+
+    @property
+    def h2t(self):
+        if self._h2t is None:
+            self._h2t = create_html2text()
+        return self._h2t
+
+    def convert_article(self, content_html, img_paths):
+        """在当前线程把正文 HTML 转为 Markdown，一次扫描完成图片还原和空行整理"""
+        with self.metrics.timer('html2text'):
+            return render_markdown(self.h2t.handle(content_html), img_paths)
+
+    def fetch_article_html(self, url, article_date, article_title, retry=2):
+        """
+        下载文章 HTML 和图片，不做 Markdown 转换
+
+        Returns:
+            (正文 HTML（图片为占位符）, 与占位符对应的图片路径, 本地图片路径列表)；没有正文时 HTML 为空
+        """
         for attempt in range(retry):
             try:
-                response = self.session.get(url, headers=self.headers, timeout=60)
-                response.raise_for_status()
-                html_content = response.text
-                
-                # 提取文章正文
-                # 尝试提取 js_content 区域
-                content_match = re.search(r'<div[^>]*id="js_content"[^>]*>(.*?)</div>\s*<script', html_content, re.DOTALL)
-                if content_match:
-                    content_html = content_match.group(1)
-                else:
-                    # 备选：提取整个 rich_media_content
-                    content_match = re.search(r'<div[^>]*class="rich_media_content[^"]*"[^>]*>(.*?)</div>\s*(?:<div|<script)', html_content, re.DOTALL)
-                    if content_match:
-                        content_html = content_match.group(1)
-                    else:
-                        content_html = ""
-                
-                # 转换为Markdown，下载图片到本地
-                if content_html:
-                    # 提取所有图片URL并下载
-                    img_replacements = {}
-                    img_counter = 0
-                    
-                    # 提取所有img标签的src
-                    def replace_img(match):
-                        nonlocal img_counter
-                        img_url = match.group(1)
-                        placeholder = f"__IMAGE_PLACEHOLDER_{img_counter}__"
-                        
-                        # 下载图片
-                        local_path = self.download_image(img_url, article_date, article_title, img_counter)
-                        if local_path:
-                            img_replacements[placeholder] = local_path
-                        else:
-                            # 下载失败则保留原URL
-                            img_replacements[placeholder] = img_url
-                        
-                        img_counter += 1
-                        return f'<img src="{placeholder}"'
-                    
-                    content_html = re.sub(r'<img[^>]+src=["\']([^"\']+)["\']', replace_img, content_html)
-                    
-                    # 转换为Markdown
-                    markdown_content = self.h2t.handle(content_html)
-                    
-                    # 还原图片链接
-                    for placeholder, img_path in img_replacements.items():
-                        markdown_content = markdown_content.replace(placeholder, img_path)
-                    
-                    # 确保图片与文本之间有空行
-                    markdown_content = re.sub(r'(?<!\n)(!\[.*?\]\(.*?\))(?=\S)', r'\n\n\1', markdown_content)
-                    markdown_content = re.sub(r'(!\[.*?\]\(.*?\))(?!\n)', r'\1\n\n', markdown_content)
-                    
-                    # 清理多余空行
-                    markdown_content = re.sub(r'\n{3,}', '\n\n', markdown_content)
-                    
-                    return markdown_content.strip()
-                
-                return ""
+                return self.prepare_article(self.fetch_article_page(url), article_date, article_title)
+            except CacheMissError as e:
+                print(f"    下载文章内容失败: {e}")
+                return "", [], []
             except Exception as e:
                 if attempt < retry - 1:
-                    print(f"    下载失败 ({attempt+1}/{retry})，2秒后重试...")
-                    time.sleep(2)
+                    wait_time = backoff_delay(attempt, base=2.0)
+                    print(f"    下载失败 ({attempt+1}/{retry})，{wait_time:.1f}秒后重试...")
+                    self.metrics.incr('retries', stage='article_html')
+                    time.sleep(wait_time)
                 else:
                     print(f"    下载文章内容失败: {e}")
-        return ""
+                    self.metrics.incr('failures', stage='article_html')
+        return "", [], []
+
+    def fetch_article_page(self, url):
+        """下载文章页面 HTML（经过 HTTP 缓存和限速）"""
+        with self.metrics.timer('article_html'):
+            response = self._get(url, cache_kind='article', validate=self._has_article_body, timeout=60,
+                                 stage='article_html')
+            response.raise_for_status()
+            return response.text
+
+    def prepare_article(self, html_content, article_date, article_title):
+        """
+        从已下载的文章 HTML 提取正文、存档并下载图片，返回值同 fetch_article_html
+        """
+        # 提取文章正文（图片地址已替换为占位符）
+        content_html, img_urls = extract_article(html_content)
+        
+        # 下载图片到本地
+        if content_html:
+            # 与已有文章近似重复时只写引用：不存档、不下载图片
+            reference = self.find_duplicate(content_html, f"{article_date}_{article_title}.md")
+            if reference:
+                return reference, [], []
+            
+            # 存档原始 HTML，之后可离线重新渲染
+            save_html(self.output_dir, f"{article_date}_{article_title}", html_content)
+            
+            # 并发下载所有图片，下载失败则暂时保留原URL，并加入重试队列
+            failed = {}
+            local_paths = self.download_images(img_urls, failed)
+            img_paths = [local_path or img_url for img_url, local_path in zip(img_urls, local_paths)]
+            if failed:
+                self._queue_image_retries(failed, f"{article_date}_{article_title}.md")
+            return content_html, img_paths, list(dict.fromkeys(path for path in local_paths if path))
+        
+        # 没有正文（验证页、已删除等）
+        self.metrics.incr('no_content', stage='article_html')
+        return "", [], []
+
+    def find_duplicate(self, content_html, filename):
+        """
+        正文与 docs/ 下更早的文章近似重复时返回指向该文章的引用正文（HTML），
+        否则把本文的指纹加入索引（同一次运行中后面的转载也能查到）并返回 None
+
+        只引用日期更早的文章，本次运行中还要被重新下载的文件不作为目标，
+        所以两篇重复文章不会互相引用；写成引用的文件从索引中移除，之后不会再被引用。
+        """
+        if not self.dedupe:
+            return None
+        path = Path(self.output_dir, filename).as_posix()
+        self._redownloading.discard(path)
+        signature = minhash_signature(normalize_text(content_html))
+        if signature is None:
+            return None
+        index = shared_index(self.docs_dir)
+        matches = [(ratio, target) for ratio, target in index.query(signature, REFERENCE_THRESHOLD, exclude=path)
+                   if date_order(target) < date_order(path) and target not in self._redownloading]
+        if not matches:
+            index.add(path, signature)
+            return None
+        index.remove(path)
+        ratio, target = matches[0]
+        print(f"    与 {target} 内容重复（相似度 {ratio:.0%}），只保存引用")
+        self.metrics.incr('duplicates', stage='article_html')
+        return reference_html(target, self.output_dir, ratio)
+
+    def _create_convert_pool(self, article_count):
+        """待下载的文章较多且有多个 CPU 时创建 Markdown 转换进程池，否则返回 None（在当前线程转换）"""
+        if self.convert_workers <= 1 or article_count < CONVERT_POOL_MIN_ARTICLES:
+            return None
+        workers = min(self.convert_workers, article_count)
+        print(f"Markdown 转换使用 {workers} 个进程")
+        return ProcessPoolExecutor(max_workers=workers, initializer=_init_convert_worker)
+
+    def _converted_markdown(self, future):
+        """取出进程池的转换结果，失败时返回空内容（写入占位文件）"""
+        try:
+            markdown_content, seconds = future.result()
+        except Exception as e:
+            print(f"    转换 Markdown 失败: {e}")
+            self.metrics.incr('failures', stage='html2text')
+            return ""
+        self.metrics.observe('stage_seconds', seconds, 'html2text')
+        return markdown_content
+
+    def save_article(self, manifest, key, url, create_time, title, filename, images, content, error=None):
+        """
+        写入 Markdown 文件（标题、发布时间、原文链接 + 正文）并记录到清单；
+        没有正文时写入占位内容并加入重试队列，返回是否取得了正文
+        """
+        filepath = os.path.join(self.output_dir, filename)
+        document = (
+            f"# {title}\n\n"
+            f"**发布时间**: {datetime.fromtimestamp(create_time).strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+            f"**原文链接**: [{url}]({url})\n\n"
+            "---\n\n"
+            + (content if content else PLACEHOLDER_TEXT)
+        )
+        
+        with self.metrics.timer('write'):
+            with open(filepath, 'w', encoding='utf-8') as f:
+                f.write(document)
+            
+            manifest.upsert(key, url, create_time, title, filename, content_hash(document), images,
+                            STATUS_DONE if content else STATUS_FAILED)
+        self.metrics.incr('bytes', len(document.encode('utf-8')), stage='write')
+        
+        if content:
+            manifest.remove_retry(RETRY_ARTICLE, _retry_item(key))
+        else:
+            self._queue_article_retry(manifest, key, url, create_time, title, filename, error or '没有取得正文')
+        return bool(content)
+
+    def _queue_article_retry(self, manifest, key, url, create_time, title, filename, error, backoff=_retry_delay):
+        """把正文获取失败的文章加入重试队列"""
+        payload = {'key': list(key), 'url': url, 'create_time': create_time, 'title': title, 'filename': filename}
+        attempts = manifest.schedule_retry(RETRY_ARTICLE, _retry_item(key), payload, backoff, error)
+        self.metrics.incr('queued', stage='retry')
+        if attempts >= RETRY_MAX_ATTEMPTS:
+            print(f"    ⚠️ 已失败 {attempts} 次，不再自动重试: {title}")
+
+    def _queue_image_retries(self, failed, filename):
+        """把下载失败的图片加入重试队列，记录引用它的 Markdown 文件，重试成功后改写为本地路径"""
+        manifest = self.get_manifest()
+        for img_url, error in failed.items():
+            item = canonical_image_url(img_url)
+            queued = manifest.get_retry(RETRY_IMAGE, item)
+            files = queued['payload']['files'] if queued else []
+            if filename not in files:
+                files.append(filename)
+            manifest.schedule_retry(RETRY_IMAGE, item, {'url': img_url, 'files': files}, _retry_delay, error)
+            self.metrics.incr('queued', stage='retry')
 
     def sanitize_filename(self, filename):
         """清理文件名，移除非法字符"""
@@ -317,9 +665,23 @@ class WeChatAlbumDownloader:
 
     def parse_time(self, create_time):
         """解析时间戳，支持字符串和整数"""
-        if isinstance(create_time, str):
-            create_time = int(create_time)
-        return create_time
+        return parse_time(create_time)
+
+    def get_manifest(self):
+        """获取本公众号的文章清单"""
+        if self._manifest is None:
+            self._manifest = ArticleManifest(self.output_dir)
+        return self._manifest
+
+    def get_local_latest_date(self):
+        """本地最新文章日期：优先查清单，清单为空时才扫描目录"""
+        latest_time = self.get_manifest().latest_create_time()
+        if latest_time:
+            return datetime.fromtimestamp(latest_time).strftime('%Y-%m-%d')
+        
+        existing_articles = self.get_existing_articles()
+        local_dates = [info['date'] for info in existing_articles.values()]
+        return max(local_dates) if local_dates else None
 
     def get_existing_articles(self):
         """获取已下载的文章信息"""
@@ -339,43 +701,33 @@ class WeChatAlbumDownloader:
                     }
         return existing
     
+    def reset_run_state(self):
+        """清除本次运行缓存的列表顺序、最新文章和翻页状态（常驻进程每次轮询前调用）"""
+        self._use_reverse = None
+        self._probed_latest = None
+        self._listing_complete = False
+    
     def get_latest_article(self):
-        """获取线上最新的一篇文章，通过两次请求对比时间戳来判断真正最新的"""
+        """获取线上最新的一篇文章：已保存列表顺序时只请求一次，否则两种顺序各探测一次"""
         print("正在获取线上最新文章...")
+        if self._probed_latest is not None:
+            return self._probed_latest
         
-        # 第一次请求（不加 is_reverse）
-        data1 = self.get_album_articles(count=1, reverse=False)
-        article1 = None
-        
-        if data1:
-            article_list = data1.get('getalbum_resp', {}).get('article_list', [])
-            if isinstance(article_list, dict):
-                article1 = article_list if article_list else None
-            elif isinstance(article_list, list):
-                article1 = article_list[0] if article_list else None
-        
-        # 第二次请求（加 is_reverse=1）
-        data2 = self.get_album_articles(count=1, reverse=True)
-        article2 = None
-        
-        if data2:
-            article_list = data2.get('getalbum_resp', {}).get('article_list', [])
-            if isinstance(article_list, dict):
-                article2 = article_list if article_list else None
-            elif isinstance(article_list, list):
-                article2 = article_list[0] if article_list else None
-        
-        # 对比时间戳，返回更新的那个
-        if article1 and article2:
-            time1 = self.parse_time(article1.get('create_time', 0))
-            time2 = self.parse_time(article2.get('create_time', 0))
-            return article1 if time1 >= time2 else article2
-        elif article1:
-            return article1
-        elif article2:
-            return article2
+        manifest = self.get_manifest()
+        saved = manifest.get_state('use_reverse')
+        if saved is None:
+            return self.probe_ordering()[1]
         
-        return None
+        latest = self._first_article(self.get_album_articles(count=1, reverse=saved))
+        local_latest_time = manifest.latest_create_time()
+        if latest and local_latest_time and self.parse_time(latest.get('create_time', 0)) < local_latest_time:
+            # 保存的顺序返回了比本地还旧的文章，说明接口顺序变了，重新探测
+            print("  列表顺序已变化，重新探测")
+            return self.probe_ordering(default=not saved)[1]
+        
+        self._use_reverse = saved
+        self._probed_latest = latest
+        return latest
     
     def check_if_latest_exists(self):
         """检查本地是否已有最新文章，返回 (has_latest, latest_article, local_latest_date)"""
@@ -391,20 +743,24 @@ class WeChatAlbumDownloader:
         
         print(f"  线上最新: {latest_date} - {latest_title}")
         
-        # 获取本地已有的文章
-        existing_articles = self.get_existing_articles()
-        if not existing_articles:
+        # 获取本地最新日期（清单优先，其次从文件名中提取）
+        local_latest_date = self.get_local_latest_date()
+        if not local_latest_date:
             print(f"  本地无文章，需要下载")
             return False, latest_article, None
         
-        # 获取本地最新日期（从文件名中提取）
-        local_dates = [info['date'] for info in existing_articles.values()]
-        local_latest_date = max(local_dates) if local_dates else None
-        
         print(f"  本地最新: {local_latest_date}")
         
-        # 对比日期，如果线上最新日期 > 本地最新日期，则需要下载
-        if local_latest_date and latest_date <= local_latest_date:
+        # 清单里已有这篇文章（或它不比水位线新）则无需下载；没有清单记录时按日期对比
+        watermark = self.get_watermark()
+        if self.get_manifest().get(article_key(latest_article)) is not None:
+            has_latest = True
+        elif watermark:
+            has_latest = create_time < watermark['create_time']
+        else:
+            has_latest = latest_date <= local_latest_date
+        
+        if has_latest:
             print(f"  ✓ 已有最新文章或更新的文章，无需下载")
             return True, latest_article, local_latest_date
         else:
@@ -419,20 +775,30 @@ class WeChatAlbumDownloader:
             reverse: True为倒序（从最新到最旧），False为正序
             download_content: 是否下载文章内容
             skip_existing: 是否跳过已下载的文章
+        
+        Returns:
+            dict: 本次下载统计 {'success', 'fail', 'skip'}
         """
-        # 先读取本地已下载信息，确定最晚日期以便早停
-        existing_articles = self.get_existing_articles() if skip_existing else {}
+        stats = {'success': 0, 'fail': 0, 'skip': 0}
+        # 先读取清单和水位线，以便翻页时提前停止；没有水位线时退回按日期停止
+        manifest = self.get_manifest()
+        known_keys = manifest.known_keys() if skip_existing else set()
+        existing_articles = None  # 目录扫描结果，仅在遇到清单外的文章时才读取
+        watermark = self.get_watermark() if skip_existing else None
         local_latest_date = None
-        if existing_articles:
-            local_dates = [info['date'] for info in existing_articles.values()]
-            local_latest_date = max(local_dates) if local_dates else None
-            print(f"检测到已下载的文章 {len(existing_articles)} 篇，最新日期 {local_latest_date}")
+        if watermark:
+            watermark_date = datetime.fromtimestamp(watermark['create_time']).strftime('%Y-%m-%d')
+            print(f"检测到已下载的文章 {len(known_keys)} 篇（清单），水位线 {watermark_date}")
+        elif skip_existing:
+            local_latest_date = self.get_local_latest_date()
+            if local_latest_date:
+                print(f"检测到已下载的文章 {len(known_keys)} 篇（清单），最新日期 {local_latest_date}")
         
-        articles = self.get_all_articles(reverse=reverse, stop_at_date=local_latest_date if skip_existing else None)
+        articles = self.get_all_articles(reverse=reverse, stop_at_date=local_latest_date, watermark=watermark)
         
         if not articles:
             print("没有获取到文章")
-            return
+            return stats
         
         # 按时间排序
         if reverse:
@@ -446,113 +812,316 @@ class WeChatAlbumDownloader:
         
         if not download_content:
             print("\n跳过文章内容下载")
-            return
+            return stats
         
-        # 下载每篇文章
+        # 下载每篇文章：主线程下载 HTML 和图片，批量下载时 Markdown 转换交给进程池，按原顺序写入
         print("\n开始下载文章内容...")
         success_count = 0
         fail_count = 0
         skip_count = 0
         
-        for idx, article in enumerate(articles, 1):
-            title = article.get('title', '无标题')
-            url = article.get('url', '')
-            create_time = self.parse_time(article.get('create_time', 0))
-            date_str = datetime.fromtimestamp(create_time).strftime('%Y-%m-%d')
-            
-            # 检查是否已存在
-            safe_title = self.sanitize_filename(title)
-            filename = f"{date_str}_{safe_title}.md"
-            
-            if skip_existing and filename in existing_articles:
-                print(f"[{idx}/{len(articles)}] 跳过（已存在）: {title}")
-                skip_count += 1
-                continue
-            
-            print(f"[{idx}/{len(articles)}] 下载: {title}")
-            
-            if not url:
-                print("    跳过：无URL")
-                fail_count += 1
-                continue
-            
-            # 下载内容
-            content = self.download_article_content(url, date_str, safe_title)
-            
-            # 保存文件
-            filepath = os.path.join(self.output_dir, filename)
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(f"# {title}\n\n")
-                f.write(f"**发布时间**: {datetime.fromtimestamp(create_time).strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-                f.write(f"**原文链接**: [{url}]({url})\n\n")
-                f.write("---\n\n")
-                if content:
-                    f.write(content)
+        to_download = sum(1 for article in articles if not (skip_existing and article_key(article) in known_keys))
+        pool = self._create_convert_pool(to_download)
+        converting = deque()  # [(写入参数, Future)]，按提交顺序写入
+        max_converting = self.convert_workers * 2
+        
+        def write_converted(wait=False):
+            nonlocal success_count, fail_count
+            while converting and (wait or converting[0][1].done() or len(converting) > max_converting):
+                info, future = converting.popleft()
+                if self.save_article(manifest, *info, self._converted_markdown(future)):
+                    success_count += 1
+                else:
+                    fail_count += 1
+        
+        try:
+            for idx, article in enumerate(articles, 1):
+                title = article.get('title', '无标题')
+                url = article.get('url', '')
+                create_time = self.parse_time(article.get('create_time', 0))
+                date_str = datetime.fromtimestamp(create_time).strftime('%Y-%m-%d')
+                
+                # 检查是否已存在：先查清单，清单外的再按文件名匹配并补录进清单
+                key = article_key(article)
+                safe_title = self.sanitize_filename(title)
+                filename = f"{date_str}_{safe_title}.md"
+                
+                if skip_existing and key in known_keys:
+                    print(f"[{idx}/{len(articles)}] 跳过（已存在）: {title}")
+                    skip_count += 1
+                    continue
+                
+                if skip_existing:
+                    if existing_articles is None:
+                        existing_articles = self.get_existing_articles()
+                    if filename in existing_articles:
+                        with open(os.path.join(self.output_dir, filename), 'rb') as f:
+                            document = f.read()
+                        # 旧版本写入的占位文件不算已下载，补录为失败并立即加入重试队列
+                        placeholder = PLACEHOLDER_TEXT.encode('utf-8') in document
+                        manifest.upsert(key, url, create_time, title, filename, content_hash(document), [],
+                                        STATUS_FAILED if placeholder else STATUS_DONE)
+                        if placeholder:
+                            self._queue_article_retry(manifest, key, url, create_time, title, filename,
+                                                      '占位文件', backoff=lambda attempts: 0)
+                        print(f"[{idx}/{len(articles)}] 跳过（已存在）: {title}")
+                        skip_count += 1
+                        continue
+                
+                print(f"[{idx}/{len(articles)}] 下载: {title}")
+                
+                if not url:
+                    print("    跳过：无URL")
+                    fail_count += 1
+                    continue
+                
+                # 下载内容
+                content_html, img_paths, images = self.fetch_article_html(url, date_str, safe_title)
+                info = (key, url, create_time, title, filename, images)
+                if content_html and pool:
+                    converting.append((info, pool.submit(_convert_in_worker, content_html, img_paths)))
+                    write_converted()
+                    continue
+                
+                content = self.convert_article(content_html, img_paths) if content_html else ""
+                if self.save_article(manifest, *info, content):
+                    success_count += 1
                 else:
-                    f.write("*内容获取失败，请访问原文链接查看*")
+                    fail_count += 1
             
-            success_count += 1
-            time.sleep(2)  # 避免请求过快被封
+            write_converted(wait=True)
+        finally:
+            if pool:
+                pool.shutdown(cancel_futures=True)
+        
+        # 列表完整翻到了水位线（或末尾），记录新的水位线
+        if self._listing_complete:
+            self.save_watermark(max(articles, key=lambda x: self.parse_time(x.get('create_time', 0))))
         
         print(f"\n下载完成！成功: {success_count}, 失败: {fail_count}, 跳过: {skip_count}")
         print(f"文章保存在: {os.path.abspath(self.output_dir)}")
+        
+        stats.update(success=success_count, fail=fail_count, skip=skip_count)
+        return stats
 
+    def retry_failed(self, workers=RETRY_WORKERS):
+        """
+        并发重试队列中已到期的文章和图片：文章成功后覆盖占位文件，图片成功后把 Markdown 中的原始地址改为本地路径
+        
+        Returns:
+            dict: {'articles': 恢复的文章数, 'images': 恢复的图片数, 'failed': 仍失败的条目数}
+        """
+        stats = {'articles': 0, 'images': 0, 'failed': 0}
+        if self._is_offline():
+            return stats
+        manifest = self.get_manifest()
+        
+        # 旧版本写入、还不在队列中的失败文章，立即加入队列
+        if manifest.get_state('placeholder_scan') is None:
+            self._scan_placeholder_files(manifest)
+        for record in manifest.failed_articles():
+            key = (record['msgid'], record['itemidx'])
+            if manifest.get_retry(RETRY_ARTICLE, _retry_item(key)) is None:
+                self._queue_article_retry(manifest, key, record['url'], record['create_time'], record['title'],
+                                          record['output_path'], '占位文件', backoff=lambda attempts: 0)
+        
+        articles = manifest.due_retries(RETRY_ARTICLE, RETRY_MAX_ATTEMPTS)
+        images = manifest.due_retries(RETRY_IMAGE, RETRY_MAX_ATTEMPTS)
+        if not articles and not images:
+            return stats
+        print(f"重试队列: 文章 {len(articles)} 篇，图片 {len(images)} 张")
+        
+        # 要覆盖的占位文件在处理到之前不能作为引用目标
+        self._redownloading.update(Path(self.output_dir, entry['payload']['filename']).as_posix()
+                                   for entry in articles)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # 文章：并发下载 HTML 和图片，在当前线程转换并写入
+            futures = {}
+            for entry in articles:
+                payload = entry['payload']
+                article_date, article_title = payload['filename'][:-len('.md')].split('_', 1)
+                future = pool.submit(self.fetch_article_html, payload['url'], article_date, article_title, retry=1)
+                futures[future] = entry
+            for future in as_completed(futures):
+                entry = futures[future]
+                payload = entry['payload']
+                content_html, img_paths, images_saved = future.result()
+                content = self.convert_article(content_html, img_paths) if content_html else ""
+                if self.save_article(manifest, tuple(payload['key']), payload['url'], payload['create_time'],
+                                     payload['title'], payload['filename'], images_saved, content):
+                    print(f"  ✓ 重试成功（第 {entry['attempts'] + 1} 次）: {payload['title']}")
+                    stats['articles'] += 1
+                else:
+                    stats['failed'] += 1
+            
+            # 图片：并发下载，成功后改写引用它的 Markdown
+            def fetch(entry):
+                with self._host_semaphore(entry['payload']['url']):
+                    try:
+                        return self.download_image(entry['payload']['url'], retry=1, raise_errors=True), None
+                    except ImageFetchError as e:
+                        return None, str(e)
+            
+            for entry, (rel_path, error) in zip(images, pool.map(fetch, images)):
+                payload = entry['payload']
+                if rel_path:
+                    for filename in payload['files']:
+                        self._replace_in_markdown(filename, payload['url'], rel_path)
+                    manifest.remove_retry(RETRY_IMAGE, entry['item'])
+                    stats['images'] += 1
+                else:
+                    manifest.schedule_retry(RETRY_IMAGE, entry['item'], payload, _retry_delay, error or '下载失败')
+                    stats['failed'] += 1
+        
+        self.metrics.incr('recovered', stats['articles'] + stats['images'], stage='retry')
+        print(f"重试完成：恢复文章 {stats['articles']} 篇、图片 {stats['images']} 张，仍失败 {stats['failed']}")
+        gave_up = sum(entry['gave_up'] or 0 for entry in manifest.retry_summary(RETRY_MAX_ATTEMPTS).values())
+        if gave_up:
+            print(f"  ⚠️ {gave_up} 项已失败 {RETRY_MAX_ATTEMPTS} 次，不再自动重试")
+        return stats
+
+    def _scan_placeholder_files(self, manifest):
+        """扫描一次目录中旧版本写入的占位文件（可能不在清单中），记为失败"""
+        for entry in os.scandir(self.output_dir):
+            if not entry.name.endswith('.md') or not entry.is_file():
+                continue
+            with open(entry.path, 'r', encoding='utf-8') as f:
+                document = f.read()
+            match = _HEADER_PATTERN.match(document)
+            if not match or not document.endswith(PLACEHOLDER_TEXT):
+                continue
+            title, publish_time, url = match.groups()
+            key = article_key_from_url(url)
+            record = manifest.get(key)
+            if record is None or record['status'] != STATUS_FAILED:
+                create_time = int(datetime.strptime(publish_time.strip(), '%Y-%m-%d %H:%M:%S').timestamp())
+                manifest.upsert(key, url, create_time, title, entry.name, content_hash(document), [], STATUS_FAILED)
+        manifest.set_state('placeholder_scan', int(time.time()))
 
-# 公众号配置
-WECHAT_ACCOUNTS = {
-    '金渐层': {
-        'url': 'https://mp.weixin.qq.com/mp/appmsgalbum?__biz=MzYzOTU1NTUzNw==&action=getalbum&album_id=4319967935826853894',
-        'output_dir': 'docs/金渐层'
-    },
-    '只做主升不做调整': {
-        'url': 'https://mp.weixin.qq.com/mp/appmsgalbum?__biz=MzI2NzA2Mzg3MQ==&action=getalbum&album_id=3822716899375087617',
-        'output_dir': 'docs/只做主升不做调整'
-    },
-    '社会观察从业者': {
-        'url': 'https://mp.weixin.qq.com/mp/appmsgalbum?__biz=Mzk4ODc3ODgyOQ==&action=getalbum&album_id=4290005100099387396',
-        'output_dir': 'docs/社会观察从业者'
-    },
-    '财务自由那些事': {
-        'url': 'https://mp.weixin.qq.com/mp/appmsgalbum?action=getalbum&__biz=MzUzNjE3NzQ3Nw==&scene=1&album_id=1319255999014043648&count=3#wechat_redirect',
-        'output_dir': 'docs/财务自由那些事'
-    }
-}
-
-
-def download_account(account_name, skip_existing=False, check_only=False):
-    """下载指定公众号的文章"""
+    def _replace_in_markdown(self, filename, old, new):
+        """把 Markdown 文件中的 old 替换为 new（原子写入），文件不存在或不含 old 时不做任何事"""
+        path = os.path.join(self.output_dir, filename)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                document = f.read()
+        except OSError:
+            return
+        if old not in document:
+            return
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(document.replace(old, new))
+        os.replace(tmp_path, path)
+
+
+def download_account(account_name, skip_existing=False, check_only=False, budget=None, http_cache=None, metrics=None,
+                     rate_controller=None, dedupe=True):
+    """下载指定公众号的文章，返回该公众号的处理结果"""
+    result = {'account': account_name, 'status': '', 'success': 0, 'fail': 0, 'skip': 0, 'retried': 0, 'elapsed': 0.0}
     if account_name not in WECHAT_ACCOUNTS:
         print(f"未知公众号: {account_name}")
         print(f"可用的公众号: {', '.join(WECHAT_ACCOUNTS.keys())}")
-        return
+        result['status'] = '未知公众号'
+        return result
     
+    start_time = time.monotonic()
     config = WECHAT_ACCOUNTS[account_name]
     print(f"\n{'='*50}")
     print(f"处理: {account_name}")
     print(f"{'='*50}\n")
     
-    downloader = WeChatAlbumDownloader(config['url'], output_dir=config['output_dir'])
+    # --force 会覆盖已有文章，这时不做重复检测（被覆盖的文章可能正是其他文章的引用目标）
+    downloader = WeChatAlbumDownloader(config['url'], output_dir=config['output_dir'], budget=budget, http_cache=http_cache,
+                                       metrics=metrics, rate_controller=rate_controller,
+                                       dedupe=dedupe and skip_existing)
     
     # 检查是否已有最新文章
     if check_only or skip_existing:
         has_latest, latest_article, local_latest = downloader.check_if_latest_exists()
-        if has_latest and check_only:
+        if check_only:
+            if has_latest:
+                result['status'] = '已是最新'
+            elif latest_article:
+                result['status'] = '有新文章'
+            else:
+                result['status'] = '检查失败'
+        if has_latest:
+            # 已是最新：不再翻页，只处理重试队列
             print()
-            return
+            if not check_only:
+                result['status'] = '已是最新'
+                retry_stats = downloader.retry_failed()
+                result['retried'] = retry_stats['articles'] + retry_stats['images']
+            result['elapsed'] = time.monotonic() - start_time
+            return result
     
     if skip_existing:
         print("模式: 只下载新文章（跳过已存在的）")
     
     print()
-    downloader.download_all(reverse=True, download_content=True, skip_existing=skip_existing)
+    stats = downloader.download_all(reverse=True, download_content=True, skip_existing=skip_existing)
+    result.update(stats)
+    if not check_only:
+        result['status'] = '有失败' if stats['fail'] else '完成'
+        retry_stats = downloader.retry_failed()
+        result['retried'] = retry_stats['articles'] + retry_stats['images']
+    result['elapsed'] = time.monotonic() - start_time
+    return result
 
 
-def download_all_accounts(skip_existing=False, check_only=False):
-    """下载所有公众号的文章"""
-    for account_name in WECHAT_ACCOUNTS.keys():
-        download_account(account_name, skip_existing=skip_existing, check_only=check_only)
-        print("\n" + "="*50 + "\n")
+def print_sync_summary(results):
+    """打印每个公众号的同步结果汇总"""
+    print("\n" + "="*50)
+    print("同步汇总")
+    print("="*50)
+    for result in results:
+        retried = f", 重试恢复 {result['retried']}" if result.get('retried') else ""
+        print(f"  {result['account']}: {result['status']} | 成功 {result['success']}, "
+              f"失败 {result['fail']}, 跳过 {result['skip']}{retried} | 耗时 {result['elapsed']:.1f}s")
+    total = sum(result['success'] for result in results)
+    print(f"  总计新下载: {total} 篇")
+
+
+def download_all_accounts(skip_existing=False, check_only=False, jobs=4, max_requests=8, http_cache=None,
+                          metrics=None, rate_controller=None, dedupe=True):
+    """并发下载所有公众号的文章，所有公众号共享同一个全局请求预算、按域名的限速器、HTTP 缓存和统计
+    
+    Args:
+        jobs: 同时处理的公众号数量，1 为逐个处理
+        max_requests: 全局同时进行的请求数上限（速率由 rate_controller 按域名限制）
+    """
+    budget = RequestBudget(max_concurrent=max_requests)
+    if rate_controller is None:
+        rate_controller = RateController()
+    account_names = list(WECHAT_ACCOUNTS.keys())
+    results = {}
+    
+    if jobs <= 1:
+        for account_name in account_names:
+            results[account_name] = download_account(account_name, skip_existing=skip_existing, check_only=check_only,
+                                                     budget=budget, http_cache=http_cache, metrics=metrics,
+                                                     rate_controller=rate_controller, dedupe=dedupe)
+            print("\n" + "="*50 + "\n")
+    else:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            futures = {
+                pool.submit(download_account, account_name, skip_existing, check_only, budget, http_cache,
+                            metrics, rate_controller, dedupe): account_name
+                for account_name in account_names
+            }
+            for future in as_completed(futures):
+                account_name = futures[future]
+                try:
+                    results[account_name] = future.result()
+                except Exception as e:
+                    print(f"处理 {account_name} 失败: {e}")
+                    results[account_name] = {'account': account_name, 'status': f'出错: {e}',
+                                             'success': 0, 'fail': 0, 'skip': 0, 'retried': 0, 'elapsed': 0.0}
+    
+    # 按配置顺序输出汇总
+    ordered = [results[name] for name in account_names if name in results]
+    print_sync_summary(ordered)
+    return ordered
 
 
 def main():
@@ -562,20 +1131,89 @@ def main():
     skip_existing = True
     account_name = None
     check_only = False
+    jobs = 4
+    use_cache = True
+    offline = False
+    report_path = None
+    prometheus_path = None
+    optimize = False
+    dedupe = True
+    max_rate = None
+    max_image_rate = None
     
-    for arg in sys.argv[1:]:
+    args = iter(sys.argv[1:])
+    for arg in args:
         if arg == '--force' or arg == '-f':
             skip_existing = False
         elif arg == '--check' or arg == '-c':
             check_only = True
+        elif arg == '--jobs' or arg == '-j':
+            jobs = int(next(args, jobs))
+        elif arg.startswith('--jobs='):
+            jobs = int(arg.split('=', 1)[1])
+        elif arg == '--no-cache':
+            use_cache = False
+        elif arg == '--offline':
+            offline = True
+        elif arg == '--report':
+            report_path = next(args, None)
+        elif arg.startswith('--report='):
+            report_path = arg.split('=', 1)[1]
+        elif arg == '--prometheus':
+            prometheus_path = next(args, None)
+        elif arg.startswith('--prometheus='):
+            prometheus_path = arg.split('=', 1)[1]
+        elif arg == '--max-rate':
+            max_rate = float(next(args, 0)) or None
+        elif arg.startswith('--max-rate='):
+            max_rate = float(arg.split('=', 1)[1]) or None
+        elif arg == '--max-image-rate':
+            max_image_rate = float(next(args, 0)) or None
+        elif arg.startswith('--max-image-rate='):
+            max_image_rate = float(arg.split('=', 1)[1]) or None
+        elif arg == '--optimize-images':
+            optimize = True
+        elif arg == '--no-dedupe':
+            dedupe = False
         else:
             account_name = arg
     
+    if account_name and check_only and not offline:
+        # 只检查：并发、短超时、不加载下载用的依赖，见 check_accounts
+        from check_accounts import run_check
+        sys.exit(run_check(None if account_name == 'all' else [account_name]))
+    
     if account_name:
+        http_cache = HttpCache(offline=offline) if use_cache or offline else None
+        metrics = RunMetrics()
+        rate_controller = RateController(max_rate=max_rate, max_image_rate=max_image_rate)
         if account_name == 'all':
-            download_all_accounts(skip_existing=skip_existing, check_only=check_only)
+            results = download_all_accounts(skip_existing=skip_existing, check_only=check_only, jobs=jobs,
+                                            http_cache=http_cache, metrics=metrics, rate_controller=rate_controller,
+                                            dedupe=dedupe)
         else:
-            download_account(account_name, skip_existing=skip_existing, check_only=check_only)
+            results = [download_account(account_name, skip_existing=skip_existing, check_only=check_only,
+                                        http_cache=http_cache, metrics=metrics, rate_controller=rate_controller,
+                                        dedupe=dedupe)]
+        
+        metrics.print_summary()
+        print_transport_stats()
+        rates = rate_controller.rates()
+        if rates:
+            print("结束时的请求速率: " + "，".join(f"{group} {rate:.2f}/s" for group, rate in rates.items()))
+        if report_path:
+            metrics.write_report(report_path, results)
+            print(f"运行报告已保存: {report_path}")
+        if prometheus_path:
+            metrics.write_prometheus(prometheus_path, results)
+            print(f"Prometheus 指标已保存: {prometheus_path}")
+        
+        # 可选：对有新文章的公众号转码图片（需要 Pillow）
+        if optimize and not check_only:
+            from optimize_images import optimize as optimize_images, print_report
+            output_dirs = [WECHAT_ACCOUNTS[r['account']]['output_dir'] for r in results if r.get('success')]
+            if output_dirs:
+                print_report(optimize_images(output_dirs))
     else:
         print("用法:")
         print(f"  检查所有:     python3 download_wechat_articles.py all --check")
@@ -584,8 +1222,17 @@ def main():
         print(f"  下载指定:     python3 download_wechat_articles.py <公众号名>")
         print(f"  强制重新下载: python3 download_wechat_articles.py <公众号名> --force")
         print(f"\n参数说明:")
-        print(f"  --check, -c: 只检查是否有新文章，不下载")
+        print(f"  --check, -c: 只检查是否有新文章，不下载（所有公众号并发检查，退出码 0 已是最新 / 10 有新文章 / 2 出错）")
         print(f"  --force, -f: 强制重新下载，覆盖已有文件")
+        print(f"  --jobs, -j N: all 模式下同时处理的公众号数量（默认 4，1 为逐个处理）")
+        print(f"  --no-cache: 不使用 HTTP 缓存（默认缓存合集列表和文章 HTML 到 .http_cache/）")
+        print(f"  --offline: 离线回放，只读 HTTP 缓存，不访问微信")
+        print(f"  --report PATH: 保存 JSON 运行报告（各阶段请求数、重试、字节数、耗时分布）")
+        print(f"  --prometheus PATH: 同时写出 Prometheus 文本格式指标（供 node_exporter textfile collector 读取）")
+        print(f"  --max-rate R: mp.weixin.qq.com 每秒请求数上限（默认 4，按响应自适应，遇到限流自动降速）")
+        print(f"  --max-image-rate R: 图片 CDN 每秒请求数上限（默认 32）")
+        print(f"  --optimize-images: 下载后把新图片转码为 WebP 并改写 Markdown（需要 Pillow，见 optimize_images.py）")
+        print(f"  --no-dedupe: 不检测重复文章（默认与 docs/ 下更早的文章近似重复的只写引用，见 near_duplicates.py；--force 时不检测）")
         print(f"\n默认行为: 检查线上最新文章，若本地已有则跳过，否则下载")
         print(f"\n可用的公众号:")
         for name in WECHAT_ACCOUNTS.keys():
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+从文章中批量提取操作记录，增量维护 data_extracted.csv
+
+用法示例：
+  python3 extract_trades.py                  只处理新增或修改过的文章（默认只看 金渐层）
+  python3 extract_trades.py --account all    所有公众号
+  python3 extract_trades.py --full --jobs 8  忽略缓存全部重新提取
+  python3 extract_trades.py --dry-run        只输出统计，不写 data_extracted.csv
+
+规则提取（不调用 AI）：
+  - 标的：data.csv 已有的 symbol（如 "英伟达 NVIDIA" 中的每个名称）加上 EXTRA_SYMBOLS / EXTRA_ALIASES；
+    一句话没写标的时沿用同一段落里最近提到的标的
+  - 操作：按 ACTION_RULES 匹配关键词（清仓、减仓、加仓、建仓……），带"设置/计划/预设"，或操作词前面有
+    "会/想/考虑/以内/左右/后续/如果"等打算、条件（如"100以内会加仓"）的记为计划；已"触发"或"减了"这类写法不算计划；
+    关键词紧跟在"没/没有/未/不/别"后面（中间可以隔着"再、能、成功、考虑、打算、机会"等词）时是否定，
+    如"没加仓"、"没清仓"、"没能成功加仓"、"不会考虑加仓"，不算操作；"分别加仓"、"不得不减仓"不是否定
+  - 价格：操作所在分句中的数字（支持 225 / 232、1720-1745 这种写法），排除百分比、日期、成本价、收盘价等
+每篇文章的提取结果按内容哈希缓存在 .data_extract_cache.json，文件没变化时连内容都不读。
+data.csv 是手工整理的记录，本脚本只读取它（标的名称、去重），不写入；
+提取结果写入 data_extracted.csv（列相同，按日期排序），每次按当前规则整体重新生成，与手工行重复的不写。
+两个文件分开，规则的误判不会混进手工整理的数据，规则修正后错误的提取行会被去掉。
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+DOCS_DIR = 'docs'
+DATA_CSV = 'data.csv'
+EXTRACTED_CSV = 'data_extracted.csv'
+CACHE_FILE = '.data_extract_cache.json'
+DEFAULT_ACCOUNTS = ('金渐层',)
+
+CSV_FIELDS = ('symbol', 'article_date', 'article_title', 'action', 'price_info', 'reason_summary')
+# 旧版本在 data.csv 中用 source 列区分手工行和提取行，读取时去掉提取行
+_SOURCE_EXTRACTED = 'extracted'
+
+# 规则版本，修改提取规则后加一，缓存会整体失效
+RULES_VERSION = 3
+
+# data.csv 里还没有、但文章中经常操作的标的
+EXTRA_SYMBOLS = (
+    '博通 Broadcom', '伯克希尔 Berkshire', '诺和诺德 Novo', '强生 J&J', '亚马逊 Amazon',
+    '奈飞 Netflix', '可口可乐 Coca-Cola', '阿里巴巴 Alibaba',
+)
+
+# 简称 → data.csv 中的完整 symbol
+EXTRA_ALIASES = {'茅台': '贵州茅台', '腾讯': '腾讯控股', '沪铜': '沪铜期货', '达子': '英伟达 NVIDIA'}
+
+# 名称中不能单独代表某个标的的词
+ALIAS_STOPWORDS = {'ETF', '等宽基'}
+
+# (操作, 关键词)，按顺序取第一个匹配
+ACTION_RULES = (
+    ('清仓', ('清仓', '清了', '全部卖出', '卖光')),
+    ('做空', ('做空',)),
+    ('止盈', ('止盈',)),
+    ('止损', ('止损',)),
+    ('减仓', ('减仓', '减了', '卖出', '卖掉', '卖了', 'T掉', '落袋')),
+    ('加仓', ('加仓', '补仓', '加了', '接回', '接了', '捞', '捡筹', '抄底')),
+    ('建仓', ('建仓', '买入', '买了', '开仓')),
+)
+_PLAN_WORDS = ('设置', '计划', '预设', '挂单', '准备', '打算')
+# 操作词前面有这些词时是打算、条件（"100以内会加仓"、"后续还会在360再减仓"），记为计划；"机会"不算
+_INTENT = re.compile(r'(?<!机)会|想|考虑|以内|以下|左右|后续|如果|要是')
+# 操作词前面是否定词（可以隔着几个助动词、副词）时不算操作；"分别"、"不得不"不是否定
+_NEGATED = re.compile(r'(?<!分)(?<!不得)(?:没有|没|未|不|别)'
+                      r'(?:再|能|会|敢|想|要|必|舍得|继续|成功|考虑|打算|机会|跌到|在\d+(?:\.\d+)?)*$')
+
+_SENTENCE_SPLIT = re.compile(r'[。！？；;!?\n]+')
+_CLAUSE_SPLIT = re.compile(r'[，,]')
+_PRICE = re.compile(r'(?<![\d.])(\d+(?:\.\d+)?)((?:\s*(?:[-–~～/／、]|和|或)\s*\d+(?:\.\d+)?)*)\s*(万)?')
+_PRICE_PART = re.compile(r'\d+(?:\.\d+)?')
+_PERCENT = re.compile(r'(\d+(?:\.\d+)?)\s*%')
+_UNITS = (('港元', '港元'), ('美元', '美元'), ('美金', '美元'), ('刀', '美元'), ('元', '元'))
+
+# 数字后面是这些字时不是价格
+_NOT_PRICE_SUFFIX = tuple('%％年月日号倍亿点股只次天周个')
+# 数字前面紧挨着这些词时是成本、收盘价等，不是操作价格
+_NOT_PRICE_PREFIX = ('成本', '收盘', '市值', '涨幅', '跌幅', '收益', '仓位', '持有')
+
+_MARKDOWN_NOISE = re.compile(r'!\[[^\]]*\]\([^)]*\)|\]\([^)]*\)|https?://\S+|[*#>`_]')
+_ARTICLE_NAME = re.compile(r'(\d{4}-\d{2}-\d{2})_(.+)\.md$')
+
+
+def load_symbols(csv_path=DATA_CSV):
+    """{别名: 完整 symbol}，别名来自 data.csv 的 symbol 列和内置列表"""
+    symbols = []
+    try:
+        with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+            symbols = [row['symbol'] for row in csv.DictReader(f) if row.get('symbol')]
+    except OSError:
+        pass
+
+    aliases = {}
+    for symbol in list(dict.fromkeys(symbols)) + list(EXTRA_SYMBOLS):
+        for name in symbol.split():
+            if name not in ALIAS_STOPWORDS:
+                aliases.setdefault(name, symbol)
+    for alias, symbol in EXTRA_ALIASES.items():
+        aliases.setdefault(alias, symbol)
+    return aliases
+
+
+def compile_symbol_pattern(aliases):
+    """所有别名合成一个正则（长的优先）；英文名按整词匹配，四个字母以内的全大写代码区分大小写"""
+    parts = []
+    for alias in sorted(aliases, key=len, reverse=True):
+        escaped = re.escape(alias)
+        if alias.isascii():
+            if not (alias.isupper() and len(alias) <= 4):
+                escaped = f'(?i:{escaped})'
+            escaped = rf'(?<![A-Za-z]){escaped}(?![A-Za-z])'
+        parts.append(escaped)
+    return re.compile('|'.join(parts)) if parts else None
+
+
+def _match_symbol(match, aliases):
+    text = match.group(0)
+    return aliases.get(text) or next(symbol for alias, symbol in aliases.items() if alias.lower() == text.lower())
+
+
+def _find_keyword(clause, keyword):
+    """分句中第一个没被否定的 keyword 的位置，没有时返回 -1"""
+    start = clause.find(keyword)
+    while start >= 0:
+        if not _NEGATED.search(clause[:start]):
+            return start
+        start = clause.find(keyword, start + 1)
+    return -1
+
+
+def _is_plan(clause, keyword, start):
+    """操作还没发生：有计划类的词，或操作词前面是打算、条件；已触发、"减了"这类写法算已完成"""
+    if '触发' in clause or keyword.endswith('了') or clause.startswith('了', start + len(keyword)):
+        return False
+    return any(word in clause for word in _PLAN_WORDS) or bool(_INTENT.search(clause[:start]))
+
+
+def detect_action(clause):
+    for action, keywords in ACTION_RULES:
+        for keyword in keywords:
+            start = _find_keyword(clause, keyword)
+            if start >= 0:
+                return f'计划{action}' if _is_plan(clause, keyword, start) else action
+    return None
+
+
+def detect_prices(clause):
+    """分句中的操作价格列表（字符串），以及价格单位"""
+    prices = []
+    for match in _PRICE.finditer(clause):
+        after = clause[match.end():match.end() + 1]
+        before = clause[max(0, match.start() - 4):match.start()]
+        if after.startswith(_NOT_PRICE_SUFFIX) or any(word in before for word in _NOT_PRICE_PREFIX):
+            continue
+        parts = _PRICE_PART.findall(match.group(0))
+        # 两位数以下的数字多半是数量或比例，四位数的整年份多半是日期
+        parts = [p for p in parts if float(p) >= 10 and not (len(p) == 4 and p.startswith('20') and '.' not in p)]
+        suffix = ' 万' if match.group(3) else ''
+        prices.extend(p + suffix for p in parts)
+    unit = next((name for word, name in _UNITS if word in clause), '')
+    return list(dict.fromkeys(prices)), unit
+
+
+def format_price_info(action, prices, unit, clause):
+    info = ' / '.join(prices) + (f' {unit}' if unit else ' ')
+    percent = _PERCENT.search(clause)
+    if percent and action.endswith(('减仓', '加仓', '建仓', '清仓')):
+        verb = '加' if action.endswith(('加仓', '建仓')) else '减'
+        info += f"{'各' if '各' in clause else ''}{verb} {percent.group(1)}%"
+    return info.strip()
+
+
+def extract_rows(document, article_date, fallback_title, aliases, pattern):
+    """从一篇文章提取 [symbol, article_date, article_title, action, price_info, reason_summary]"""
+    title = fallback_title
+    if document.startswith('# '):
+        title = document[2:document.find('\n')].strip()
+    separator = document.find('---\n')
+    body = document[separator + 4:] if separator >= 0 else document
+    if pattern is None:
+        return []
+
+    rows = []
+    seen = set()
+    for paragraph in body.split('\n\n'):
+        paragraph = _MARKDOWN_NOISE.sub('', paragraph).strip()
+        if not paragraph:
+            continue
+        current_symbol = None
+        for sentence in _SENTENCE_SPLIT.split(paragraph):
+            for clause in _CLAUSE_SPLIT.split(sentence):
+                matches = list(pattern.finditer(clause))
+                if matches:
+                    current_symbol = _match_symbol(matches[-1], aliases)
+                action = detect_action(clause)
+                if not action or not current_symbol:
+                    continue
+                prices, unit = detect_prices(clause)
+                if not prices:
+                    continue
+                # 分句里出现多个标的时取最靠近操作词的那个
+                symbol = current_symbol
+                if len(matches) > 1:
+                    keyword_pos = min((clause.find(k) for _, keywords in ACTION_RULES for k in keywords
+                                       if k in clause), default=0)
+                    symbol = _match_symbol(min(matches, key=lambda m: abs(m.start() - keyword_pos)), aliases)
+                price_info = format_price_info(action, prices, unit, clause)
+                key = (symbol, action, price_info)
+                if key in seen:
+                    continue
+                seen.add(key)
+                summary = ' '.join(sentence.split())
+                rows.append([symbol, article_date, title, action, price_info,
+                             summary if len(summary) <= 60 else summary[:59] + '…'])
+    return rows
+
+
+# 工作进程中的标的别名和正则
+_aliases = {}
+_pattern = None
+
+
+def _init_worker(aliases):
+    global _aliases, _pattern
+    _aliases = aliases
+    _pattern = compile_symbol_pattern(aliases)
+
+
+def _extract_file(task):
+    path, article_date, fallback_title = task
+    with open(path, 'rb') as f:
+        raw = f.read()
+    rows = extract_rows(raw.decode('utf-8', errors='replace'), article_date, fallback_title, _aliases, _pattern)
+    return path, hashlib.sha256(raw).hexdigest(), rows
+
+
+def scan_articles(accounts, docs_dir=DOCS_DIR):
+    """[(路径, 日期, 文件名中的标题, stat)]"""
+    if accounts is None:
+        accounts = sorted(p.name for p in Path(docs_dir).iterdir() if p.is_dir() and not p.name.startswith('.'))
+    found = []
+    for account in accounts:
+        for md_file in sorted(Path(docs_dir, account).glob('*.md')):
+            match = _ARTICLE_NAME.match(md_file.name)
+            if match:
+                found.append((md_file.as_posix(), match.group(1), match.group(2), md_file.stat()))
+    return found
+
+
+def load_cache():
+    """返回 (规则签名, {路径: {'hash', 'mtime', 'size', 'rows'}})"""
+    try:
+        with open(CACHE_FILE, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None, {}
+    return cache.get('signature'), cache.get('articles', {})
+
+
+def read_csv_rows(csv_path=DATA_CSV):
+    """返回 (手工行, 文件是否带旧版本的 source 列)"""
+    try:
+        with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+            reader = csv.DictReader(f)
+            rows = [([row.get(field) or '' for field in CSV_FIELDS], row.get('source'))
+                    for row in reader]
+            has_source = 'source' in (reader.fieldnames or ())
+    except OSError:
+        return [], False
+    return [row for row, source in rows if source != _SOURCE_EXTRACTED], has_source
+
+
+def render_csv(rows):
+    lines = [','.join(f'"{field}"' for field in CSV_FIELDS)]
+    for row in rows:
+        lines.append(','.join('"' + value.replace('"', '""') + '"' for value in row))
+    return '\n'.join(lines) + '\n'
+
+
+def _write_if_changed(path, content):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if f.read() == content:
+                return False
+    except OSError:
+        pass
+    _write_atomic(path, content)
+    return True
+
+
+def _write_atomic(path, content):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def update_data_csv(accounts=DEFAULT_ACCOUNTS, jobs=None, full=False, dry_run=False):
+    start_time = time.monotonic()
+    aliases = load_symbols()
+    # 手工行里新增了标的时，别名表变化，需要全部重新提取
+    signature = hashlib.sha256(json.dumps([RULES_VERSION, sorted(aliases.items())],
+                                          ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+    cached_signature, old_cache = load_cache()
+    if full or cached_signature != signature:
+        old_cache = {}
+
+    articles = scan_articles(None if accounts is None else list(accounts))
+    new_cache = {}
+    tasks = []
+    for path, article_date, title, stat in articles:
+        entry = old_cache.get(path)
+        if entry and entry['mtime'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+            new_cache[path] = entry
+        else:
+            tasks.append((path, article_date, title))
+
+    stats = {'articles': len(articles), 'read': len(tasks), 'extracted': 0}
+    if len(tasks) < 8 or jobs == 1:
+        # 文章很少时不值得启动进程池
+        _init_worker(aliases)
+        results = list(map(_extract_file, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(aliases,)) as pool:
+            results = list(pool.map(_extract_file, tasks, chunksize=8))
+
+    for path, digest, rows in results:
+        stat = os.stat(path)
+        entry = old_cache.get(path)
+        if entry and entry['hash'] == digest:
+            rows = entry['rows']  # 只是 mtime 变了，内容没变
+        else:
+            stats['extracted'] += 1
+        new_cache[path] = {'hash': digest, 'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'rows': rows}
+
+    generated = sorted({tuple(row) for entry in new_cache.values() for row in entry['rows']},
+                       key=lambda row: (row[1], row))
+    manual, has_source = read_csv_rows()
+    manual_keys = {tuple(row[:5]) for row in manual}
+    extracted = [list(row) for row in generated if tuple(row[:5]) not in manual_keys]
+
+    changed = False
+    if not dry_run:
+        # 旧版本混在 data.csv 里的提取行移走，只留手工行
+        if has_source:
+            _write_atomic(DATA_CSV, render_csv(manual))
+        changed = _write_if_changed(EXTRACTED_CSV, render_csv(extracted))
+        if new_cache != old_cache:
+            _write_atomic(CACHE_FILE, json.dumps({'signature': signature, 'articles': new_cache}, ensure_ascii=False))
+
+    stats.update(manual=len(manual), generated=len(extracted), changed=changed,
+                 elapsed=time.monotonic() - start_time)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="从文章中批量提取操作记录，增量维护 data_extracted.csv")
+    parser.add_argument("--account", action="append",
+                        help=f"公众号名，可重复；all 为全部（默认: {', '.join(DEFAULT_ACCOUNTS)}）")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="进程数，默认 CPU 核数")
+    parser.add_argument("--full", action="store_true", help="忽略缓存，全部重新提取")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不写 data_extracted.csv 和缓存")
+    args = parser.parse_args()
+
+    accounts = DEFAULT_ACCOUNTS
+    if args.account:
+        accounts = None if 'all' in args.account else args.account
+
+    stats = update_data_csv(accounts, jobs=args.jobs, full=args.full, dry_run=args.dry_run)
+    status = '（dry run）' if args.dry_run else (f'已更新 {EXTRACTED_CSV}' if stats['changed'] else f'{EXTRACTED_CSV} 无变化')
+    print(f"✅ {status}，耗时 {stats['elapsed'] * 1000:.0f} ms")
+    print(f"  文章: {stats['articles']}，读取: {stats['read']}，重新提取: {stats['extracted']}")
+    print(f"  手工行: {stats['manual']}，提取行: {stats['generated']}")
+
+
+if __name__ == "__main__":
+    main()
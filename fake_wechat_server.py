@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+本地模拟微信服务器（用于离线基准测试）
+
+从 fixture 目录回放合集列表接口、文章 HTML 和图片，可设置延迟和错误率：
+  python3 fake_wechat_server.py --make-fixtures bench_fixtures --articles 100
+  python3 fake_wechat_server.py --fixtures bench_fixtures --port 8765 --latency 0.05 --error-rate 0.02
+  python3 fake_wechat_server.py --record .http_cache --fixtures bench_fixtures
+
+fixture 目录结构：
+  album.json                  合集文章列表（与 getalbum_resp.article_list 中的条目格式相同，url 为 /s/<msgid>_<itemidx>）
+  articles/<msgid>_<itemidx>.html   文章页，图片地址写成 {{HOST}}/img/<文件名>，回放时替换为本服务器地址
+  images/<文件名>               图片内容；不存在的图片按 --image-bytes 生成占位内容
+
+合集链接写成 http://127.0.0.1:<端口>/mp/appmsgalbum?__biz=...&album_id=...，下载器会把列表请求发到同一地址。
+GET /__stats 返回已处理的请求数和字节数，加 ?reset=1 同时清零。
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+HOST_PLACEHOLDER = '{{HOST}}'
+ALBUM_FILENAME = 'album.json'
+ARTICLE_DIRNAME = 'articles'
+IMAGE_DIRNAME = 'images'
+
+# 返回请求数、字节数等统计（?reset=1 同时清零），供基准测试在服务器进程外读取
+STATS_PATH = '/__stats'
+
+DEFAULT_IMAGE_BYTES = 40 * 1024
+
+_PNG_HEADER = b'\x89PNG\r\n\x1a\n'
+
+
+def article_fixture_name(article):
+    return f"{article['msgid']}_{article['itemidx']}"
+
+
+def _placeholder_image(name, size):
+    """按文件名生成固定的占位图片内容（不同图片内容不同，避免被按内容去重）"""
+    seed = hashlib.sha256(name.encode('utf-8')).digest()
+    body = (seed * (size // len(seed) + 1))[:max(0, size - len(_PNG_HEADER))]
+    return _PNG_HEADER + body
+
+
+def _synthetic_article_html(index, title, create_time, images, rng):
+    """生成结构接近公众号文章页的 HTML：头部大段脚本（含标题和发布时间变量）、多层嵌套的正文、结尾脚本"""
+    script = 'var ' + ';var '.join(f'v{i}="{"x" * rng.randint(20, 80)}"' for i in range(400)) + ';'
+    script += f'var msg_title = "{title}";var ct = "{create_time}";'
+    paragraphs = []
+    for j, image in enumerate(images):
+        text = ''.join(f'第{index}篇第{j}段文字，' for _ in range(rng.randint(5, 20)))
+        paragraphs.append(
+            f'<section style="margin:0"><p style="line-height:1.75em"><span style="font-size:15px">{text}'
+            f'<strong>重点</strong></span></p></section>'
+            f'<p style="text-align:center"><img class="rich_pages wxw-img" data-ratio="0.56" data-type="png" '
+            f'data-w="1080" data-src="{HOST_PLACEHOLDER}/img/{image}?wx_fmt=png&amp;tp=webp&amp;wxfrom=5" '
+            f'style="width:100%"></p>'
+        )
+    paragraphs.append('<div><div><p>（完）</p></div></div>')
+    return (
+        f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{title}</title>'
+        f'<script>{script}</script></head><body><div id="page-content" class="rich_media_area_primary">'
+        f'<h1 class="rich_media_title" id="activity-name">{title}</h1>'
+        f'<div class="rich_media_content js_underline_content" id="js_content" style="visibility: hidden;">'
+        f'{"".join(paragraphs)}</div></div><script>{script}</script></body></html>'
+    )
+
+
+def make_fixtures(fixture_dir, articles=100, images_per_article=5, image_bytes=DEFAULT_IMAGE_BYTES, seed=0):
+    """生成一套固定的模拟数据（相同参数每次生成的内容一致）"""
+    rng = random.Random(seed)
+    os.makedirs(os.path.join(fixture_dir, ARTICLE_DIRNAME), exist_ok=True)
+    os.makedirs(os.path.join(fixture_dir, IMAGE_DIRNAME), exist_ok=True)
+
+    album = []
+    start_time = 1700000000
+    for i in range(articles):
+        article = {
+            'title': f'基准测试文章{i}',
+            'msgid': str(2247480000 + i),
+            'itemidx': '1',
+            'create_time': str(start_time + i * 86400),
+        }
+        name = article_fixture_name(article)
+        article['url'] = f'/s/{name}'
+        album.append(article)
+
+        images = [f'{name}_{j}.png' for j in range(images_per_article)]
+        # 每篇文章末尾带一张公共签名图，覆盖跨文章去重的情况
+        images.append('signature.png')
+        with open(os.path.join(fixture_dir, ARTICLE_DIRNAME, f'{name}.html'), 'w', encoding='utf-8') as f:
+            f.write(_synthetic_article_html(i, article['title'], article['create_time'], images, rng))
+        for image in images:
+            with open(os.path.join(fixture_dir, IMAGE_DIRNAME, image), 'wb') as f:
+                f.write(_placeholder_image(image, image_bytes))
+
+    with open(os.path.join(fixture_dir, ALBUM_FILENAME), 'w', encoding='utf-8') as f:
+        json.dump(album, f, ensure_ascii=False, indent=2)
+    return album
+
+
+_MMBIZ_IMAGE_PATTERN = re.compile(r'https?://mmbiz\.[a-z.]+/[^"\'\s<>]+')
+
+
+def record_fixtures(cache_dir, fixture_dir):
+    """从 HTTP 缓存（.http_cache）中导出真实的合集列表和文章页作为 fixture；图片地址改写为本地占位图"""
+    os.makedirs(os.path.join(fixture_dir, ARTICLE_DIRNAME), exist_ok=True)
+    entries = []
+    for root, _, files in os.walk(cache_dir):
+        for name in files:
+            if name.endswith('.json'):
+                try:
+                    with open(os.path.join(root, name), 'r', encoding='utf-8') as f:
+                        meta = json.load(f)
+                    with open(os.path.join(root, name[:-5] + '.body'), 'rb') as f:
+                        entries.append((meta, f.read()))
+                except (OSError, ValueError):
+                    continue
+
+    pages = {}
+    for meta, body in entries:
+        if meta.get('kind') == 'article':
+            pages[meta['url'].split('#')[0]] = body.decode('utf-8', errors='replace')
+
+    album = {}
+    for meta, body in entries:
+        if meta.get('kind') != 'album':
+            continue
+        try:
+            article_list = json.loads(body).get('getalbum_resp', {}).get('article_list', [])
+        except ValueError:
+            continue
+        if isinstance(article_list, dict):
+            article_list = [article_list]
+        for article in article_list:
+            url = article.get('url', '').split('#')[0]
+            html = pages.get(url) or pages.get(url.replace('http://', 'https://', 1))
+            if not html or not article.get('msgid'):
+                continue
+            name = article_fixture_name(article)
+            html = _MMBIZ_IMAGE_PATTERN.sub(
+                lambda m: f"{HOST_PLACEHOLDER}/img/{hashlib.sha256(m.group(0).encode('utf-8')).hexdigest()[:16]}.png",
+                html)
+            with open(os.path.join(fixture_dir, ARTICLE_DIRNAME, f'{name}.html'), 'w', encoding='utf-8') as f:
+                f.write(html)
+            album[name] = dict(article, url=f'/s/{name}')
+
+    records = sorted(album.values(), key=lambda a: int(a.get('create_time', 0)))
+    with open(os.path.join(fixture_dir, ALBUM_FILENAME), 'w', encoding='utf-8') as f:
+        json.dump(records, f, ensure_ascii=False, indent=2)
+    return records
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    """客户端断开连接（超时、中断下载）属于正常情况，不打印异常"""
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], (ConnectionError, TimeoutError)):
+            super().handle_error(request, client_address)
+
+
+class FakeWeChatServer:
+    """
+    在后台线程中运行的模拟服务器
+
+    Args:
+        latency: 每个请求的基础延迟（秒），实际延迟在 [0.5, 1.5] 倍之间随机
+        image_latency: 图片请求的基础延迟，为 None 时与 latency 相同
+        error_rate: 返回 500 的请求比例
+    """
+
+    def __init__(self, fixture_dir, port=0, latency=0.0, image_latency=None, error_rate=0.0,
+                 image_bytes=DEFAULT_IMAGE_BYTES, seed=0):
+        self.fixture_dir = fixture_dir
+        self.latency = latency
+        self.image_latency = latency if image_latency is None else image_latency
+        self.error_rate = error_rate
+        self.image_bytes = image_bytes
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+        with open(os.path.join(fixture_dir, ALBUM_FILENAME), 'r', encoding='utf-8') as f:
+            self.album = sorted(json.load(f), key=lambda a: int(a.get('create_time', 0)))
+        self._pages = {}
+        self._images = {}
+        self.reset_stats()
+
+        self.httpd = _QuietHTTPServer(('127.0.0.1', port), self._handler_class())
+        self.port = self.httpd.server_address[1]
+        self.base_url = f'http://127.0.0.1:{self.port}'
+        self._thread = None
+
+    def album_url(self, biz='MzBENCH==', album_id='1'):
+        return f'{self.base_url}/mp/appmsgalbum?__biz={biz}&action=getalbum&album_id={album_id}'
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {'requests': 0, 'errors': 0, 'album': 0, 'articles': 0, 'images': 0, 'bytes': 0}
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _record(self, kind, size, error=False):
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['bytes'] += size
+            if error:
+                self.stats['errors'] += 1
+            elif kind:
+                self.stats[kind] += 1
+
+    def _delay(self, base):
+        if base:
+            with self._lock:
+                factor = self._rng.uniform(0.5, 1.5)
+            time.sleep(base * factor)
+
+    def _should_fail(self):
+        if not self.error_rate:
+            return False
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+    def album_page(self, query):
+        """按微信接口的参数返回一页列表：is_reverse=1 时从新到旧，begin_msgid/begin_itemidx 之后开始"""
+        articles = self.album[::-1] if query.get('is_reverse') == '1' else self.album
+        begin = (query.get('begin_msgid'), query.get('begin_itemidx'))
+        if begin[0]:
+            keys = [(a['msgid'], a['itemidx']) for a in articles]
+            articles = articles[keys.index(begin) + 1:] if begin in keys else []
+        count = int(query.get('count', 10))
+        page = [dict(a, url=self.base_url + a['url']) for a in articles[:count]]
+        resp = {
+            'article_list': page[0] if len(page) == 1 else page,
+            'continue_flag': '1' if len(articles) > count else '0',
+        }
+        return {'base_resp': {'ret': 0}, 'getalbum_resp': resp}
+
+    def article_page(self, name):
+        if name not in self._pages:
+            path = os.path.join(self.fixture_dir, ARTICLE_DIRNAME, f'{os.path.basename(name)}.html')
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    html = f.read()
+            except OSError:
+                return None
+            self._pages[name] = html.replace(HOST_PLACEHOLDER, self.base_url).encode('utf-8')
+        return self._pages[name]
+
+    def image(self, name):
+        if name not in self._images:
+            path = os.path.join(self.fixture_dir, IMAGE_DIRNAME, os.path.basename(name))
+            try:
+                with open(path, 'rb') as f:
+                    self._images[name] = f.read()
+            except OSError:
+                self._images[name] = _placeholder_image(name, self.image_bytes)
+        return self._images[name]
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # 响应头和正文分两次写出，不关 Nagle 会和客户端的延迟 ACK 叠加出 40ms 的等待
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body=b'', content_type='text/plain', headers=None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                if parsed.path == STATS_PATH:
+                    # 统计接口本身不计入统计，也不受延迟和错误率影响
+                    body = json.dumps(server.stats).encode('utf-8')
+                    if query.get('reset') == '1':
+                        server.reset_stats()
+                    self._reply(200, body, 'application/json')
+                    return
+
+                is_image = parsed.path.startswith('/img/')
+                server._delay(server.image_latency if is_image else server.latency)
+
+                if server._should_fail():
+                    server._record(None, 0, error=True)
+                    self._reply(500, b'injected error')
+                    return
+
+                if parsed.path == '/mp/appmsgalbum':
+                    body = json.dumps(server.album_page(query), ensure_ascii=False).encode('utf-8')
+                    server._record('album', len(body))
+                    self._reply(200, body, 'application/json; charset=utf-8')
+                elif parsed.path.startswith('/s/'):
+                    body = server.article_page(parsed.path[3:])
+                    if body is None:
+                        server._record(None, 0, error=True)
+                        self._reply(404)
+                        return
+                    server._record('articles', len(body))
+                    self._reply(200, body, 'text/html; charset=utf-8')
+                elif is_image:
+                    body = server.image(parsed.path[5:])
+                    status, headers = 200, {}
+                    range_header = self.headers.get('Range', '')
+                    if range_header.startswith('bytes='):
+                        start = int(range_header[6:].split('-')[0] or 0)
+                        if start >= len(body):
+                            server._record(None, 0, error=True)
+                            self._reply(416)
+                            return
+                        headers['Content-Range'] = f'bytes {start}-{len(body) - 1}/{len(body)}'
+                        body, status = body[start:], 206
+                    server._record('images', len(body))
+                    self._reply(status, body, 'image/png', headers)
+                else:
+                    server._record(None, 0, error=True)
+                    self._reply(404)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟微信服务器，回放 fixture 中的合集列表、文章和图片")
+    parser.add_argument("--fixtures", default="bench_fixtures", help="fixture 目录")
+    parser.add_argument("--make-fixtures", dest="make", metavar="DIR", help="生成模拟 fixture 到 DIR 后退出")
+    parser.add_argument("--record", metavar="CACHE_DIR", help="从 HTTP 缓存目录导出 fixture 到 --fixtures 后退出")
+    parser.add_argument("--articles", type=int, default=100, help="生成的文章数")
+    parser.add_argument("--images", type=int, default=5, help="每篇文章的图片数")
+    parser.add_argument("--image-bytes", type=int, default=DEFAULT_IMAGE_BYTES, help="每张图片的字节数")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="列表和文章请求的延迟（秒）")
+    parser.add_argument("--image-latency", type=float, default=None, help="图片请求的延迟（秒），默认同 --latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 500 的请求比例")
+    args = parser.parse_args()
+
+    if args.make:
+        album = make_fixtures(args.make, args.articles, args.images, args.image_bytes)
+        print(f"✅ 已生成 {len(album)} 篇文章的 fixture: {args.make}")
+        return
+    if args.record:
+        album = record_fixtures(args.record, args.fixtures)
+        print(f"✅ 已从 {args.record} 导出 {len(album)} 篇文章: {args.fixtures}")
+        return
+
+    server = FakeWeChatServer(args.fixtures, port=args.port, latency=args.latency,
+                              image_latency=args.image_latency, error_rate=args.error_rate,
+                              image_bytes=args.image_bytes)
+    print(f"模拟服务器已启动: {server.base_url}（{len(server.album)} 篇文章）")
+    print(f"合集链接: {server.album_url()}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print('\n已停止')
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
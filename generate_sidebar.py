@@ -1,64 +1,169 @@
 #!/usr/bin/env python3
 """
-生成 VuePress 侧边栏配置文件（按公众号分类）
+生成 VuePress 侧边栏配置文件（按公众号、按年份分片）
+
+输出到 docs/.vuepress/public/sidebar/：
+  index.json            各公众号的文章数和年份分片列表（很小）
+  <公众号>/<年份>.json   某个公众号某一年的侧边栏条目
+内容没变的分片不会改写，不再需要的旧分片会被删除。
+
+用法:
+  python3 generate_sidebar.py             增量生成（目录没有变化的公众号直接用缓存）
+  python3 generate_sidebar.py --no-cache  忽略缓存，全部重新扫描
+  python3 generate_sidebar.py --watch     常驻监听 docs/，下载器写入新文章后自动更新侧边栏
 """
 import json
+import os
 import re
+import sys
+import time
 from pathlib import Path
 from urllib.parse import quote
 
-def generate_sidebar_config():
-    # 公众号映射 - 唯一数据源在 docs/ 目录
-    authors = {
-        '金渐层': 'docs/金渐层',
-        '只做主升不做调整': 'docs/只做主升不做调整',
-        '社会观察从业者': 'docs/社会观察从业者',
-        '财务自由那些事': 'docs/财务自由那些事',
-        '美投investing': 'docs/美投investing',
-    }
-    
+# 公众号映射 - 唯一数据源在 docs/ 目录
+AUTHORS = {
+    '金渐层': 'docs/金渐层',
+    '只做主升不做调整': 'docs/只做主升不做调整',
+    '社会观察从业者': 'docs/社会观察从业者',
+    '财务自由那些事': 'docs/财务自由那些事',
+    '美投investing': 'docs/美投investing',
+}
+
+EXCLUDED_FILES = {'index.md', 'README.md', '投资与人生建议总结.md'}
+
+SIDEBAR_DIR = 'docs/.vuepress/public/sidebar'
+INDEX_FILENAME = 'index.json'
+
+# 目录索引缓存：记录每个公众号目录的 mtime 和解析结果，目录没变就不用重新扫描
+CACHE_FILE = '.sidebar_cache.json'
+
+
+def scan_author_dir(author_name, articles_dir):
+    """扫描一个公众号目录，返回按日期倒序排列的文章列表"""
+    articles = []
+    seen = set()
+
+    md_files = sorted(f for f in articles_dir.glob('*.md') if f.name not in EXCLUDED_FILES)
+
+    # 解析文件名获取信息
+    for md_file in md_files:
+        name = md_file.name
+        # 格式: 2025-12-08_我们不能再摔倒了~.md
+        match = re.match(r'(\d{4}-\d{2}-\d{2})_(.+)\.md', name)
+        if match:
+            date, title = match.groups()
+
+            # 避免重复（根据日期和标题去重）
+            if (date, title) in seen:
+                continue
+            seen.add((date, title))
+
+            encoded_path = quote(f'/{author_name}/{name[:-3]}.html', safe='/()')
+            articles.append({
+                'date': date,
+                'title': title,
+                'path': encoded_path,
+                'filename': name
+            })
+
+    # 按日期倒序排列（最新的在前）
+    articles.sort(key=lambda x: x['date'], reverse=True)
+    return articles
+
+
+def load_cache():
+    try:
+        with open(CACHE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_if_changed(path, content):
+    """内容有变化时才写文件，返回是否写入"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if f.read() == content:
+                return False
+    except OSError:
+        pass
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    return True
+
+
+def build_shards(all_configs):
+    """按公众号、年份拆分侧边栏，返回 {相对路径: JSON 内容}（含 index.json）"""
+    shards = {}
+    index = {}
+    for author_name, cfg in all_configs.items():
+        by_year = {}
+        for item in cfg['articles']:
+            by_year.setdefault(item['text'][:4], []).append(item)
+
+        years = []
+        for year, items in sorted(by_year.items(), reverse=True):
+            rel_path = f'{author_name}/{year}.json'
+            shards[rel_path] = json.dumps(items, ensure_ascii=False, indent=2)
+            years.append({'year': year, 'count': len(items), 'file': rel_path})
+
+        index[author_name] = {'text': author_name, 'count': cfg['count'], 'years': years}
+
+    shards[INDEX_FILENAME] = json.dumps(index, ensure_ascii=False, indent=2)
+    return shards
+
+
+def write_shards(shards):
+    """写入有变化的分片并删除不再需要的旧分片，返回变化的分片列表"""
+    changed = [rel_path for rel_path, content in shards.items()
+               if write_if_changed(os.path.join(SIDEBAR_DIR, rel_path), content)]
+
+    for path in Path(SIDEBAR_DIR).glob('*/*.json'):
+        rel_path = path.relative_to(SIDEBAR_DIR).as_posix()
+        if rel_path not in shards:
+            path.unlink()
+            changed.append(rel_path)
+    return changed
+
+
+def print_shard_sizes(shards):
+    """输出索引和每个分片的大小"""
+    print(f'  📦 分片大小:')
+    for rel_path, content in sorted(shards.items(), key=lambda x: x[0] != INDEX_FILENAME):
+        print(f'    {rel_path}: {len(content.encode("utf-8")) / 1024:.1f} KB')
+
+
+def generate_sidebar_config(use_cache=True, verbose=True):
+    cache = load_cache() if use_cache else {}
+    new_cache = {}
     all_configs = {}
-    
+    rescanned = []
+
     # 处理每个公众号
-    for author_name, source_dir in authors.items():
-        articles = []
+    for author_name, source_dir in AUTHORS.items():
         articles_dir = Path(source_dir)
-        
+
         if not articles_dir.exists():
-            print(f'⚠️ 目录不存在: {source_dir}')
+            if verbose:
+                print(f'⚠️ 目录不存在: {source_dir}')
             continue
-        
-        md_files = sorted([
-            f for f in articles_dir.glob('*.md') 
-            if f.name not in ['index.md', 'README.md', '投资与人生建议总结.md']
-        ])
-        
-        # 解析文件名获取信息
-        for md_file in md_files:
-            name = md_file.name
-            # 格式: 2025-12-08_我们不能再摔倒了~.md
-            match = re.match(r'(\d{4}-\d{2}-\d{2})_(.+)\.md', name)
-            if match:
-                date, title = match.groups()
-                encoded_path = quote(f'/{author_name}/{name[:-3]}.html', safe='/()')
-                article_info = {
-                    'date': date,
-                    'title': title,
-                    'path': encoded_path,
-                    'filename': name
-                }
-                
-                # 避免重复（根据日期和标题去重）
-                if not any(a['date'] == date and a['title'] == title for a in articles):
-                    articles.append(article_info)
-        
+
+        # 目录 mtime 没变（没有增删改名文件）时直接用缓存的解析结果
+        mtime = articles_dir.stat().st_mtime_ns
+        cached = cache.get(author_name)
+        if cached and cached.get('dir') == source_dir and cached.get('mtime') == mtime:
+            articles = cached['articles']
+        else:
+            articles = scan_author_dir(author_name, articles_dir)
+            rescanned.append(author_name)
+        new_cache[author_name] = {'dir': source_dir, 'mtime': mtime, 'articles': articles}
+
         if not articles:
-            print(f'⚠️ 目录为空: {source_dir}')
+            if verbose:
+                print(f'⚠️ 目录为空: {source_dir}')
             continue
-        
-        # 按日期倒序排列（最新的在前）
-        articles.sort(key=lambda x: x['date'], reverse=True)
-        
+
         # 生成侧边栏配置
         sidebar = [
             {
@@ -67,32 +172,61 @@ def generate_sidebar_config():
             }
             for article in articles
         ]
-        
+
         all_configs[author_name] = {
             'articles': sidebar,
             'count': len(articles)
         }
-    
-    # 生成完整的侧边栏配置文件
-    sidebar_config = {}
-    for author_name in all_configs.keys():
-        sidebar_config[author_name] = {
-            'text': author_name,
-            'children': all_configs[author_name]['articles']
-        }
-    
-    # 保存为 JSON
-    with open('sidebar_config.json', 'w', encoding='utf-8') as f:
-        json.dump(sidebar_config, f, ensure_ascii=False, indent=2)
-    
+
+    # 按公众号、年份分片保存（内容没变的分片不写，避免触发 VuePress 重新构建）
+    shards = build_shards(all_configs)
+    changed = write_shards(shards)
+    if new_cache != cache:
+        write_if_changed(CACHE_FILE, json.dumps(new_cache, ensure_ascii=False))
+
     # 输出统计信息
-    total = sum(cfg['count'] for cfg in all_configs.values())
-    print(f'✅ 已生成侧边栏配置')
-    for author, cfg in all_configs.items():
-        print(f'  📖 {author}: {cfg["count"]} 篇文章')
-    print(f'  📊 总计: {total} 篇文章')
+    if verbose:
+        total = sum(cfg['count'] for cfg in all_configs.values())
+        print(f'✅ 已生成侧边栏配置（更新 {len(changed)} 个分片）' if changed else f'✅ 侧边栏配置无变化')
+        for author, cfg in all_configs.items():
+            print(f'  📖 {author}: {cfg["count"]} 篇文章')
+        print(f'  📊 总计: {total} 篇文章')
+        if use_cache:
+            print(f'  🔄 重新扫描: {", ".join(rescanned) if rescanned else "无"}')
+        print_shard_sizes(shards)
+    elif changed:
+        print(f'✅ 侧边栏已更新: {", ".join(changed)}')
     return all_configs
 
-if __name__ == '__main__':
+
+def watch(interval=2.0):
+    """轮询各公众号目录的 mtime，有变化时增量更新侧边栏"""
+    print(f'👀 监听 docs/ 变化（每 {interval:g} 秒检查一次，Ctrl+C 退出）')
     generate_sidebar_config()
+    last_snapshot = None
+    try:
+        while True:
+            snapshot = {}
+            for author_name, source_dir in AUTHORS.items():
+                try:
+                    snapshot[author_name] = Path(source_dir).stat().st_mtime_ns
+                except OSError:
+                    snapshot[author_name] = None
+            if last_snapshot is not None and snapshot != last_snapshot:
+                generate_sidebar_config(verbose=False)
+            last_snapshot = snapshot
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print('\n已停止监听')
 
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if '--watch' in args:
+        interval = 2.0
+        for arg in args:
+            if arg.startswith('--interval='):
+                interval = float(arg.split('=', 1)[1])
+        watch(interval)
+    else:
+        generate_sidebar_config(use_cache='--no-cache' not in args)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+文章原始 HTML 存档
+
+每篇文章下载成功后，把原始 HTML 以 gzip 压缩存到公众号目录下的 .archive/，
+文件名与 Markdown 对应（2025-12-08_标题.md → .archive/2025-12-08_标题.html.gz）。
+调整渲染逻辑后可用 rerender_articles.py 从存档离线重新生成 Markdown，无需重新下载。
+"""
+
+import gzip
+import os
+import threading
+
+ARCHIVE_DIRNAME = '.archive'
+ARCHIVE_SUFFIX = '.html.gz'
+
+
+def archive_path(output_dir, stem):
+    """Markdown 文件名（不含 .md）对应的存档路径"""
+    return os.path.join(output_dir, ARCHIVE_DIRNAME, f"{stem}{ARCHIVE_SUFFIX}")
+
+
+def save_html(output_dir, stem, html_content):
+    """压缩保存原始 HTML（先写临时文件再原子替换）"""
+    path = archive_path(output_dir, stem)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) as f:
+        f.write(html_content)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_html(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return f.read()
+
+
+def list_archives(output_dir):
+    """列出公众号目录下所有存档，返回 [(stem, 存档路径)]"""
+    archive_dir = os.path.join(output_dir, ARCHIVE_DIRNAME)
+    if not os.path.isdir(archive_dir):
+        return []
+    return sorted(
+        (name[:-len(ARCHIVE_SUFFIX)], os.path.join(archive_dir, name))
+        for name in os.listdir(archive_dir)
+        if name.endswith(ARCHIVE_SUFFIX)
+    )
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+磁盘 HTTP 缓存
+
+缓存合集列表接口（mp/appmsgalbum）和文章 HTML 的响应：
+- 按接口类型设置新鲜期（TTL），新鲜期内直接返回缓存，不发请求
+- 过期后带 If-None-Match / If-Modified-Since 做条件请求，304 时沿用缓存
+- 离线模式只读缓存，未命中时报错，便于不访问微信调试解析逻辑
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+DEFAULT_CACHE_DIR = '.http_cache'
+
+# 各类接口的默认新鲜期（秒）
+DEFAULT_TTLS = {
+    'album': 5 * 60,             # 合集列表：变化频繁，5 分钟
+    'article': 30 * 24 * 3600,   # 文章 HTML：发布后基本不变，30 天
+}
+
+# 需要随缓存保存的响应头
+_KEPT_HEADERS = ('content-type', 'etag', 'last-modified')
+
+
+class CacheMissError(Exception):
+    """离线模式下请求的内容不在缓存中"""
+
+
+class HttpCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, ttls=None, offline=False):
+        self.cache_dir = cache_dir
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.offline = offline
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, full_url):
+        key = hashlib.sha256(full_url.encode('utf-8')).hexdigest()
+        subdir = os.path.join(self.cache_dir, key[:2])
+        return os.path.join(subdir, f"{key}.json"), os.path.join(subdir, f"{key}.body")
+
+    def _load(self, full_url):
+        meta_path, body_path = self._paths(full_url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        return meta, body
+
+    def _store(self, full_url, kind, response):
+        meta_path, body_path = self._paths(full_url)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        meta = {
+            'url': full_url,
+            'kind': kind,
+            'stored_at': time.time(),
+            'headers': {k: response.headers[k] for k in _KEPT_HEADERS if k in response.headers},
+        }
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(body_path + suffix, 'wb') as f:
+            f.write(response.content)
+        os.replace(body_path + suffix, body_path)
+        self._write_meta(meta_path, meta)
+
+    def _write_meta(self, meta_path, meta):
+        tmp_path = f"{meta_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, meta_path)
+
+    def _to_response(self, full_url, meta, body):
+        """把缓存内容还原成 requests.Response，调用方无需区分是否命中缓存"""
+        response = requests.Response()
+        response.status_code = 200
+        response.url = full_url
+        response._content = body
+        response.headers = CaseInsensitiveDict(meta.get('headers', {}))
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers) or 'utf-8'
+        response.from_cache = True
+        return response
+
+    def fetch(self, send, url, kind, params=None, headers=None, validate=None, **kwargs):
+        """
+        通过缓存获取 url
+
+        Args:
+            send: 实际发请求的函数，签名同 requests.Session.get
+            kind: 接口类型（album / article），决定新鲜期
+            validate: 可选，判断 200 响应是否值得缓存（例如排除验证页）
+        """
+        full_url = requests.Request('GET', url, params=params).prepare().url
+        cached = self._load(full_url)
+
+        if cached:
+            meta, body = cached
+            if self.offline or time.time() - meta['stored_at'] < self.ttls.get(kind, 0):
+                return self._to_response(full_url, meta, body)
+        elif self.offline:
+            raise CacheMissError(f"离线模式下缓存未命中: {full_url}")
+
+        # 过期或未缓存：带上校验头发起条件请求
+        request_headers = dict(headers or {})
+        if cached:
+            cached_headers = CaseInsensitiveDict(meta.get('headers', {}))
+            if 'etag' in cached_headers:
+                request_headers['If-None-Match'] = cached_headers['etag']
+            if 'last-modified' in cached_headers:
+                request_headers['If-Modified-Since'] = cached_headers['last-modified']
+
+        response = send(full_url, headers=request_headers, **kwargs)
+
+        if response.status_code == 304 and cached:
+            meta['stored_at'] = time.time()
+            self._write_meta(self._paths(full_url)[0], meta)
+            return self._to_response(full_url, meta, body)
+
+        if response.status_code == 200 and (validate is None or validate(response)):
+            self._store(full_url, kind, response)
+        return response
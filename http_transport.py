@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+共享的 HTTP 传输层
+
+所有公众号、所有工具（下载器、单篇导入等）共用一个 requests.Session：
+  - 按域名配置连接池大小（图片 CDN 并发最高），超过连接池大小时多出的连接用完即丢，
+    需要重新握手，默认的 10 个连接在多个公众号同时下载图片时会成为瓶颈
+  - 长连接在所有公众号之间复用，省去重复的 DNS 解析和 TLS 握手
+  - 显式声明 Accept-Encoding：gzip / deflate / br（brotli 在 requirements.txt 中，PyPy 上为 brotlicffi），
+    另外安装了 zstandard 时加上 zstd（由 urllib3 负责解压）
+transport_stats() 统计每个域名的请求数、新建连接数、复用率和连接池溢出次数。
+"""
+
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+
+# 每个域名的连接池大小：图片 CDN 由多个公众号的图片线程同时使用
+HOST_POOL_SIZES = {
+    'mp.weixin.qq.com': 8,
+    'mmbiz.qpic.cn': 32,
+    'mmbiz.qlogo.cn': 8,
+}
+DEFAULT_POOL_SIZE = 16
+MAX_POOLS = 32  # 每个适配器缓存的连接池数（每个 域名+端口 一个）
+
+# urllib3 支持的压缩格式（取决于是否安装了 brotli / zstandard）
+ACCEPT_ENCODING_HEADER = ACCEPT_ENCODING.replace(',', ', ')
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class _PoolFullCounter(logging.Handler):
+    """统计 urllib3 的 "Connection pool is full, discarding connection" 警告（按域名）"""
+
+    def __init__(self):
+        super().__init__(level=logging.WARNING)
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        if record.msg.startswith('Connection pool is full') and record.args:
+            with self._lock:
+                host = record.args[0]
+                self.counts[host] = self.counts.get(host, 0) + 1
+
+
+_pool_full = _PoolFullCounter()
+logging.getLogger('urllib3.connectionpool').addHandler(_pool_full)
+
+
+def create_session(host_pool_sizes=None, default_pool_size=DEFAULT_POOL_SIZE):
+    """创建按域名配置连接池的 Session（一般直接用 get_session() 取共享实例）"""
+    session = requests.Session()
+    session.headers['Accept-Encoding'] = ACCEPT_ENCODING_HEADER
+
+    default_adapter = HTTPAdapter(pool_connections=MAX_POOLS, pool_maxsize=default_pool_size)
+    session.mount('https://', default_adapter)
+    session.mount('http://', default_adapter)
+    for host, size in (host_pool_sizes or HOST_POOL_SIZES).items():
+        adapter = HTTPAdapter(pool_connections=MAX_POOLS, pool_maxsize=size)
+        session.mount(f'https://{host}', adapter)
+        session.mount(f'http://{host}', adapter)
+    return session
+
+
+def get_session():
+    """进程内共享的 Session，首次调用时创建"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+        return _session
+
+
+def transport_stats(session=None):
+    """
+    每个域名的连接复用统计：
+    {域名: {'requests', 'connections'（新建连接数）, 'reuse'（复用率）, 'pool_size', 'pool_full'（连接池溢出次数）}}
+    """
+    session = session or get_session()
+    stats = {}
+    seen = set()
+    for adapter in session.adapters.values():
+        if id(adapter) in seen:
+            continue
+        seen.add(id(adapter))
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None or not pool.num_requests:
+                continue
+            host = pool.host
+            entry = stats.setdefault(host, {'requests': 0, 'connections': 0, 'pool_size': 0, 'pool_full': 0})
+            entry['requests'] += pool.num_requests
+            entry['connections'] += pool.num_connections
+            entry['pool_size'] = max(entry['pool_size'], pool.pool.maxsize if pool.pool else 0)
+
+    with _pool_full._lock:
+        for host, count in _pool_full.counts.items():
+            stats.setdefault(host, {'requests': 0, 'connections': 0, 'pool_size': 0, 'pool_full': 0})
+            stats[host]['pool_full'] = count
+    for entry in stats.values():
+        requests_count = entry['requests']
+        entry['reuse'] = round(1 - entry['connections'] / requests_count, 3) if requests_count else 0.0
+    return dict(sorted(stats.items()))
+
+
+def print_transport_stats(session=None):
+    """打印连接复用统计"""
+    stats = transport_stats(session)
+    if not stats:
+        return
+    print("\n连接复用:")
+    for host, entry in stats.items():
+        line = (f"  {host:<24} 请求 {entry['requests']:>5}  新建连接 {entry['connections']:>4}  "
+                f"复用率 {entry['reuse'] * 100:>5.1f}%  连接池 {entry['pool_size']}")
+        if entry['pool_full']:
+            line += f"  ⚠️ 连接池已满 {entry['pool_full']} 次"
+        print(line)
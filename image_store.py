@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+按内容寻址的图片存储
+
+图片按内容哈希命名（images/<sha256 前 16 位><扩展名>），同一张图片（横幅、二维码、签名图等）
+在一个公众号目录下只存一份，文章直接引用同一个文件。
+规范化后的 mmbiz 图片 URL → 内容哈希的映射记录在文章清单里，已下载过的 URL 不再请求。
+图片以流式写入 images/.partial/ 下的临时文件，边写边算哈希，完成后原子重命名；
+中断留下的临时文件下次用 Range 请求续传，超过大小上限的图片直接放弃。
+同一张图片（同一个临时文件）同时只允许一个线程下载，其余线程等它完成后直接复用结果。
+"""
+
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+from urllib.parse import parse_qs, urlencode, urlparse, urlunparse
+
+IMAGE_DIRNAME = 'images'
+PARTIAL_DIRNAME = '.partial'
+
+DEFAULT_MAX_IMAGE_BYTES = 20 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+# mmbiz 链接中需要保留的参数（tp、wxfrom、wx_lazy 等只影响展示/统计，规范化时去掉）
+_MMBIZ_KEEP_PARAMS = ('wx_fmt',)
+
+# 正在下载的临时文件路径 → [锁, 等待和持有的线程数]（进程内所有 ImageStore 共用）
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+class ImageTooLargeError(Exception):
+    """图片超过单张大小上限"""
+
+
+def canonical_image_url(img_url):
+    """规范化图片 URL：统一 https、去掉 fragment 和 mmbiz 的统计参数（tp、wxfrom、wx_lazy 等）"""
+    parsed = urlparse(img_url.strip())
+    if parsed.scheme in ('', 'http') and parsed.netloc:
+        parsed = parsed._replace(scheme='https')
+    if 'mmbiz' in parsed.netloc:
+        params = parse_qs(parsed.query)
+        query = urlencode([(k, params[k][0]) for k in _MMBIZ_KEEP_PARAMS if k in params])
+        parsed = parsed._replace(query=query)
+    return urlunparse(parsed._replace(fragment=''))
+
+
+def guess_image_ext(content_type, img_url):
+    """根据 Content-Type 确定扩展名，无法判断时从 URL 推断"""
+    content_type = content_type or ''
+    if 'png' in content_type:
+        return '.png'
+    if 'jpg' in content_type or 'jpeg' in content_type:
+        return '.jpg'
+    if 'gif' in content_type:
+        return '.gif'
+    if 'webp' in content_type:
+        return '.webp'
+    # 从URL获取扩展名
+    url_path = img_url.split('?')[0]
+    return os.path.splitext(url_path)[1] or '.jpg'
+
+
+class ImageStore:
+    def __init__(self, output_dir, manifest, max_bytes=DEFAULT_MAX_IMAGE_BYTES):
+        self.output_dir = output_dir
+        self.image_dir = os.path.join(output_dir, IMAGE_DIRNAME)
+        self.partial_dir = os.path.join(self.image_dir, PARTIAL_DIRNAME)
+        self.manifest = manifest
+        self.max_bytes = max_bytes
+        self._dirs_ready = False
+
+    def _ensure_dirs(self):
+        if not self._dirs_ready:
+            os.makedirs(self.partial_dir, exist_ok=True)
+            self._dirs_ready = True
+
+    def lookup(self, img_url):
+        """URL 已下载过且文件仍在时返回相对路径，否则返回 None"""
+        record = self.manifest.get_image(canonical_image_url(img_url))
+        if record and os.path.exists(os.path.join(self.output_dir, record['path'])):
+            return record['path']
+        return None
+
+    def partial_path(self, img_url):
+        """URL 对应的续传临时文件"""
+        key = hashlib.sha256(canonical_image_url(img_url).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.partial_dir, f"{key}.part")
+
+    @contextmanager
+    def download_lock(self, img_url):
+        """
+        同一 URL 的下载互斥：多篇文章共用的横幅、二维码被多个线程同时下载时，
+        后来的线程在这里等待，拿到锁后应先 lookup，已经下载好的直接复用
+        """
+        key = os.path.abspath(self.partial_path(img_url))
+        with _in_flight_lock:
+            entry = _in_flight.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with _in_flight_lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del _in_flight[key]
+
+    def resume_offset(self, img_url):
+        """已下载的字节数（没有临时文件时为 0）"""
+        try:
+            return os.path.getsize(self.partial_path(img_url))
+        except OSError:
+            return 0
+
+    def discard_partial(self, img_url):
+        try:
+            os.remove(self.partial_path(img_url))
+        except OSError:
+            pass
+
+    def put_stream(self, img_url, response):
+        """
+        流式保存图片响应，返回相对路径；相同内容的文件已存在时不重复写入
+
+        响应为 206 时追加到已有的临时文件后面，否则从头写。
+        超过大小上限时删除临时文件并抛出 ImageTooLargeError。
+        调用方需持有 download_lock(img_url)，否则并发写同一个临时文件会损坏图片。
+        """
+        self._ensure_dirs()
+        part_path = self.partial_path(img_url)
+        hasher = hashlib.sha256()
+        written = 0
+
+        if response.status_code == 206 and os.path.exists(part_path):
+            mode = 'ab'
+            with open(part_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                    hasher.update(chunk)
+                    written += len(chunk)
+        else:
+            mode = 'wb'
+
+        content_length = response.headers.get('content-length')
+        if self.max_bytes and content_length and content_length.isdigit() \
+                and written + int(content_length) > self.max_bytes:
+            self.discard_partial(img_url)
+            raise ImageTooLargeError(f"图片大小 {written + int(content_length)} 字节超过上限 {self.max_bytes}")
+
+        with open(part_path, mode) as f:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                written += len(chunk)
+                if self.max_bytes and written > self.max_bytes:
+                    f.close()
+                    self.discard_partial(img_url)
+                    raise ImageTooLargeError(f"图片超过大小上限 {self.max_bytes} 字节")
+                hasher.update(chunk)
+                f.write(chunk)
+
+        digest = hasher.hexdigest()
+        ext = guess_image_ext(response.headers.get('content-type', ''), img_url)
+        rel_path = f"{IMAGE_DIRNAME}/{digest[:16]}{ext}"
+        filepath = os.path.join(self.output_dir, rel_path)
+
+        if os.path.exists(filepath):
+            os.remove(part_path)
+        else:
+            os.replace(part_path, filepath)
+
+        self.manifest.put_image(canonical_image_url(img_url), digest, rel_path, written)
+        return rel_path
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+近似重复文章检测（MinHash + LSH）
+
+用法示例：
+  python3 near_duplicates.py                   报告 docs/ 下所有公众号的重复簇
+  python3 near_duplicates.py --threshold 0.7   放宽相似度阈值
+  python3 near_duplicates.py --json dup.json   同时保存为 JSON
+  python3 near_duplicates.py --no-cache        忽略指纹缓存，全部重新计算
+
+正文去掉图片、链接地址和标点空白后，切成 5 字的片段（shingle），每个片段用 CRC32 哈希一次，
+按 one permutation hashing 分到 64 个桶、每个桶取最小值，得到 64 维 MinHash 签名（空桶从相邻桶补齐）。
+两篇文章签名中相同分量的比例即片段集合 Jaccard 相似度的估计。
+签名按每 4 维一段分成 16 段做 LSH：任意一段完全相同的文章才成为候选对（相似度 0.8 的文章对成为候选的概率约 99%），
+只对候选对计算相似度，总耗时与文章数近似线性。
+指纹按文件 mtime 和大小缓存在 docs/.fingerprint_cache.json，没有变化的文件不重新计算。
+
+下载器在取得正文之后、下载图片之前查询同一个索引：与已有文章的相似度达到 REFERENCE_THRESHOLD 时，
+不再保存正文和图片，只写一个指向已有文章的引用。引用只指向更早的文章（按文件名中的日期），
+引用文件本身不进入索引，不会出现两篇互相引用、正文都丢掉的情况。
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from collections import defaultdict
+from html import unescape
+
+from search_index import DOCS_DIR, scan_docs, split_article
+
+CACHE_FILENAME = '.fingerprint_cache.json'  # 放在文章根目录下
+
+SHINGLE_SIZE = 5
+NUM_BINS = 64
+BAND_ROWS = 4
+MIN_TEXT_CHARS = 100         # 去掉标点空白后少于这么多字的正文（占位文件、引用）不参与比较
+
+REPORT_THRESHOLD = 0.8       # 报告重复簇的相似度阈值
+REFERENCE_THRESHOLD = 0.9    # 下载时存为引用的相似度阈值（比报告更严格）
+
+# 引用文件（reference_html 生成）正文中的标记
+REFERENCE_MARKER = '不再单独保存正文和图片'
+
+# 签名参数变化时缓存失效
+_SIGNATURE_PARAMS = [2, SHINGLE_SIZE, NUM_BINS]
+
+_BIN_BITS = NUM_BINS.bit_length() - 1
+_EMPTY = 1 << 32
+
+# 不参与比较的部分：Markdown 图片和链接地址、HTML 标签、图片占位符、裸 URL
+_MARKDOWN_NOISE = re.compile(r'!\[[^\]]*\]\([^)]*\)|<[^>]+>|\]\([^)]*\)|__IMAGE_PLACEHOLDER_\d+__|https?://\S+')
+_TEXT_CHARS = re.compile(r'[0-9a-z㐀-䶿一-鿿]+')
+
+
+def normalize_text(text):
+    """只保留汉字、英文字母和数字（小写），去掉图片、链接地址、HTML 标签"""
+    return ''.join(_TEXT_CHARS.findall(unescape(_MARKDOWN_NOISE.sub(' ', text)).lower()))
+
+
+def minhash_signature(text):
+    """已规范化正文的 MinHash 签名（NUM_BINS 个整数），正文太短时返回 None"""
+    if len(text) < MIN_TEXT_CHARS:
+        return None
+    data = text.encode('utf-32-le')
+    width = SHINGLE_SIZE * 4
+    mins = [_EMPTY] * NUM_BINS
+    mask = NUM_BINS - 1
+    for offset in range(0, len(data) - width + 4, 4):
+        h = zlib.crc32(data[offset:offset + width])
+        b = h & mask
+        v = h >> _BIN_BITS
+        if v < mins[b]:
+            mins[b] = v
+    # 空桶用右侧最近的非空桶补齐，并加上距离，避免两篇文章的空桶碰巧相同
+    for b in range(NUM_BINS):
+        if mins[b] == _EMPTY:
+            for step in range(1, NUM_BINS):
+                value = mins[(b + step) % NUM_BINS]
+                if value < _EMPTY:
+                    mins[b] = value + step * _EMPTY
+                    break
+    return tuple(mins)
+
+
+def document_signature(document):
+    """下载器生成的 Markdown 文件（跳过标题、发布时间、原文链接头部）的签名；引用文件没有正文，返回 None"""
+    _, body = split_article(document, '')
+    if REFERENCE_MARKER in body:
+        return None
+    return minhash_signature(normalize_text(body))
+
+
+def similarity(sig1, sig2):
+    """Jaccard 相似度的估计：签名中相同分量的比例"""
+    return sum(a == b for a, b in zip(sig1, sig2)) / NUM_BINS
+
+
+def _band_keys(signature):
+    return [(band, hash(signature[band:band + BAND_ROWS])) for band in range(0, NUM_BINS, BAND_ROWS)]
+
+
+class FingerprintIndex:
+    """文章路径 → MinHash 签名，带 LSH 分段桶；可以被多个下载线程同时查询和添加"""
+
+    def __init__(self):
+        self.signatures = {}
+        self._buckets = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def add(self, path, signature):
+        with self._lock:
+            self._remove(path)
+            self.signatures[path] = signature
+            for key in _band_keys(signature):
+                self._buckets[key].add(path)
+
+    def remove(self, path):
+        with self._lock:
+            self._remove(path)
+
+    def _remove(self, path):
+        signature = self.signatures.pop(path, None)
+        if signature is not None:
+            for key in _band_keys(signature):
+                self._buckets[key].discard(path)
+
+    def query(self, signature, threshold=REPORT_THRESHOLD, exclude=None):
+        """与 signature 相似度不低于 threshold 的文章，[(相似度, 路径)]，相似度高的在前"""
+        with self._lock:
+            candidates = set().union(*(self._buckets.get(key, ()) for key in _band_keys(signature)))
+            candidates.discard(exclude)
+            matches = [(similarity(signature, self.signatures[path]), path) for path in candidates]
+        return sorted((match for match in matches if match[0] >= threshold), key=lambda m: (-m[0], m[1]))
+
+    def clusters(self, threshold=REPORT_THRESHOLD):
+        """相似度不低于 threshold 的文章对连通成簇，返回 [[路径, ...]]（每簇按路径排序，大簇在前）"""
+        parent = {}
+
+        def find(path):
+            while parent.get(path, path) != path:
+                parent[path] = parent.get(parent[path], parent[path])
+                path = parent[path]
+            return path
+
+        with self._lock:
+            checked = set()
+            for bucket in self._buckets.values():
+                if len(bucket) < 2:
+                    continue
+                members = sorted(bucket)
+                for i, path1 in enumerate(members):
+                    for path2 in members[i + 1:]:
+                        if (path1, path2) in checked:
+                            continue
+                        checked.add((path1, path2))
+                        if similarity(self.signatures[path1], self.signatures[path2]) >= threshold:
+                            root1, root2 = find(path1), find(path2)
+                            parent.setdefault(root1, root1)
+                            parent.setdefault(root2, root2)
+                            if root1 != root2:
+                                parent[max(root1, root2)] = min(root1, root2)
+
+        groups = defaultdict(list)
+        for path in parent:
+            groups[find(path)].append(path)
+        return sorted((sorted(group) for group in groups.values()), key=lambda group: (-len(group), group))
+
+
+def _load_cache(cache_path):
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache.get('files', {}) if cache.get('params') == _SIGNATURE_PARAMS else {}
+
+
+def _save_cache(cache_path, files):
+    tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'params': _SIGNATURE_PARAMS, 'files': files}, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, cache_path)
+
+
+def build_index(docs_dir=DOCS_DIR, use_cache=True):
+    """为 docs_dir 下所有公众号的文章建立索引，返回 (索引, 统计 {'docs', 'indexed', 'computed', 'elapsed'})"""
+    start_time = time.monotonic()
+    cache_path = os.path.join(docs_dir, CACHE_FILENAME)
+    cache = _load_cache(cache_path) if use_cache else {}
+    files = {}
+    index = FingerprintIndex()
+    computed = 0
+    for path, _, _, _ in scan_docs(docs_dir):
+        stat = os.stat(path)
+        cached = cache.get(path)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            signature = tuple(cached[2]) if cached[2] else None
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                signature = document_signature(f.read())
+            computed += 1
+        files[path] = [stat.st_mtime_ns, stat.st_size, list(signature) if signature else None]
+        if signature:
+            index.add(path, signature)
+
+    if use_cache and files != cache:
+        _save_cache(cache_path, files)
+    stats = {'docs': len(files), 'indexed': len(index), 'computed': computed,
+             'elapsed': time.monotonic() - start_time}
+    return index, stats
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_index(docs_dir):
+    """进程内按 docs 目录共享的索引（多个公众号并发下载时只建一次），首次调用时建立"""
+    key = os.path.abspath(docs_dir)
+    with _shared_lock:
+        if key not in _shared:
+            _shared[key], _ = build_index(docs_dir)
+        return _shared[key]
+
+
+def reference_html(target_path, output_dir, ratio):
+    """重复文章的正文：指向已有文章的相对链接（HTML，交给下载器与普通正文一样转为 Markdown）"""
+    link = os.path.relpath(target_path, output_dir).replace(os.sep, '/').replace(' ', '%20')
+    if not link.startswith('.'):
+        link = './' + link
+    title = os.path.basename(target_path)[:-len('.md')].split('_', 1)[-1]
+    return (f'<p>与 <a href="{link}">{title}</a> 内容重复（相似度 {ratio:.0%}），'
+            f'{REFERENCE_MARKER}，请阅读该文或访问原文链接。</p>')
+
+
+def date_order(path):
+    """文章的先后顺序：文件名以日期开头，同一天按标题、路径"""
+    return os.path.basename(path), path
+
+
+def _by_date(cluster):
+    """按文件名（日期开头）排序，最早的文章在前"""
+    return sorted(cluster, key=date_order)
+
+
+def print_clusters(index, clusters, threshold):
+    """打印重复簇：每簇以最早的文章为基准，列出其余文章与它的相似度"""
+    if not clusters:
+        print(f"没有发现相似度 ≥ {threshold:.0%} 的重复文章")
+        return
+    duplicates = sum(len(cluster) - 1 for cluster in clusters)
+    print(f"发现 {len(clusters)} 个重复簇，共 {duplicates} 篇重复文章（相似度 ≥ {threshold:.0%}）\n")
+    for number, cluster in enumerate(clusters, 1):
+        ordered = _by_date(cluster)
+        base = ordered[0]
+        print(f"[{number}] {len(cluster)} 篇")
+        print(f"    基准  {base}")
+        for path in ordered[1:]:
+            print(f"    {similarity(index.signatures[base], index.signatures[path]):>5.0%} {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检测 docs/ 下各公众号之间的近似重复文章（MinHash + LSH）")
+    parser.add_argument("--docs", default=DOCS_DIR, help=f"文章根目录，默认 {DOCS_DIR}")
+    parser.add_argument("--threshold", type=float, default=REPORT_THRESHOLD,
+                        help=f"相似度阈值（0~1），默认 {REPORT_THRESHOLD}")
+    parser.add_argument("--json", dest="json_path", help="把重复簇保存为 JSON")
+    parser.add_argument("--no-cache", action="store_true", help="忽略指纹缓存，全部重新计算")
+    args = parser.parse_args()
+
+    start_time = time.monotonic()
+    index, stats = build_index(args.docs, use_cache=not args.no_cache)
+    clusters = index.clusters(args.threshold)
+    print(f"🔎 {stats['docs']} 篇文章，参与比较 {stats['indexed']} 篇，重新计算指纹 {stats['computed']} 篇，"
+          f"耗时 {time.monotonic() - start_time:.2f}s\n")
+    print_clusters(index, clusters, args.threshold)
+
+    if args.json_path:
+        payload = []
+        for cluster in clusters:
+            ordered = _by_date(cluster)
+            payload.append([{'path': path, 'similarity': round(similarity(index.signatures[ordered[0]],
+                                                                           index.signatures[path]), 3)}
+                            for path in ordered])
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+        print(f"\n已保存: {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+图片压缩：把公众号目录下的 PNG / JPEG / GIF 转码为 WebP（或 AVIF）
+
+用法示例：
+  python3 optimize_images.py all
+  python3 optimize_images.py 金渐层 --format avif --quality 55
+  python3 optimize_images.py all --max-width 1280 --widths 480,960 --jobs 8
+  python3 optimize_images.py all --dry-run          只统计能省下多少字节，不写文件
+
+需要 Pillow（pip install Pillow，可选依赖，下载和生成站点都不依赖它）；AVIF 需要 Pillow 11.3+ 或 pillow-avif-plugin。
+
+转码在进程池中进行：
+  - 宽高超过上限的图片等比缩小，转码后不比原图小的保留原图
+  - 输出按内容哈希命名（images/<sha256 前 16 位>.webp），与 image_store 一致，相同图片只存一份
+  - 比 --widths 宽得多的图片额外生成响应式版本（images/<哈希>-480w.webp），Markdown 中改写为带 srcset 的 <img>
+  - Markdown 引用和文章清单中的图片路径同步改写，原图随后删除（--keep-originals 保留）
+动图 GIF 转为动画 WebP，不缩放、不生成响应式版本；AVIF 模式下保留原 GIF。
+"""
+
+import argparse
+import hashlib
+import html
+import io
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+from article_manifest import ArticleManifest, MANIFEST_FILENAME
+from image_store import IMAGE_DIRNAME
+
+DOCS_DIR = 'docs'
+
+SOURCE_EXTS = ('.png', '.jpg', '.jpeg', '.gif')
+
+# 格式 → (Pillow 格式名, 扩展名, 默认质量)
+FORMATS = {
+    'webp': ('WEBP', '.webp', 80),
+    'avif': ('AVIF', '.avif', 55),
+}
+
+DEFAULT_MAX_WIDTH = 1600
+DEFAULT_MAX_HEIGHT = 8000  # 长截图很常见，只限制极端情况
+DEFAULT_WIDTHS = (480, 960)
+# 只生成明显更小的响应式版本：宽度不超过主图的 75%，字节数不超过主图的 70%
+VARIANT_MAX_SCALE = 0.75
+VARIANT_MAX_BYTES_RATIO = 0.7
+
+# 默认主题正文宽度约 740px，窄屏占满宽度
+IMG_SIZES = '(max-width: 740px) 100vw, 740px'
+
+_VARIANT_NAME = re.compile(r'^([0-9a-f]{16})-(\d+)w(\.\w+)$')
+# html2text 输出的图片：![alt](images/x.png)，路径含空格时为 ![alt](<images/x y.png>)
+_MARKDOWN_IMAGE = re.compile(r'!\[([^\]]*)\]\((?:<(' + IMAGE_DIRNAME + r'/[^>]+)>|(' + IMAGE_DIRNAME + r'/[^)\s]+))\)')
+
+# 工作进程的转码参数
+_options = {}
+
+
+def _init_worker(options):
+    global _options
+    _options = options
+    if options['format'] == 'avif':
+        _register_avif()
+
+
+def _register_avif():
+    """确保 Pillow 能写 AVIF（旧版 Pillow 需要 pillow-avif-plugin）"""
+    if 'AVIF' in Image.SAVE:
+        return True
+    try:
+        import pillow_avif  # noqa: F401  导入时注册 AVIF 编解码器
+    except ImportError:
+        return False
+    return 'AVIF' in Image.SAVE
+
+
+def _normalize_mode(image):
+    """转成编码器支持的 RGB / RGBA（调色板和带透明度的图保留透明通道）"""
+    if image.mode in ('RGB', 'RGBA'):
+        return image
+    if image.mode in ('P', 'LA', 'PA') or 'transparency' in image.info:
+        return image.convert('RGBA')
+    return image.convert('RGB')
+
+
+def _encode(image, animated=False):
+    buffer = io.BytesIO()
+    pil_format = FORMATS[_options['format']][0]
+    if animated:
+        image.save(buffer, format=pil_format, quality=_options['quality'], save_all=True)
+    else:
+        image.save(buffer, format=pil_format, quality=_options['quality'])
+    return buffer.getvalue()
+
+
+def _write_bytes(path, data):
+    if _options['dry_run'] or os.path.exists(path):
+        return
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def convert_one(task):
+    """
+    转码一张图片，返回结果：
+    status 为 converted / kept（转码后不更小或不支持）/ error；
+    path / new_path 为相对公众号目录的路径，variants 为 [(宽度, 相对路径)]
+    """
+    output_dir, name = task
+    src_path = os.path.join(output_dir, IMAGE_DIRNAME, name)
+    before = os.path.getsize(src_path)
+    result = {'output_dir': output_dir, 'path': f"{IMAGE_DIRNAME}/{name}", 'status': 'kept', 'new_path': None,
+              'hash': None, 'width': None, 'variants': [], 'before': before, 'after': before, 'variant_bytes': 0}
+    ext = FORMATS[_options['format']][1]
+
+    try:
+        with Image.open(src_path) as source:
+            animated = getattr(source, 'is_animated', False)
+            if animated:
+                if _options['format'] != 'webp':
+                    return result
+                image = source
+                data = _encode(source, animated=True)
+            else:
+                image = _normalize_mode(ImageOps.exif_transpose(source))
+                image.thumbnail((_options['max_width'], _options['max_height']), Image.Resampling.LANCZOS)
+                data = _encode(image)
+
+            if len(data) >= before:
+                return result
+
+            digest = hashlib.sha256(data).hexdigest()
+            new_path = f"{IMAGE_DIRNAME}/{digest[:16]}{ext}"
+            _write_bytes(os.path.join(output_dir, new_path), data)
+            result.update(status='converted', new_path=new_path, hash=digest, width=image.width, after=len(data))
+
+            if animated:
+                return result
+            for width in _options['widths']:
+                if width > image.width * VARIANT_MAX_SCALE:
+                    continue
+                height = max(1, round(image.height * width / image.width))
+                variant = _encode(image.resize((width, height), Image.Resampling.LANCZOS))
+                if len(variant) > len(data) * VARIANT_MAX_BYTES_RATIO:
+                    continue
+                variant_path = f"{IMAGE_DIRNAME}/{digest[:16]}-{width}w{ext}"
+                _write_bytes(os.path.join(output_dir, variant_path), variant)
+                result['variants'].append((width, variant_path))
+                result['variant_bytes'] += len(variant)
+    except Exception as e:
+        result.update(status='error', error=str(e))
+    return result
+
+
+def find_image_dirs(docs_dir=DOCS_DIR):
+    """docs/ 下所有带图片目录的公众号目录"""
+    if not os.path.isdir(docs_dir):
+        return []
+    return sorted(
+        os.path.join(docs_dir, name)
+        for name in os.listdir(docs_dir)
+        if os.path.isdir(os.path.join(docs_dir, name, IMAGE_DIRNAME))
+    )
+
+
+def list_sources(output_dir):
+    """图片目录下待转码的原图文件名"""
+    image_dir = os.path.join(output_dir, IMAGE_DIRNAME)
+    if not os.path.isdir(image_dir):
+        return []
+    return sorted(
+        entry.name for entry in os.scandir(image_dir)
+        if entry.is_file() and os.path.splitext(entry.name)[1].lower() in SOURCE_EXTS
+    )
+
+
+def scan_variants(output_dir):
+    """已生成的响应式版本 {主图相对路径: [(宽度, 相对路径)]}，供之前转码过的图片改写引用"""
+    variants = defaultdict(list)
+    image_dir = os.path.join(output_dir, IMAGE_DIRNAME)
+    if os.path.isdir(image_dir):
+        for name in os.listdir(image_dir):
+            match = _VARIANT_NAME.match(name)
+            if match:
+                digest, width, ext = match.groups()
+                variants[f"{IMAGE_DIRNAME}/{digest}{ext}"].append((int(width), f"{IMAGE_DIRNAME}/{name}"))
+    return {path: sorted(items) for path, items in variants.items()}
+
+
+def image_tag(path, alt, variants, width):
+    """带 srcset 的 <img>（相对路径加 ./，由 VuePress 按资源处理）"""
+    srcset = ', '.join(f"./{variant} {w}w" for w, variant in variants + [(width, path)])
+    return (f'<img src="./{path}" srcset="{srcset}" sizes="{IMG_SIZES}" '
+            f'alt="{html.escape(alt)}" loading="lazy">')
+
+
+def rewrite_markdown(output_dir, replacements, variants, widths):
+    """
+    改写公众号目录下 Markdown 中的图片引用，返回 (改写的文件数, 仍被引用的原图路径)
+
+    replacements 为 {原图路径: 转码后路径}；转码后的图片有响应式版本时改写为 <img srcset>，
+    之前转码过、后来又被重新渲染成普通 Markdown 图片的引用也会补上 srcset。
+    """
+    changed = 0
+    still_referenced = set()
+
+    def replace(match):
+        alt, path = match.group(1), match.group(2) or match.group(3)
+        path = replacements.get(path, path)
+        if path in variants and path in widths:
+            return image_tag(path, alt, variants[path], widths[path])
+        if path == (match.group(2) or match.group(3)):
+            return match.group(0)
+        return f"![{alt}]({path})"
+
+    for entry in os.scandir(output_dir):
+        if not entry.is_file() or not entry.name.endswith('.md'):
+            continue
+        with open(entry.path, 'r', encoding='utf-8') as f:
+            document = f.read()
+        if f"{IMAGE_DIRNAME}/" not in document:
+            continue
+        new_document = _MARKDOWN_IMAGE.sub(replace, document)
+        still_referenced.update(old for old in replacements if old in new_document)
+        if new_document != document:
+            tmp_path = f"{entry.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(new_document)
+            os.replace(tmp_path, entry.path)
+            changed += 1
+    return changed, still_referenced
+
+
+def _main_widths(output_dir, paths):
+    """读取之前转码过的主图宽度（只读文件头）"""
+    widths = {}
+    for path in paths:
+        try:
+            with Image.open(os.path.join(output_dir, path)) as image:
+                widths[path] = image.width
+        except OSError:
+            pass
+    return widths
+
+
+def update_manifest(output_dir, converted):
+    """文章清单中的图片记录指向转码后的文件（没有清单的目录跳过）"""
+    if not converted or not os.path.exists(os.path.join(output_dir, MANIFEST_FILENAME)):
+        return
+    manifest = ArticleManifest(output_dir)
+    try:
+        manifest.replace_image_paths({r['path']: (r['new_path'], r['hash'], r['after']) for r in converted})
+    finally:
+        manifest.close()
+
+
+def finish_account(output_dir, results, keep_originals=False):
+    """改写引用、更新清单、删除原图，返回该公众号的统计"""
+    converted = [r for r in results if r['status'] == 'converted']
+    replacements = {r['path']: r['new_path'] for r in converted}
+
+    variants = scan_variants(output_dir)
+    widths = _main_widths(output_dir, set(variants) - {r['new_path'] for r in converted})
+    widths.update((r['new_path'], r['width']) for r in converted)
+
+    changed, still_referenced = rewrite_markdown(output_dir, replacements, variants, widths)
+    update_manifest(output_dir, converted)
+
+    removed = 0
+    if not keep_originals:
+        for r in converted:
+            if r['path'] not in still_referenced:
+                os.remove(os.path.join(output_dir, r['path']))
+                removed += 1
+    return {'markdown': changed, 'removed': removed}
+
+
+def summarize(results):
+    stats = {'images': len(results), 'converted': 0, 'kept': 0, 'error': 0,
+             'before': 0, 'after': 0, 'variant_bytes': 0, 'variants': 0}
+    for r in results:
+        stats[r['status']] += 1
+        stats['before'] += r['before']
+        stats['after'] += r['after']
+        stats['variant_bytes'] += r['variant_bytes']
+        stats['variants'] += len(r['variants'])
+    stats['saved'] = stats['before'] - stats['after'] - stats['variant_bytes']
+    return stats
+
+
+def optimize(output_dirs, fmt='webp', quality=None, max_width=DEFAULT_MAX_WIDTH, max_height=DEFAULT_MAX_HEIGHT,
+             widths=DEFAULT_WIDTHS, jobs=None, keep_originals=False, dry_run=False):
+    """转码多个公众号目录下的图片，返回 {公众号目录: 统计}"""
+    if Image is None:
+        print("❌ 需要安装 Pillow：pip install Pillow")
+        return {}
+    if fmt == 'avif' and not _register_avif():
+        print("❌ 当前 Pillow 不支持 AVIF：升级到 Pillow 11.3+ 或 pip install pillow-avif-plugin")
+        return {}
+
+    start_time = time.monotonic()
+    options = {'format': fmt, 'quality': quality or FORMATS[fmt][2], 'max_width': max_width,
+               'max_height': max_height, 'widths': tuple(sorted(widths)), 'dry_run': dry_run}
+    tasks = [(output_dir, name) for output_dir in output_dirs for name in list_sources(output_dir)]
+    print(f"转码 {len(tasks)} 张图片（{len(output_dirs)} 个目录，{fmt}，质量 {options['quality']}）...")
+
+    by_dir = defaultdict(list)
+    if tasks:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(options,)) as pool:
+            for result in pool.map(convert_one, tasks, chunksize=4):
+                by_dir[result['output_dir']].append(result)
+                if result['status'] == 'error':
+                    print(f"  ⚠️ {result['output_dir']}/{result['path']}: {result['error']}")
+
+    report = {}
+    for output_dir in output_dirs:
+        results = by_dir.get(output_dir, [])
+        stats = summarize(results)
+        if not dry_run:
+            stats.update(finish_account(output_dir, results, keep_originals=keep_originals))
+        report[output_dir] = stats
+
+    print(f"✅ 完成，耗时 {time.monotonic() - start_time:.1f}s")
+    return report
+
+
+def _format_mb(size):
+    return f"{size / 1024 / 1024:.1f} MB"
+
+
+def print_report(report, dry_run=False):
+    """按公众号打印转码前后的字节数"""
+    print(f"\n{'公众号':<16}{'图片':>6}{'转码':>6}{'保留':>6}{'失败':>6}{'原图':>11}{'转码后':>11}"
+          f"{'响应式':>11}{'节省':>11}{'比例':>8}")
+    total = defaultdict(int)
+    for output_dir, stats in report.items():
+        for key in ('images', 'converted', 'kept', 'error', 'before', 'after', 'variant_bytes', 'saved'):
+            total[key] += stats[key]
+        _print_row(os.path.basename(output_dir), stats)
+    if len(report) > 1:
+        _print_row('合计', total)
+    if dry_run:
+        print("\n（--dry-run：未写入任何文件）")
+
+
+def _print_row(name, stats):
+    ratio = stats['saved'] / stats['before'] * 100 if stats['before'] else 0.0
+    print(f"{name:<16}{stats['images']:>6}{stats['converted']:>6}{stats['kept']:>6}{stats['error']:>6}"
+          f"{_format_mb(stats['before']):>11}{_format_mb(stats['after']):>11}"
+          f"{_format_mb(stats['variant_bytes']):>11}{_format_mb(stats['saved']):>11}{ratio:>7.1f}%")
+
+
+def _parse_widths(value):
+    return tuple(int(width) for width in value.split(',') if width.strip()) if value else ()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把文章图片转码为 WebP / AVIF，生成响应式版本并改写 Markdown")
+    parser.add_argument("account", nargs="?", help="公众号名（docs/ 下的目录名），all 为全部")
+    parser.add_argument("--dir", dest="output_dir", help="直接指定文章目录，例如 docs/美投investing")
+    parser.add_argument("--format", choices=sorted(FORMATS), default='webp', help="输出格式（默认 webp）")
+    parser.add_argument("--quality", "-q", type=int, default=None, help="编码质量（默认 webp 80、avif 55）")
+    parser.add_argument("--max-width", type=int, default=DEFAULT_MAX_WIDTH, help="宽度上限（像素）")
+    parser.add_argument("--max-height", type=int, default=DEFAULT_MAX_HEIGHT, help="高度上限（像素）")
+    parser.add_argument("--widths", type=_parse_widths, default=DEFAULT_WIDTHS,
+                        help="响应式版本的宽度，逗号分隔（默认 480,960，空字符串为不生成）")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="进程数，默认 CPU 核数")
+    parser.add_argument("--keep-originals", action="store_true", help="保留原图文件")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不写文件、不改 Markdown")
+    parser.add_argument("--report", help="把每个公众号的统计保存为 JSON")
+    args = parser.parse_args()
+
+    if args.output_dir:
+        output_dirs = [args.output_dir]
+    elif args.account == 'all':
+        output_dirs = find_image_dirs()
+    elif args.account:
+        output_dirs = [os.path.join(DOCS_DIR, args.account)]
+    else:
+        parser.print_help()
+        return
+
+    report = optimize(output_dirs, fmt=args.format, quality=args.quality, max_width=args.max_width,
+                      max_height=args.max_height, widths=args.widths, jobs=args.jobs,
+                      keep_originals=args.keep_originals, dry_run=args.dry_run)
+    if report:
+        print_report(report, dry_run=args.dry_run)
+    if report and args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n统计已保存: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
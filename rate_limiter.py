@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+按域名自适应的请求限速
+
+每个域名一个令牌桶，发请求前取令牌；速率按 AIMD 调整：
+  - 正常响应：速率加性增长，直到上限
+  - 429、验证页、列表接口频率限制：速率减半，并暂停一段时间（有 Retry-After 时按它）
+  - 5xx、连接错误：速率小幅下降
+等待时间带随机抖动，避免多个线程同时醒来。
+mp.weixin.qq.com（列表和文章页）与 mmbiz 图片 CDN 分开限速，多个公众号共享同一个 RateController。
+"""
+
+import random
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+# 域名分组 → 初始速率、最低速率、上限（每秒请求数）、突发数、每次正常响应的增速
+PROFILES = {
+    'mp': {'rate': 1.0, 'min_rate': 0.1, 'max_rate': 4.0, 'burst': 1, 'increase': 0.05},
+    'mmbiz': {'rate': 8.0, 'min_rate': 1.0, 'max_rate': 32.0, 'burst': 8, 'increase': 0.5},
+    'default': {'rate': 2.0, 'min_rate': 0.2, 'max_rate': 8.0, 'burst': 2, 'increase': 0.1},
+}
+
+THROTTLE_DECREASE = 0.5   # 被限流时速率乘以此系数
+ERROR_DECREASE = 0.8      # 5xx / 连接错误时速率乘以此系数
+MAX_PAUSE = 120.0         # 被限流后最长暂停（秒）
+DEFAULT_JITTER = 0.2
+
+# 验证页 / 环境异常页的特征（HTTP 200，但没有正文）
+VERIFY_MARKERS = ('环境异常', '完成验证', '去验证', 'wappoc_appmsgcaptcha', 'secitptpage/verify')
+# 列表接口的频率限制（base_resp.ret）
+_FREQ_CONTROL = re.compile(r'"ret"\s*:\s*(200013|-6)\b')
+
+
+def host_group(url):
+    """URL 所属的限速分组：mp / mmbiz / 其他域名本身"""
+    host = urlparse(url).netloc.lower()
+    if host == 'mp.weixin.qq.com':
+        return 'mp'
+    if 'mmbiz' in host:
+        return 'mmbiz'
+    return host
+
+
+def is_throttle_response(response, inspect_body=True):
+    """响应是否为限流信号：429、验证页或列表接口的频率限制（inspect_body=False 时只看状态码，用于流式响应）"""
+    if response.status_code == 429:
+        return True
+    if response.status_code != 200 or not inspect_body:
+        return False
+    text = response.text
+    if 'js_content' in text:
+        return False
+    return any(marker in text for marker in VERIFY_MARKERS) or bool(_FREQ_CONTROL.search(text[:2000]))
+
+
+def retry_after_seconds(response):
+    """解析 Retry-After（只支持秒数）"""
+    value = response.headers.get('retry-after', '')
+    return min(float(value), MAX_PAUSE) if value.isdigit() else None
+
+
+def backoff_delay(attempt, base=1.0, cap=60.0, jitter=DEFAULT_JITTER):
+    """第 attempt 次重试（从 0 开始）前的等待时间：指数退避加抖动"""
+    delay = min(cap, base * 2 ** attempt)
+    return delay * random.uniform(1 - jitter, 1 + jitter)
+
+
+class AdaptiveRateLimiter:
+    """单个域名的令牌桶，速率按 AIMD 调整"""
+
+    def __init__(self, rate, min_rate, max_rate, burst=1, increase=0.1, jitter=DEFAULT_JITTER):
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, max_rate)
+        self.rate = min(rate, max_rate)
+        self.burst = burst
+        self.increase = increase
+        self.jitter = jitter
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """取一个令牌，必要时等待；返回等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            wait_time = max(-self._tokens / self.rate, self._paused_until - now, 0.0)
+        if wait_time > 0:
+            wait_time *= 1 + random.uniform(0, self.jitter)
+            time.sleep(wait_time)
+        return wait_time
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after=None):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * THROTTLE_DECREASE)
+            pause = retry_after if retry_after is not None else min(MAX_PAUSE, 2 / self.rate)
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+            self._tokens = min(self._tokens, 0.0)
+
+    def on_error(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * ERROR_DECREASE)
+
+
+class RateController:
+    """按域名分组的限速器集合，多个下载器（公众号）共享"""
+
+    def __init__(self, max_rate=None, max_image_rate=None, jitter=DEFAULT_JITTER, enabled=True):
+        """
+        Args:
+            max_rate: mp.weixin.qq.com 及其他域名的速率上限（每秒请求数），None 为默认值
+            max_image_rate: mmbiz 图片 CDN 的速率上限
+            enabled: False 时不限速（本地基准测试），仍按退避时间重试
+        """
+        self.ceilings = {'mp': max_rate, 'default': max_rate, 'mmbiz': max_image_rate}
+        self.jitter = jitter
+        self.enabled = enabled
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, url):
+        group = host_group(url)
+        with self._lock:
+            limiter = self._limiters.get(group)
+            if limiter is None:
+                profile_name = group if group in PROFILES else 'default'
+                profile = dict(PROFILES[profile_name])
+                if self.ceilings.get(profile_name):
+                    profile['max_rate'] = self.ceilings[profile_name]
+                limiter = self._limiters[group] = AdaptiveRateLimiter(jitter=self.jitter, **profile)
+            return limiter
+
+    def acquire(self, url):
+        """发请求前调用，返回等待的秒数"""
+        if not self.enabled:
+            return 0.0
+        return self.limiter(url).acquire()
+
+    def record(self, url, response, inspect_body=True):
+        """根据响应调整速率，返回是否为限流信号"""
+        throttled = is_throttle_response(response, inspect_body)
+        if not self.enabled:
+            return throttled
+        limiter = self.limiter(url)
+        if throttled:
+            limiter.on_throttle(retry_after_seconds(response))
+        elif response.status_code >= 500:
+            limiter.on_error()
+        else:
+            limiter.on_success()
+        return throttled
+
+    def record_error(self, url):
+        """连接错误、超时"""
+        if self.enabled:
+            self.limiter(url).on_error()
+
+    def rates(self):
+        """当前各域名分组的速率 {分组: 每秒请求数}"""
+        with self._lock:
+            return {group: round(limiter.rate, 3) for group, limiter in self._limiters.items()}
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+相关文章预计算（字符 n-gram TF-IDF + 余弦相似度）
+
+用法示例：
+  python3 related_articles.py                  增量更新（只对新增、修改的文章分词和计算相似度）
+  python3 related_articles.py --full           全部重建
+  python3 related_articles.py -k 8             每篇文章保留 8 篇相关文章（改变 k 会全部重建）
+  python3 related_articles.py --show docs/金渐层/2025-01-02_标题.md   打印某篇文章的相关文章
+
+需要 NumPy（pip install numpy，可选依赖，下载和生成站点都不依赖它）。
+
+做法：
+  - 正文（标题计两次）只保留汉字、字母和数字，取 2、3 字的 n-gram，用向量化的哈希映射到 2^20 个桶；
+    词频取 1 + log(tf)，乘以按桶统计的 IDF
+  - 向量按稀疏格式保存（每篇文章约几千个非零桶），内存与文章总字数线性相关
+  - 按块计算一批文章与全部文章的余弦相似度（稀疏矩阵乘法，每块不超过 BLOCK_BUDGET 个元素），
+    用 argpartition 取前 k 个，不生成 N×N 的相似度矩阵；全量重建的计算量随文章对数增长，内存不随之增长
+  - 增量更新：新文章与全部文章算一块相似度，按对称性同时并入已有文章的前 k 个；删除、修改的文章只重算受影响的行。
+    IDF 沿用上次全量重建时的文档频率，文章数比那时增加超过 REBUILD_GROWTH 时自动全量重建
+
+输出：
+  docs/.vuepress/public/related.json   站点使用：{"docs": [[链接, 标题, 公众号, 日期]], "related": [[文档号, 相似度%, ...]]}
+                                       部署时生成（不提交），文章页底部由 components/RelatedArticles.vue 读取并显示
+  docs/.related_cache.npz              增量更新用的分词结果、文档频率和前 k 个
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+import zipfile
+from urllib.parse import quote
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from generate_sidebar import write_if_changed
+from near_duplicates import normalize_text
+from search_index import DOCS_DIR, scan_docs, split_article
+
+ARTIFACT_PATH = 'docs/.vuepress/public/related.json'
+CACHE_FILENAME = '.related_cache.npz'  # 放在文章根目录下
+
+NGRAM_SIZES = (2, 3)
+HASH_BITS = 20
+MAX_DF = 0.2             # 出现在超过 20% 文章中的 n-gram 不参与相似度计算（只计入向量长度）
+TOP_K = 5
+BLOCK_BUDGET = 1 << 20   # 每块中间结果的元素数上限
+MIN_SCORE = 0.05         # 相似度低于此值的不算相关
+TITLE_REPEAT = 2
+REBUILD_GROWTH = 0.2     # 文章数比上次全量重建时增加超过 20% 时重新统计文档频率
+
+# 参数变化时缓存失效
+_PARAMS = [1, list(NGRAM_SIZES), HASH_BITS, MAX_DF, TITLE_REPEAT]
+
+
+def ngram_counts(text):
+    """文本中 2、3 字 n-gram 的哈希桶及出现次数：(桶号 uint32 升序, 次数 uint32)"""
+    codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    parts = []
+    for n in NGRAM_SIZES:
+        if len(codes) < n:
+            continue
+        count = len(codes) - n + 1
+        h = np.full(count, n, dtype=np.uint64)
+        for i in range(n):
+            h = (h * np.uint64(0x100000001B3)) ^ codes[i:i + count]
+        parts.append(h)
+    if not parts:
+        return np.zeros(0, np.uint32), np.zeros(0, np.uint32)
+    h = np.concatenate(parts)
+    # splitmix64 的混合步骤，让高位分布均匀
+    h ^= h >> np.uint64(30)
+    h *= np.uint64(0xBF58476D1CE4E5B9)
+    h ^= h >> np.uint64(27)
+    h *= np.uint64(0x94D049BB133111EB)
+    h ^= h >> np.uint64(31)
+    buckets, counts = np.unique((h >> np.uint64(64 - HASH_BITS)).astype(np.uint32), return_counts=True)
+    return buckets, counts.astype(np.uint32)
+
+
+def article_text(document, fallback_title):
+    """参与计算的文本：标题重复 TITLE_REPEAT 次 + 正文"""
+    title, body = split_article(document, fallback_title)
+    return title, normalize_text(title) * TITLE_REPEAT + normalize_text(body)
+
+
+def document_frequency(indices):
+    """每个桶出现在多少篇文章中"""
+    return np.bincount(indices, minlength=1 << HASH_BITS).astype(np.int32)
+
+
+def _expand(starts, lengths):
+    """把若干段 [start, start + length) 拼成一个下标数组"""
+    lengths = np.asarray(lengths, dtype=np.int64)
+    if not len(lengths):
+        return np.zeros(0, dtype=np.int64)
+    shifts = np.asarray(starts, dtype=np.int64) - np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    return np.repeat(shifts, lengths) + np.arange(lengths.sum())
+
+
+class TfidfMatrix:
+    """
+    文章 × n-gram 桶的稀疏 TF-IDF 矩阵（每行 L2 归一化），按块计算余弦相似度
+
+    IDF 按 df_docs 篇文章时的文档频率 df 计算（平滑 IDF：log((1 + N) / (1 + df)) + 1）。
+    只出现在一篇文章中的桶对相似度没有贡献，当时出现在超过 MAX_DF 的文章中的桶几乎没有区分度，
+    两者只计入向量长度、不参与乘法。同时按行（文章 → 桶）和按列（桶 → 文章）保存剩下的元素，
+    一块文章与全部文章的相似度 = 块内每个元素 × 同一个桶的所有文章，用 bincount 累加。
+    """
+
+    def __init__(self, offsets, indices, counts, df, df_docs):
+        self.docs = len(offsets) - 1
+        doc_ids = np.repeat(np.arange(self.docs, dtype=np.int32), np.diff(offsets))
+        # 数组与非零元素个数同长，尽量原地计算，避免 float64 临时数组
+        idf = (np.log((1 + df_docs) / (1 + df)) + 1).astype(np.float32)
+        weights = counts.astype(np.float32)
+        np.log(weights, out=weights)
+        weights += 1
+        weights *= idf[indices]
+        norms = np.sqrt(np.bincount(doc_ids, weights * weights, minlength=self.docs))
+        weights *= (1 / np.where(norms > 0, norms, 1)).astype(np.float32)[doc_ids]
+
+        joinable = ((np.bincount(indices, minlength=1 << HASH_BITS) >= 2)
+                    & (df <= max(MAX_DF * df_docs, 2)))
+        keep = joinable[indices]
+        self._buckets = indices[keep]
+        self._weights = weights[keep]
+        row_docs = doc_ids[keep]
+        del doc_ids, weights, keep
+        self._row_lengths = np.bincount(row_docs, minlength=self.docs)
+        self._row_starts = np.concatenate(([0], np.cumsum(self._row_lengths)))
+
+        order = np.argsort(self._buckets, kind='stable')
+        self._posting_docs = row_docs[order]
+        self._posting_weights = self._weights[order]
+        del order
+        self._df = np.bincount(self._buckets, minlength=1 << HASH_BITS).astype(np.int32)
+        self._posting_starts = np.concatenate(([0], np.cumsum(self._df, dtype=np.int64)))
+        # 每行参与乘法的元素个数，用来切块
+        self._row_costs = np.bincount(row_docs, self._df[self._buckets], minlength=self.docs).astype(np.int64)
+
+    def similarity_blocks(self, rows):
+        """
+        按块产出 (块内文章号, 它们与全部文章的余弦相似度)，相似度矩阵为 float32、自身为 -inf；
+        每块的中间结果和相似度矩阵都不超过 BLOCK_BUDGET 个元素（单篇文章超出时单独成块）
+        """
+        max_rows = max(1, BLOCK_BUDGET // max(self.docs, 1))
+        start = 0
+        while start < len(rows):
+            stop, cost = start + 1, self._row_costs[rows[start]]
+            while (stop < len(rows) and stop - start < max_rows
+                   and cost + self._row_costs[rows[stop]] <= BLOCK_BUDGET):
+                cost += self._row_costs[rows[stop]]
+                stop += 1
+            block = rows[start:stop]
+            entries = _expand(self._row_starts[block], self._row_lengths[block])
+            buckets = self._buckets[entries]
+            postings = _expand(self._posting_starts[buckets], self._df[buckets])
+            local_rows = np.repeat(np.repeat(np.arange(len(block)), self._row_lengths[block]), self._df[buckets])
+            products = np.repeat(self._weights[entries], self._df[buckets]) * self._posting_weights[postings]
+            sims = np.bincount(local_rows * self.docs + self._posting_docs[postings], products,
+                               minlength=len(block) * self.docs).astype(np.float32).reshape(len(block), self.docs)
+            sims[np.arange(len(block)), block] = -np.inf
+            yield block, sims
+            start = stop
+
+
+def _top_k(scores, candidates, k):
+    """每行取分数最高的 k 个候选，返回 (候选号, 分数)，按分数从高到低；不足 k 个时用 -1 / -inf 补齐"""
+    if scores.shape[1] < k:
+        pad = k - scores.shape[1]
+        scores = np.hstack([scores, np.full((len(scores), pad), -np.inf, np.float32)])
+        candidates = np.hstack([candidates, np.full((len(candidates), pad), -1, candidates.dtype)])
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind='stable')
+    return np.take_along_axis(np.take_along_axis(candidates, part, axis=1), order, axis=1), \
+        np.take_along_axis(part_scores, order, axis=1)
+
+
+def nearest_neighbors(matrix, rows, k, neighbors, scores, added=None, fresh=None):
+    """
+    重算 rows 中每篇文章的前 k 个（不含自身），结果写入 neighbors / scores；
+    rows 中属于 added 的新文章与 fresh 中已有文章的相似度（矩阵对称，直接取这一块的转置）同时并入 fresh 的前 k 个
+    """
+    all_ids = np.arange(matrix.docs, dtype=np.int32)
+    is_added = np.zeros(matrix.docs, dtype=bool)
+    if added is not None:
+        is_added[added] = True
+    for block, sims in matrix.similarity_blocks(rows):
+        neighbors[block], scores[block] = _top_k(sims, np.broadcast_to(all_ids, sims.shape), k)
+        new_ids = block[is_added[block]]
+        if len(new_ids) and fresh is not None and len(fresh):
+            columns = sims[is_added[block]][:, fresh].T
+            candidates = np.hstack([neighbors[fresh], np.broadcast_to(new_ids, columns.shape)])
+            neighbors[fresh], scores[fresh] = _top_k(np.hstack([scores[fresh], columns]), candidates, k)
+
+
+def _load_cache(cache_path, k):
+    try:
+        with np.load(cache_path, allow_pickle=False) as data:
+            cache = {name: data[name] for name in data.files}
+        meta = json.loads(str(cache.pop('meta')))
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        return None
+    if meta.get('params') != _PARAMS or meta.get('k') != k:
+        return None
+    cache['meta'] = meta
+    return cache
+
+
+def _save_cache(cache_path, meta, **arrays):
+    tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, meta=np.array(json.dumps(meta, ensure_ascii=False)), **arrays)
+    os.replace(tmp_path, cache_path)
+
+
+def build_related(docs_dir=DOCS_DIR, artifact_path=ARTIFACT_PATH, k=TOP_K, full=False):
+    """
+    构建或增量更新相关文章，写出站点使用的 related.json
+
+    Returns:
+        统计 {'docs', 'tokenized', 'recomputed', 'mode', 'elapsed'}
+    """
+    start_time = time.monotonic()
+    cache_path = os.path.join(docs_dir, CACHE_FILENAME)
+    cache = None if full else _load_cache(cache_path, k)
+
+    old_docs = {}   # 路径 → 旧文档号
+    if cache is not None:
+        old_docs = {path: i for i, path in enumerate(cache['meta']['paths'])}
+
+    # 扫描文章：内容没变的直接复用上次的分词结果
+    docs, sparse, tokenized = [], [], 0
+    for path, account, date, stem in scan_docs(docs_dir):
+        with open(path, 'rb') as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()[:16]
+        old_id = old_docs.get(path)
+        if old_id is not None and cache['meta']['digests'][old_id] == digest:
+            lo, hi = cache['offsets'][old_id], cache['offsets'][old_id + 1]
+            title = cache['meta']['titles'][old_id]
+            sparse.append((cache['indices'][lo:hi], cache['counts'][lo:hi]))
+        else:
+            title, text = article_text(raw.decode('utf-8', errors='replace'), stem.split('_', 1)[1])
+            sparse.append(ngram_counts(text))
+            old_id = None
+            tokenized += 1
+        link = quote(f'/{account}/{stem}.html', safe='/()')
+        docs.append({'path': path, 'link': link, 'title': title, 'account': account, 'date': date,
+                     'digest': digest, 'old_id': old_id})
+
+    offsets = np.zeros(len(docs) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(indices) for indices, _ in sparse])
+    indices = np.concatenate([indices for indices, _ in sparse]) if sparse else np.zeros(0, np.uint32)
+    counts = np.concatenate([c for _, c in sparse]) if sparse else np.zeros(0, np.uint32)
+    del sparse
+
+    # 全量重建：没有缓存、参数变化、或文章数比上次统计文档频率时增加太多
+    df_docs = cache['meta']['df_docs'] if cache is not None else 0
+    mode = 'incremental'
+    if cache is None or len(docs) > df_docs * (1 + REBUILD_GROWTH):
+        mode = 'full'
+        df, df_docs = document_frequency(indices), len(docs)
+    else:
+        df = cache['df']
+    neighbors = np.full((len(docs), k), -1, dtype=np.int32)
+    scores = np.full((len(docs), k), -np.inf, dtype=np.float32)
+
+    kept = np.array([i for i, doc in enumerate(docs) if doc['old_id'] is not None], dtype=np.int32)
+    added = np.array([i for i, doc in enumerate(docs) if doc['old_id'] is None], dtype=np.int32)
+    if mode == 'full' or len(kept) == 0:
+        mode = 'full'
+        rows = np.arange(len(docs), dtype=np.int32)
+        matrix = TfidfMatrix(offsets, indices, counts, df, df_docs)
+        nearest_neighbors(matrix, rows, k, neighbors, scores)
+    else:
+        # 旧文档号 → 新文档号（删除、修改的文章为 -1）
+        remap = np.full(len(cache['meta']['paths']) + 1, -1, dtype=np.int32)
+        remap[[docs[i]['old_id'] for i in kept]] = kept
+        old_ids = np.array([docs[i]['old_id'] for i in kept])
+        neighbors[kept] = remap[cache['neighbors'][old_ids]]
+        scores[kept] = cache['scores'][old_ids]
+
+        # 前 k 个里有文章被删除或修改的行需要重算，其余行只并入与新文章的相似度
+        stale = kept[((neighbors[kept] < 0) & (cache['neighbors'][old_ids] >= 0)).any(axis=1)]
+        rows = np.concatenate([added, stale]).astype(np.int32)
+        fresh = np.setdiff1d(kept, stale).astype(np.int32)
+        if len(rows):
+            matrix = TfidfMatrix(offsets, indices, counts, df, df_docs)
+            nearest_neighbors(matrix, rows, k, neighbors, scores, added=added, fresh=fresh)
+
+    # 没有新增、修改、删除时缓存不变
+    if mode == 'full' or len(rows) or len(docs) != len(cache['meta']['paths']):
+        meta = {
+            'params': _PARAMS,
+            'k': k,
+            'df_docs': df_docs,
+            'paths': [doc['path'] for doc in docs],
+            'digests': [doc['digest'] for doc in docs],
+            'titles': [doc['title'] for doc in docs],
+        }
+        _save_cache(cache_path, meta, offsets=offsets, indices=indices, counts=counts, df=df,
+                    neighbors=neighbors, scores=scores)
+
+    related = []
+    for row_neighbors, row_scores in zip(neighbors.tolist(), scores.tolist()):
+        entry = []
+        for neighbor, score in zip(row_neighbors, row_scores):
+            if neighbor >= 0 and score >= MIN_SCORE:
+                entry += (neighbor, round(score * 100))
+        related.append(entry)
+    artifact = {
+        'version': 1,
+        'docs': [[doc['link'], doc['title'], doc['account'], doc['date']] for doc in docs],
+        'related': related,
+    }
+    write_if_changed(artifact_path, json.dumps(artifact, ensure_ascii=False, separators=(',', ':')))
+
+    return {'docs': len(docs), 'tokenized': tokenized, 'recomputed': len(rows), 'mode': mode,
+            'elapsed': time.monotonic() - start_time}
+
+
+def show_related(path, artifact_path=ARTIFACT_PATH):
+    """打印某篇文章的相关文章（读取 related.json）"""
+    with open(artifact_path, 'r', encoding='utf-8') as f:
+        artifact = json.load(f)
+    stem = os.path.basename(path)[:-len('.md')] if path.endswith('.md') else os.path.basename(path)
+    account = os.path.basename(os.path.dirname(os.path.normpath(path)))
+    link = quote(f'/{account}/{stem}.html', safe='/()')
+    for doc_id, doc in enumerate(artifact['docs']):
+        if doc[0] == link:
+            break
+    else:
+        print(f"没有找到: {path}")
+        return
+    print(f"{doc[3]} {doc[2]} · {doc[1]}")
+    entry = artifact['related'][doc_id]
+    if not entry:
+        print("  没有相关文章")
+    for neighbor, score in zip(entry[0::2], entry[1::2]):
+        other = artifact['docs'][neighbor]
+        print(f"  {score:>3}%  {other[3]} {other[2]} · {other[1]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="预计算 docs/ 下各篇文章的相关文章（字符 n-gram TF-IDF，需要 NumPy）")
+    parser.add_argument("--full", action="store_true", help="忽略缓存，全部重建")
+    parser.add_argument("-k", type=int, default=TOP_K, help=f"每篇文章保留的相关文章数，默认 {TOP_K}")
+    parser.add_argument("--show", metavar="PATH", help="打印某篇文章的相关文章（先更新）")
+    args = parser.parse_args()
+
+    if np is None:
+        print("❌ 需要安装 NumPy：pip install numpy")
+        raise SystemExit(1)
+
+    stats = build_related(k=args.k, full=args.full)
+    mode = '全量重建' if stats['mode'] == 'full' else '增量更新'
+    print(f"✅ 相关文章已{mode}: {stats['docs']} 篇文章，重新分词 {stats['tokenized']} 篇，"
+          f"重算 {stats['recomputed']} 行，耗时 {stats['elapsed']:.2f}s")
+    size = os.path.getsize(ARTIFACT_PATH)
+    print(f"  📦 {ARTIFACT_PATH}（{size / 1024:.0f} KB）")
+    if args.show:
+        print()
+        show_related(args.show)
+
+
+if __name__ == "__main__":
+    main()
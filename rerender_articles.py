@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+从 HTML 存档离线重新生成 Markdown
+
+用法示例：
+  python3 rerender_articles.py all
+  python3 rerender_articles.py 金渐层 --jobs 8
+  python3 rerender_articles.py --dir docs/美投investing
+
+只读取 <公众号目录>/.archive/ 下的 HTML 存档和本地图片清单，不访问网络。
+Markdown 头部（标题、发布时间、原文链接）保持不变，只重新渲染正文；内容没有变化的文件不会改写。
+"""
+
+import argparse
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from article_extractor import create_html2text, extract_article, render_markdown
+from article_manifest import ArticleManifest, MANIFEST_FILENAME
+from html_archive import ARCHIVE_DIRNAME, list_archives, load_html
+from image_store import canonical_image_url
+
+DOCS_DIR = 'docs'
+HEADER_SEPARATOR = "---\n\n"
+
+# 每个工作进程各自持有一个转换器和图片映射
+_h2t = None
+_image_paths = {}
+
+
+def _init_worker(image_paths):
+    global _h2t, _image_paths
+    _h2t = create_html2text()
+    _image_paths = image_paths
+
+
+def load_image_paths(output_dir):
+    """读取清单中已下载的图片 {规范化 URL: 相对路径}，只保留文件仍存在的"""
+    if not os.path.exists(os.path.join(output_dir, MANIFEST_FILENAME)):
+        return {}
+    manifest = ArticleManifest(output_dir)
+    try:
+        paths = manifest.image_paths()
+    finally:
+        manifest.close()
+    return {url: path for url, path in paths.items() if os.path.exists(os.path.join(output_dir, path))}
+
+
+def rerender_one(task):
+    """重新渲染一篇文章，返回 updated / unchanged / missing / empty"""
+    output_dir, stem, path = task
+    md_path = os.path.join(output_dir, f"{stem}.md")
+    try:
+        with open(md_path, 'r', encoding='utf-8') as f:
+            old_document = f.read()
+    except OSError:
+        return 'missing'
+
+    separator = old_document.find(HEADER_SEPARATOR)
+    if separator < 0:
+        return 'missing'
+    header = old_document[:separator + len(HEADER_SEPARATOR)]
+
+    content_html, img_urls = extract_article(load_html(path))
+    if not content_html:
+        return 'empty'
+
+    # 图片优先用本地文件，本地没有的保留原始地址
+    images = _image_paths.get(output_dir, {})
+    img_paths = [images.get(canonical_image_url(img_url), img_url) for img_url in img_urls]
+    document = header + render_markdown(_h2t.handle(content_html), img_paths)
+    if document == old_document:
+        return 'unchanged'
+
+    tmp_path = f"{md_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(document)
+    os.replace(tmp_path, md_path)
+    return 'updated'
+
+
+def find_archived_dirs(docs_dir=DOCS_DIR):
+    """docs/ 下所有带 HTML 存档的公众号目录"""
+    if not os.path.isdir(docs_dir):
+        return []
+    return sorted(
+        os.path.join(docs_dir, name)
+        for name in os.listdir(docs_dir)
+        if os.path.isdir(os.path.join(docs_dir, name, ARCHIVE_DIRNAME))
+    )
+
+
+def rerender(output_dirs, jobs=None):
+    start_time = time.monotonic()
+    tasks = [(output_dir, stem, path) for output_dir in output_dirs for stem, path in list_archives(output_dir)]
+    if not tasks:
+        print("没有找到 HTML 存档")
+        return Counter()
+
+    image_paths = {output_dir: load_image_paths(output_dir) for output_dir in output_dirs}
+    print(f"重新渲染 {len(tasks)} 篇文章（{len(output_dirs)} 个目录）...")
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(image_paths,)) as pool:
+        results = Counter(pool.map(rerender_one, tasks, chunksize=8))
+
+    elapsed = time.monotonic() - start_time
+    print(f"✅ 完成，耗时 {elapsed:.1f}s")
+    print(f"  更新: {results['updated']}, 无变化: {results['unchanged']}, "
+          f"缺少 Markdown: {results['missing']}, 存档无正文: {results['empty']}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="从 HTML 存档离线重新生成 Markdown")
+    parser.add_argument("account", nargs="?", help="公众号名（docs/ 下的目录名），all 为全部")
+    parser.add_argument("--dir", dest="output_dir", help="直接指定文章目录，例如 docs/美投investing")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="进程数，默认 CPU 核数")
+    args = parser.parse_args()
+
+    if args.output_dir:
+        output_dirs = [args.output_dir]
+    elif args.account == 'all':
+        output_dirs = find_archived_dirs()
+    elif args.account:
+        output_dirs = [os.path.join(DOCS_DIR, args.account)]
+    else:
+        parser.print_help()
+        return
+
+    rerender(output_dirs, jobs=args.jobs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+离线基准测试：对本地模拟微信服务器运行下载器和侧边栏生成，不访问微信
+
+用法示例：
+  python3 run_benchmarks.py
+  python3 run_benchmarks.py --articles 200 --latency 0.05 --image-latency 0.1 --error-rate 0.02
+  python3 run_benchmarks.py --fixtures bench_fixtures --output bench.json --baseline last_bench.json
+
+测试项目：
+  download_all              完整同步一个合集（列表 + 正文 + 图片 + 写 Markdown）
+  download_article_content  逐篇下载正文和图片（单篇导入的路径）
+  generate_sidebar (cold)   忽略缓存重新扫描生成侧边栏
+  generate_sidebar (warm)   目录没有变化时的增量生成
+
+模拟服务器在独立进程中运行，不和被测代码争用 GIL。
+输出每项的耗时、文章/秒、图片/秒、传输字节数和峰值内存（tracemalloc 统计的 Python 分配峰值），
+--output 保存为 JSON，--baseline 与上次保存的结果对比，便于跟踪性能回退。
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import requests
+
+import generate_sidebar
+from download_wechat_articles import WeChatAlbumDownloader
+from fake_wechat_server import STATS_PATH, make_fixtures
+from rate_limiter import RateController
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_wechat_server.py')
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class ServerProcess:
+    """在子进程中启动 fake_wechat_server.py，通过 /__stats 读取统计"""
+
+    def __init__(self, fixture_dir, latency=0.0, image_latency=None, error_rate=0.0):
+        self.port = _free_port()
+        self.base_url = f'http://127.0.0.1:{self.port}'
+        cmd = [sys.executable, SERVER_SCRIPT, '--fixtures', fixture_dir, '--port', str(self.port),
+               '--latency', str(latency), '--error-rate', str(error_rate)]
+        if image_latency is not None:
+            cmd += ['--image-latency', str(image_latency)]
+        self.process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
+
+    def album_url(self):
+        return f'{self.base_url}/mp/appmsgalbum?__biz=MzBENCH==&action=getalbum&album_id=1'
+
+    def wait_ready(self, timeout=10):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError('模拟服务器启动失败')
+            try:
+                return self.stats(reset=True)
+            except requests.ConnectionError:
+                time.sleep(0.05)
+        raise RuntimeError('等待模拟服务器启动超时')
+
+    def stats(self, reset=False):
+        return requests.get(self.base_url + STATS_PATH, params={'reset': 1} if reset else None, timeout=5).json()
+
+    def stop(self):
+        self.process.terminate()
+        self.process.wait()
+
+
+def _make_downloader(server, output_dir):
+    # 本地模拟服务器不限速，只测下载器本身；各测试项下载的是同一批文章，不做重复检测
+    return WeChatAlbumDownloader(server.album_url(), output_dir=output_dir,
+                                 rate_controller=RateController(enabled=False), dedupe=False)
+
+
+def bench_download_all(server, work_dir):
+    downloader = _make_downloader(server, os.path.join(work_dir, 'download_all'))
+    try:
+        stats = downloader.download_all()
+    finally:
+        downloader.get_manifest().close()
+    return {'articles': stats['success']}
+
+
+def bench_article_content(server, work_dir):
+    downloader = _make_downloader(server, os.path.join(work_dir, 'article_content'))
+    album = downloader.get_album_articles(count=1000, reverse=True)
+    articles = downloader.normalize_article_list(album['getalbum_resp']['article_list'])
+    server.stats(reset=True)  # 只统计正文和图片
+
+    done = 0
+    try:
+        for article in articles:
+            date = datetime.fromtimestamp(downloader.parse_time(article['create_time'])).strftime('%Y-%m-%d')
+            if downloader.download_article_content(article['url'], date, article['title']):
+                done += 1
+    finally:
+        downloader.get_manifest().close()
+    return {'articles': done}
+
+
+def _make_sidebar_docs(work_dir, count):
+    """生成 count 个空 Markdown 文件（generate_sidebar 只读取文件名）"""
+    account_dir = os.path.join(work_dir, 'docs', '基准')
+    os.makedirs(account_dir, exist_ok=True)
+    for i in range(count):
+        date = time.strftime('%Y-%m-%d', time.gmtime(1500000000 + i * 86400))
+        open(os.path.join(account_dir, f'{date}_基准测试文章{i}.md'), 'w').close()
+    return {'基准': 'docs/基准'}
+
+
+@contextlib.contextmanager
+def _sidebar_workspace(work_dir, authors):
+    """在 work_dir 下运行 generate_sidebar（它使用相对路径和模块级的公众号映射）"""
+    old_cwd, old_authors = os.getcwd(), generate_sidebar.AUTHORS
+    os.chdir(work_dir)
+    generate_sidebar.AUTHORS = authors
+    try:
+        yield
+    finally:
+        generate_sidebar.AUTHORS = old_authors
+        os.chdir(old_cwd)
+
+
+def bench_sidebar(work_dir, count, use_cache):
+    with _sidebar_workspace(work_dir, _make_sidebar_docs(work_dir, count)):
+        configs = generate_sidebar.generate_sidebar_config(use_cache=use_cache)
+    return {'articles': sum(cfg['count'] for cfg in configs.values())}
+
+
+def measure(name, func, server=None, trace_memory=True, verbose=False):
+    """运行一项测试，返回耗时、吞吐量、字节数和峰值内存"""
+    if server:
+        server.stats(reset=True)
+    if trace_memory:
+        tracemalloc.start()
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+
+    start = time.perf_counter()
+    with output:
+        result = func()
+    seconds = time.perf_counter() - start
+
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    net = server.stats() if server else {}
+    result.update({
+        'name': name,
+        'seconds': round(seconds, 4),
+        'images': net.get('images', 0),
+        'bytes': net.get('bytes', 0),
+        'requests': net.get('requests', 0),
+        'errors': net.get('errors', 0),
+        'peak_memory': peak,
+    })
+    result['articles_per_sec'] = round(result['articles'] / seconds, 2) if seconds else 0
+    result['images_per_sec'] = round(result['images'] / seconds, 2) if seconds else 0
+    return result
+
+
+def _format_bytes(size):
+    if size is None:
+        return '-'
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1024
+    return f'{size:.1f} GB'
+
+
+def print_results(results, baseline=None):
+    baseline = {r['name']: r for r in (baseline or [])}
+    print(f"\n{'测试':<28}{'耗时':>9}{'文章/秒':>10}{'图片/秒':>10}{'传输':>11}{'峰值内存':>11}{'对比基线':>10}")
+    print('-' * 89)
+    for r in results:
+        change = ''
+        base = baseline.get(r['name'])
+        if base and base['seconds']:
+            change = f"{(r['seconds'] - base['seconds']) / base['seconds'] * 100:+.1f}%"
+        print(f"{r['name']:<28}{r['seconds']:>8.2f}s{r['articles_per_sec']:>10.1f}{r['images_per_sec']:>10.1f}"
+              f"{_format_bytes(r['bytes']):>11}{_format_bytes(r['peak_memory']):>11}{change:>10}")
+    errors = sum(r['errors'] for r in results)
+    if errors:
+        print(f"\n模拟服务器共返回 {errors} 个错误响应")
+
+
+def run(args):
+    with tempfile.TemporaryDirectory(prefix='wechat-bench-') as work_dir:
+        fixture_dir = args.fixtures
+        if not fixture_dir:
+            fixture_dir = os.path.join(work_dir, 'fixtures')
+            make_fixtures(fixture_dir, articles=args.articles, images_per_article=args.images)
+
+        options = {'trace_memory': not args.no_tracemalloc, 'verbose': args.verbose}
+        server = ServerProcess(fixture_dir, latency=args.latency, image_latency=args.image_latency,
+                               error_rate=args.error_rate)
+        try:
+            server.wait_ready()
+            print(f"模拟服务器: {server.base_url}（fixture: {fixture_dir}）")
+            results = [
+                measure('download_all', lambda: bench_download_all(server, work_dir), server, **options),
+                measure('download_article_content', lambda: bench_article_content(server, work_dir), server,
+                        **options),
+            ]
+        finally:
+            server.stop()
+
+        sidebar_dir = os.path.join(work_dir, 'sidebar')
+        results += [
+            measure('generate_sidebar (cold)', lambda: bench_sidebar(sidebar_dir, args.sidebar_articles, False),
+                    **options),
+            measure('generate_sidebar (warm)', lambda: bench_sidebar(sidebar_dir, args.sidebar_articles, True),
+                    **options),
+        ]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对本地模拟微信服务器运行离线基准测试")
+    parser.add_argument("--fixtures", help="fixture 目录（默认临时生成）")
+    parser.add_argument("--articles", type=int, default=50, help="临时生成的文章数")
+    parser.add_argument("--images", type=int, default=5, help="临时生成时每篇文章的图片数")
+    parser.add_argument("--sidebar-articles", type=int, default=2000, help="侧边栏测试的文章数")
+    parser.add_argument("--latency", type=float, default=0.0, help="列表和文章请求的模拟延迟（秒）")
+    parser.add_argument("--image-latency", type=float, default=None, help="图片请求的模拟延迟（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模拟服务器返回 500 的比例")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="不统计峰值内存（避免 tracemalloc 拖慢计时）")
+    parser.add_argument("--output", help="把结果保存为 JSON")
+    parser.add_argument("--baseline", help="与之前保存的 JSON 结果对比")
+    parser.add_argument("--verbose", "-v", action="store_true", help="显示被测代码的输出")
+    args = parser.parse_args()
+
+    results = run(args)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'created_at': time.strftime('%Y-%m-%d %H:%M:%S'), 'args': vars(args), 'results': results},
+                      f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
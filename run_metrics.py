@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+下载过程的分阶段统计
+
+按阶段（listing / article_html / images / html2text / write）记录请求数、重试数、字节数和耗时分布，
+运行结束后输出 JSON 报告，也可以写成 Prometheus 文本格式（node_exporter textfile collector 可直接读取），
+用于发现吞吐下降和被限流。
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# 耗时分布的桶上限（秒），与 Prometheus 默认桶接近，覆盖到慢速图片下载
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGES = ('listing', 'article_html', 'images', 'html2text', 'write')
+
+METRIC_PREFIX = 'wechat_sync'
+
+
+class Histogram:
+    """固定桶的耗时分布（只保存各桶计数，不保存样本）"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最后一个为 +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """按桶估算分位数（返回所在桶的上限，落在 +Inf 桶时返回最大值）"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 4),
+            'avg': round(self.sum / self.count, 4) if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'max': round(self.max, 4),
+            'buckets': {str(le): n for le, n in zip(self.buckets + ('+Inf',), self.counts)},
+        }
+
+
+class RunMetrics:
+    """一次同步运行的统计，多个公众号、多个图片线程共享同一个实例"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self._start = time.monotonic()
+        self.counters = {}     # {(name, stage): value}
+        self.histograms = {}   # {(name, stage): Histogram}
+
+    def incr(self, name, value=1, stage=''):
+        with self._lock:
+            key = (name, stage)
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, stage=''):
+        with self._lock:
+            histogram = self.histograms.get((name, stage))
+            if histogram is None:
+                histogram = self.histograms[(name, stage)] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage, name='stage_seconds'):
+        """记录代码块耗时（异常时也记录）"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - start, stage)
+
+    def elapsed(self):
+        return time.monotonic() - self._start
+
+    def report(self, results=None):
+        """生成 JSON 报告；results 为各公众号的处理结果（download_account 的返回值）"""
+        with self._lock:
+            stages = {}
+            for (name, stage), value in sorted(self.counters.items()):
+                stages.setdefault(stage or 'total', {})[name] = value
+            for (name, stage), histogram in sorted(self.histograms.items()):
+                stages.setdefault(stage or 'total', {})[name] = histogram.to_dict()
+
+        elapsed = self.elapsed()
+        results = results or []
+        articles = sum(result.get('success', 0) for result in results)
+        images = self.counters.get(('saved', 'images'), 0)
+        return {
+            'started_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started_at)),
+            'elapsed': round(elapsed, 3),
+            'articles': articles,
+            'articles_per_sec': round(articles / elapsed, 3) if elapsed else 0.0,
+            'images_per_sec': round(images / elapsed, 3) if elapsed else 0.0,
+            'accounts': results,
+            'stages': stages,
+        }
+
+    def to_prometheus(self, results=None):
+        """Prometheus 文本格式"""
+        lines = []
+        with self._lock:
+            counter_names = sorted({name for name, _ in self.counters})
+            for name in counter_names:
+                metric = f'{METRIC_PREFIX}_{name}_total'
+                lines.append(f'# TYPE {metric} counter')
+                for (counter_name, stage), value in sorted(self.counters.items()):
+                    if counter_name == name:
+                        lines.append(f'{metric}{{stage="{stage}"}} {value}')
+
+            histogram_names = sorted({name for name, _ in self.histograms})
+            for name in histogram_names:
+                metric = f'{METRIC_PREFIX}_{name}'
+                lines.append(f'# TYPE {metric} histogram')
+                for (histogram_name, stage), histogram in sorted(self.histograms.items()):
+                    if histogram_name != name:
+                        continue
+                    cumulative = 0
+                    for le, n in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                        cumulative += n
+                        lines.append(f'{metric}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                    lines.append(f'{metric}_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+                    lines.append(f'{metric}_count{{stage="{stage}"}} {histogram.count}')
+
+        lines.append(f'# TYPE {METRIC_PREFIX}_articles gauge')
+        for result in results or []:
+            for outcome in ('success', 'fail', 'skip'):
+                lines.append(f'{METRIC_PREFIX}_articles{{account="{result["account"]}",result="{outcome}"}} '
+                             f'{result.get(outcome, 0)}')
+        lines.append(f'# TYPE {METRIC_PREFIX}_elapsed_seconds gauge')
+        lines.append(f'{METRIC_PREFIX}_elapsed_seconds {self.elapsed():.3f}')
+        lines.append(f'# TYPE {METRIC_PREFIX}_last_run_timestamp_seconds gauge')
+        lines.append(f'{METRIC_PREFIX}_last_run_timestamp_seconds {self.started_at:.0f}')
+        return '\n'.join(lines) + '\n'
+
+    def write_report(self, path, results=None):
+        _write_atomic(path, json.dumps(self.report(results), ensure_ascii=False, indent=2))
+
+    def write_prometheus(self, path, results=None):
+        _write_atomic(path, self.to_prometheus(results))
+
+    def print_summary(self):
+        """打印各阶段的请求数、重试数、字节数和耗时"""
+        report = self.report()
+        print("\n各阶段统计:")
+        for stage in STAGES:
+            data = report['stages'].get(stage)
+            if not data:
+                continue
+            timing = data.get('stage_seconds', {})
+            print(f"  {stage:<13} 请求 {data.get('requests', 0):>5}  重试 {data.get('retries', 0):>3}  "
+                  f"{data.get('bytes', 0) / 1024 / 1024:>7.1f} MB  "
+                  f"次数 {timing.get('count', 0):>5}  平均 {timing.get('avg', 0) * 1000:>7.1f}ms  "
+                  f"p90 {timing.get('p90', 0) * 1000:>7.0f}ms")
+
+
+def _write_atomic(path, content):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
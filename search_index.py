@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""
+docs/ 全文搜索索引
+
+用法示例：
+  python3 search_index.py build              增量构建（内容哈希没变的文章直接复用）
+  python3 search_index.py build --full       全部重新分词
+  python3 search_index.py query 英伟达 财报
+  python3 search_index.py query 减仓 --account 金渐层 --since 2025-01-01 --until 2025-06-30 -n 20
+
+分词：中文连续汉字切成二元组（单个汉字保留单字），英文/数字按单词；
+另外从 data.csv 的 symbol 列读取股票名称和代码（如 "英伟达 NVIDIA"），文章中出现任一名称都会记为同一个实体词，
+查询 "英伟达" 也能找到只写了 NVIDIA 的文章。排序使用 BM25，标题中的词权重更高。
+
+索引作为静态文件写入 docs/.vuepress/public/search/，站点（docs/.vuepress/search.js，导航栏搜索框）和命令行共用：
+  meta.json       文档列表 [链接, 标题, 日期, 公众号, 词数, 内容哈希]、实体别名、分片数等
+  terms-NN.json   {词: [文档号增量, 词频, 文档号增量, 词频, ...]}，词按 FNV-1a(UTF-8) % 分片数 分配
+查询时只读取 meta.json 和查询词所在的分片。
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from urllib.parse import quote, unquote
+
+DOCS_DIR = 'docs'
+INDEX_DIR = 'docs/.vuepress/public/search'
+DATA_CSV = 'data.csv'
+META_FILENAME = 'meta.json'
+
+INDEX_VERSION = 1
+SHARD_COUNT = 32
+TITLE_WEIGHT = 3
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+EXCLUDED_FILES = {'index.md', 'README.md', '投资与人生建议总结.md'}
+
+# 实体别名中过于宽泛、不能代表某只股票的词
+ENTITY_STOPWORDS = {'etf', '期货'}
+
+_ARTICLE_NAME = re.compile(r'(\d{4}-\d{2}-\d{2})_(.+)\.md$')
+_CJK_RUN = re.compile(r'[㐀-䶿一-鿿]+')
+_WORD = re.compile(r'[a-z0-9]+')
+_ASCII_ALIAS = re.compile(r'^[a-z0-9]+$')
+
+# Markdown 中不参与索引的部分：图片、链接地址、裸 URL
+_MARKDOWN_NOISE = re.compile(r'!\[[^\]]*\]\([^)]*\)|<img\b[^>]*>|\]\([^)]*\)|https?://\S+')
+
+
+def fnv1a(text):
+    """32 位 FNV-1a（UTF-8 字节），站点的 search.js 用同样的算法定位分片"""
+    value = 0x811c9dc5
+    for byte in text.encode('utf-8'):
+        value = ((value ^ byte) * 0x01000193) & 0xffffffff
+    return value
+
+
+def term_shard(term):
+    return fnv1a(term) % SHARD_COUNT
+
+
+def tokenize(text):
+    """返回词列表：汉字二元组（单字成段时为单字）+ 英文/数字单词"""
+    text = text.lower()
+    tokens = []
+    for run in _CJK_RUN.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    tokens.extend(_WORD.findall(text))
+    return tokens
+
+
+def load_entities(csv_path=DATA_CSV):
+    """从 data.csv 的 symbol 列读取实体别名 {别名(小写): 实体名}，实体名取 symbol 的第一个词"""
+    aliases = {}
+    try:
+        with open(csv_path, 'r', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                names = (row.get('symbol') or '').split()
+                if not names:
+                    continue
+                entity = names[0]
+                for name in names:
+                    alias = name.lower()
+                    if alias not in ENTITY_STOPWORDS:
+                        aliases.setdefault(alias, entity)
+    except OSError:
+        pass
+    return aliases
+
+
+def entity_term(entity):
+    return '$' + entity.lower()
+
+
+def count_entities(text_lower, words, aliases):
+    """统计文本中各实体的出现次数；英文别名按整词匹配（避免 MO 匹配到 more），中文按子串"""
+    counts = Counter()
+    for alias, entity in aliases.items():
+        n = words[alias] if _ASCII_ALIAS.match(alias) else text_lower.count(alias)
+        if n:
+            counts[entity_term(entity)] += n
+    return counts
+
+
+def analyze_document(title, body, aliases):
+    """返回 (词频, 文档长度)；标题里的词按 TITLE_WEIGHT 计"""
+    body = _MARKDOWN_NOISE.sub(' ', body)
+    body_tokens = tokenize(body)
+    title_tokens = tokenize(title)
+    counts = Counter(body_tokens)
+    for token in title_tokens:
+        counts[token] += TITLE_WEIGHT
+
+    text_lower = f"{title}\n{body}".lower()
+    words = Counter(_WORD.findall(text_lower))
+    counts.update(count_entities(text_lower, words, aliases))
+    return counts, len(body_tokens) + len(title_tokens) * TITLE_WEIGHT
+
+
+def scan_docs(docs_dir=DOCS_DIR):
+    """docs/<公众号>/<日期>_<标题>.md，返回 [(相对路径, 公众号, 日期, 文件名主干)]"""
+    found = []
+    for account_dir in sorted(Path(docs_dir).iterdir()):
+        if not account_dir.is_dir() or account_dir.name.startswith('.'):
+            continue
+        for md_file in sorted(account_dir.glob('*.md')):
+            match = _ARTICLE_NAME.match(md_file.name)
+            if match and md_file.name not in EXCLUDED_FILES:
+                found.append((md_file.as_posix(), account_dir.name, match.group(1), md_file.name[:-3]))
+    return found
+
+
+def split_article(document, fallback_title):
+    """拆出标题和正文（下载器生成的文件以 "# 标题" 开头，正文在第一个 "---" 之后）"""
+    title = fallback_title
+    if document.startswith('# '):
+        title = document[2:document.find('\n')].strip() if '\n' in document else document[2:].strip()
+    separator = document.find('---\n')
+    body = document[separator + 4:] if separator >= 0 else document
+    return title, body
+
+
+def _write_if_changed(path, content):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if f.read() == content:
+                return False
+    except OSError:
+        pass
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    return True
+
+
+def _encode_postings(postings, last=0):
+    """[(文档号, 词频)] → [增量, 词频, 增量, 词频, ...]；last 为已有倒排表的最后一个文档号"""
+    encoded = []
+    for doc_id, tf in sorted(postings):
+        encoded += (doc_id - last, tf)
+        last = doc_id
+    return encoded
+
+
+def _decode_postings(encoded):
+    doc_id = 0
+    for i in range(0, len(encoded), 2):
+        doc_id += encoded[i]
+        yield doc_id, encoded[i + 1]
+
+
+def _index_signature(aliases):
+    """分词规则或实体表变化时需要全部重建"""
+    payload = json.dumps([INDEX_VERSION, SHARD_COUNT, TITLE_WEIGHT, sorted(aliases.items())], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def load_meta(index_dir=INDEX_DIR):
+    try:
+        with open(os.path.join(index_dir, META_FILENAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _load_shard(index_dir, shard):
+    try:
+        with open(os.path.join(index_dir, f'terms-{shard:02d}.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def build_index(docs_dir=DOCS_DIR, index_dir=INDEX_DIR, csv_path=DATA_CSV, full=False):
+    """构建或增量更新索引，返回统计 {'docs', 'reused', 'indexed', 'removed', 'terms'}"""
+    start_time = time.monotonic()
+    aliases = load_entities(csv_path)
+    signature = _index_signature(aliases)
+
+    old_meta = None if full else load_meta(index_dir)
+    if old_meta and old_meta.get('signature') != signature:
+        old_meta = None
+    # 旧索引中的文档：链接 → (旧文档号, 内容哈希)
+    old_docs = {}
+    if old_meta:
+        old_docs = {doc[0]: (doc_id, doc[5]) for doc_id, doc in enumerate(old_meta['docs'])}
+
+    records = []
+    fresh = {}  # 链接 → 词频（需要重新分词的文章）
+    reused_ids = {}  # 链接 → 旧文档号
+    for path, account, date, stem in scan_docs(docs_dir):
+        with open(path, 'rb') as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()[:16]
+        link = quote(f'/{account}/{stem}.html', safe='/()')
+
+        old = old_docs.get(link)
+        if old and old[1] == digest:
+            doc = old_meta['docs'][old[0]]
+            reused_ids[link] = old[0]
+        else:
+            title, body = split_article(raw.decode('utf-8', errors='replace'), stem.split('_', 1)[1])
+            counts, length = analyze_document(title, body, aliases)
+            fresh[link] = counts
+            doc = [link, title, date, account, length, digest]
+        records.append(doc)
+
+    # 文档号按日期正序分配：新文章排在最后，已有文章的文档号不变
+    records.sort(key=lambda doc: (doc[2], doc[0]))
+    new_ids = {doc[0]: doc_id for doc_id, doc in enumerate(records)}
+    old_to_new = {old_id: new_ids[link] for link, old_id in reused_ids.items()}
+
+    # 只新增了更新的文章（没有修改、删除，也没有插到中间的旧文章）时，已有倒排表原样保留，只在末尾追加
+    append_only = old_meta is not None and len(old_to_new) == len(old_docs) \
+        and all(old_id == new_id for old_id, new_id in old_to_new.items())
+
+    fresh_by_shard = [defaultdict(list) for _ in range(SHARD_COUNT)]
+    for link, counts in fresh.items():
+        doc_id = new_ids[link]
+        for term, tf in counts.items():
+            fresh_by_shard[term_shard(term)][term].append((doc_id, tf))
+
+    os.makedirs(index_dir, exist_ok=True)
+    total_terms = 0
+    for shard in range(SHARD_COUNT):
+        if append_only:
+            terms = _load_shard(index_dir, shard)
+            for term, postings in fresh_by_shard[shard].items():
+                encoded = terms.get(term, [])
+                terms[term] = encoded + _encode_postings(postings, last=sum(encoded[0::2]))
+        else:
+            merged = defaultdict(list)
+            if old_to_new:
+                for term, encoded in _load_shard(index_dir, shard).items():
+                    kept = [(old_to_new[doc_id], tf) for doc_id, tf in _decode_postings(encoded)
+                            if doc_id in old_to_new]
+                    if kept:
+                        merged[term] = kept
+            for term, postings in fresh_by_shard[shard].items():
+                merged[term].extend(postings)
+            terms = {term: _encode_postings(postings) for term, postings in merged.items()}
+
+        total_terms += len(terms)
+        if append_only and not fresh_by_shard[shard]:
+            continue
+        content = json.dumps(dict(sorted(terms.items())), ensure_ascii=False, separators=(',', ':'))
+        _write_if_changed(os.path.join(index_dir, f'terms-{shard:02d}.json'), content)
+
+    lengths = [doc[4] for doc in records]
+    meta = {
+        'version': INDEX_VERSION,
+        'signature': signature,
+        'shards': SHARD_COUNT,
+        'avg_length': sum(lengths) / len(lengths) if lengths else 0,
+        'entities': aliases,
+        'docs': records,
+    }
+    _write_if_changed(os.path.join(index_dir, META_FILENAME),
+                      json.dumps(meta, ensure_ascii=False, separators=(',', ':')))
+
+    stats = {
+        'docs': len(records),
+        'reused': len(reused_ids),
+        'indexed': len(fresh),
+        'removed': sum(1 for link in old_docs if link not in new_ids),
+        'terms': total_terms,
+        'elapsed': time.monotonic() - start_time,
+    }
+    return stats
+
+
+class SearchIndex:
+    """读取静态索引做查询，分片按需加载"""
+
+    def __init__(self, index_dir=INDEX_DIR):
+        self.index_dir = index_dir
+        self.meta = load_meta(index_dir)
+        if self.meta is None:
+            raise FileNotFoundError(f"索引不存在: {index_dir}（先运行 python3 search_index.py build）")
+        self.docs = self.meta['docs']
+        self.aliases = self.meta.get('entities', {})
+        self._shards = {}
+
+    def postings(self, term):
+        shard = term_shard(term)
+        if shard not in self._shards:
+            self._shards[shard] = _load_shard(self.index_dir, shard)
+        return dict(_decode_postings(self._shards[shard].get(term, [])))
+
+    def query_terms(self, query):
+        """查询串 → 词列表；包含实体名称时改为匹配实体词，不再要求名称本身的二元组"""
+        text = query.lower()
+        terms = []
+        words = set(_WORD.findall(text))
+        for alias, entity in sorted(self.aliases.items(), key=lambda item: -len(item[0])):
+            matched = alias in words if _ASCII_ALIAS.match(alias) else alias in text
+            if matched:
+                terms.append(entity_term(entity))
+                text = re.sub(rf'\b{re.escape(alias)}\b', ' ', text) if _ASCII_ALIAS.match(alias) \
+                    else text.replace(alias, ' ')
+                words.discard(alias)
+        terms.extend(tokenize(text))
+        return list(dict.fromkeys(terms))
+
+    def search(self, query, limit=10, since=None, until=None, account=None):
+        """
+        BM25 排序；默认要求包含全部查询词，没有结果时退回到包含任一查询词
+
+        Returns:
+            [(分数, 文档)]，文档为 [链接, 标题, 日期, 公众号, 词数, 内容哈希]
+        """
+        terms = self.query_terms(query)
+        if not terms:
+            return []
+
+        def allowed(doc_id):
+            doc = self.docs[doc_id]
+            return ((not since or doc[2] >= since) and (not until or doc[2] <= until)
+                    and (not account or doc[3] == account))
+
+        term_postings = [(term, self.postings(term)) for term in terms]
+        candidates = set.intersection(*(set(p) for _, p in term_postings))
+        if not candidates:
+            candidates = set().union(*(set(p) for _, p in term_postings))
+        candidates = [doc_id for doc_id in candidates if allowed(doc_id)]
+
+        total = len(self.docs)
+        avg_length = self.meta['avg_length'] or 1
+        scores = Counter()
+        for _, postings in term_postings:
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id in candidates:
+                tf = postings.get(doc_id)
+                if tf:
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self.docs[doc_id][4] / avg_length)
+                    scores[doc_id] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        # 同分时新文章（文档号大）在前
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))[:limit]
+        return [(score, self.docs[doc_id]) for doc_id, score in ranked]
+
+
+def make_snippet(docs_dir, doc, query, width=40):
+    """从本地 Markdown 中截取第一个命中位置附近的文字"""
+    try:
+        with open(os.path.join(docs_dir, doc[3], f"{_stem_from_link(doc[0])}.md"), 'r', encoding='utf-8') as f:
+            _, body = split_article(f.read(), doc[1])
+    except OSError:
+        return ''
+    body = ' '.join(_MARKDOWN_NOISE.sub(' ', body).split())
+    lowered = body.lower()
+    positions = [lowered.find(word) for word in query.lower().split() if word]
+    positions = [pos for pos in positions if pos >= 0]
+    if not positions:
+        return body[:width * 2]
+    pos = min(positions)
+    return ('…' if pos > width else '') + body[max(0, pos - width):pos + width] + '…'
+
+
+def _stem_from_link(link):
+    return unquote(link.rsplit('/', 1)[-1])[:-len('.html')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="docs/ 全文搜索索引")
+    sub = parser.add_subparsers(dest="command")
+
+    build_parser = sub.add_parser("build", help="构建或增量更新索引")
+    build_parser.add_argument("--full", action="store_true", help="忽略已有索引，全部重新分词")
+
+    query_parser = sub.add_parser("query", help="查询")
+    query_parser.add_argument("words", nargs="+", help="查询词")
+    query_parser.add_argument("-n", "--limit", type=int, default=10, help="返回条数")
+    query_parser.add_argument("--since", help="起始日期（含），YYYY-MM-DD")
+    query_parser.add_argument("--until", help="结束日期（含），YYYY-MM-DD")
+    query_parser.add_argument("--account", help="只搜索某个公众号")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        stats = build_index(full=args.full)
+        print(f"✅ 索引已更新: {stats['docs']} 篇文章，{stats['terms']} 个词，耗时 {stats['elapsed']:.2f}s")
+        print(f"  复用: {stats['reused']}, 重新分词: {stats['indexed']}, 删除: {stats['removed']}")
+        sizes = sum(f.stat().st_size for f in Path(INDEX_DIR).glob('*.json'))
+        print(f"  📦 索引大小: {sizes / 1024 / 1024:.1f} MB（{INDEX_DIR}）")
+    elif args.command == "query":
+        query = ' '.join(args.words)
+        start = time.perf_counter()
+        index = SearchIndex()
+        results = index.search(query, limit=args.limit, since=args.since, until=args.until, account=args.account)
+        elapsed = (time.perf_counter() - start) * 1000
+        for rank, (score, doc) in enumerate(results, 1):
+            print(f"{rank:>3}. [{doc[2]}] {doc[3]} | {doc[1]}  ({score:.2f})")
+            snippet = make_snippet(DOCS_DIR, doc, query)
+            if snippet:
+                print(f"     {snippet}")
+        print(f"\n共 {len(results)} 条结果（{elapsed:.1f} ms）")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,15 @@
 用法示例：
   python3 single_article_import.py <文章链接> --dir docs/美投investing
   python3 single_article_import.py <文章链接> --dir docs/美投investing --date 2025-12-26 --title 自定义标题
+  python3 single_article_import.py <链接1> <链接2> --dir docs/单篇文章 --jobs 4
+  python3 single_article_import.py --file urls.txt --dir docs/单篇文章
+  pbpaste | python3 single_article_import.py --file - --dir docs/单篇文章
+
+批量列表每行一个链接，可在链接后用空格隔开写目标目录（覆盖 --dir），空行和 # 开头的行忽略。
+每篇文章只下载一次页面，标题和发布时间从同一份 HTML 中读取；目录中已导入过的链接（清单中已成功，
+或有正文的 Markdown 头部的原文链接）直接跳过，没取得正文的再次导入时会重新下载。
+导入的文章记入目录的清单，带 mid/idx 参数的链接与合集同步使用相同主键；
+没取得正文的文章进入目录的重试队列，每次导入结束时重试已到期的条目。
 
 依赖：requests、html2text，并复用 download_wechat_articles.WeChatAlbumDownloader 的解析与图片下载能力。
 """
@@ -12,20 +21,26 @@
 import argparse
 import os
 import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Optional
 
-import requests
-
-from download_wechat_articles import WeChatAlbumDownloader
-
+from album_api import article_key_from_url, normalize_article_url
+from article_extractor import create_html2text, render_markdown
+from article_manifest import STATUS_DONE
+from download_wechat_articles import PLACEHOLDER_TEXT, WeChatAlbumDownloader
+from http_cache import CacheMissError
+from rate_limiter import backoff_delay
 
+DEFAULT_DIR = "docs/单篇文章"
 
+_SOURCE_LINK = re.compile(r"\*\*原文链接\*\*: \[([^\]]+)\]")
 
-def fetch_article_html(session: requests.Session, url: str, headers: dict[str, str]) -> str:
-    resp = session.get(url, headers=headers, timeout=60)
-    resp.raise_for_status()
-    return resp.text
+# 每个导入线程各自持有一个 html2text 转换器（转换器不是线程安全的）
+_local = threading.local()
 
 
 def extract_title(html: str) -> str:
@@ -60,52 +75,232 @@ def extract_publish_datetime(html: str) -> datetime:
     return datetime.now()
 
 
+def imported_urls(output_dir: str) -> set[str]:
+    """目录中已有正文的 Markdown 的原文链接（规范化后），兼容没有记入清单的旧导入；占位文件不算"""
+    urls = set()
+    if not os.path.isdir(output_dir):
+        return urls
+    placeholder = PLACEHOLDER_TEXT.encode('utf-8')
+    for entry in os.scandir(output_dir):
+        if entry.is_file() and entry.name.endswith('.md'):
+            with open(entry.path, 'rb') as f:
+                m = _SOURCE_LINK.search(f.read(2048).decode('utf-8', 'ignore'))
+                if not m:
+                    continue
+                f.seek(max(0, entry.stat().st_size - len(placeholder)))
+                if f.read() == placeholder:
+                    continue
+            urls.add(normalize_article_url(m.group(1)))
+    return urls
+
+
+def _thread_h2t():
+    h2t = getattr(_local, 'h2t', None)
+    if h2t is None:
+        h2t = _local.h2t = create_html2text()
+    return h2t
+
+
+def fetch_page(downloader: WeChatAlbumDownloader, url: str, retry: int = 2) -> str:
+    """下载文章页面，失败时退避重试（与 fetch_article_html 相同），最后一次仍失败则抛出异常"""
+    for attempt in range(retry):
+        try:
+            return downloader.fetch_article_page(url)
+        except CacheMissError:
+            raise
+        except Exception as e:
+            if attempt >= retry - 1:
+                downloader.metrics.incr('failures', stage='article_html')
+                raise
+            wait_time = backoff_delay(attempt, base=2.0)
+            print(f"    下载失败 ({attempt+1}/{retry})，{wait_time:.1f}秒后重试... {e}")
+            downloader.metrics.incr('retries', stage='article_html')
+            time.sleep(wait_time)
+
+
+class ArticleImporter:
+    """批量导入：每个目录一个下载器（共享 Session、限速和统计），记录目录中已导入的文章"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._downloaders = {}
+        self._imported = {}    # {目录: 已导入的规范化链接}
+
+    def _prepare_dir(self, output_dir: str) -> WeChatAlbumDownloader:
+        with self._lock:
+            downloader = self._downloaders.get(output_dir)
+            if downloader is None:
+                downloader = self._downloaders[output_dir] = WeChatAlbumDownloader('', output_dir=output_dir)
+                self._imported[output_dir] = imported_urls(output_dir)
+            return downloader
+
+    def is_imported(self, url: str, output_dir: str) -> bool:
+        """已成功导入（清单中状态为 done，或目录中有正文的 Markdown）；失败和占位的不算"""
+        downloader = self._prepare_dir(output_dir)
+        with self._lock:
+            if normalize_article_url(url) in self._imported[output_dir]:
+                return True
+        record = downloader.get_manifest().get(article_key_from_url(url))
+        return record is not None and record['status'] == STATUS_DONE
+
+    def _mark_imported(self, url: str, output_dir: str):
+        with self._lock:
+            self._imported[output_dir].add(normalize_article_url(url))
+
+    def import_article(self, url: str, output_dir: str, override_title: Optional[str] = None,
+                       override_date: Optional[str] = None) -> tuple[str, bool]:
+        """
+        下载一篇文章（页面只请求一次，失败时退避重试），返回 (保存的文件路径, 是否取得了正文)；
+        没取得正文或转换失败时写入占位文件并加入重试队列，页面下载失败时抛出异常
+        """
+        downloader = self._prepare_dir(output_dir)
+        html = fetch_page(downloader, url)
+
+        # 标题与时间
+        title = override_title or extract_title(html)
+        publish_dt = extract_publish_datetime(html)
+        if override_date:
+            publish_dt = datetime.strptime(override_date, "%Y-%m-%d")
+
+        date_str = publish_dt.strftime("%Y-%m-%d")
+        safe_title = downloader.sanitize_filename(title)
+        filename = f"{date_str}_{safe_title}.md"
+
+        # 正文（含图片）从同一份 HTML 中提取
+        content_html, img_paths, images = downloader.prepare_article(html, date_str, safe_title)
+        content_md = ""
+        error = None
+        if content_html:
+            try:
+                with downloader.metrics.timer('html2text'):
+                    content_md = render_markdown(_thread_h2t().handle(content_html), img_paths)
+            except Exception as e:
+                print(f"    转换 Markdown 失败: {e}")
+                downloader.metrics.incr('failures', stage='html2text')
+                error = f"转换 Markdown 失败: {e}"
+
+        saved = downloader.save_article(downloader.get_manifest(), article_key_from_url(url), url,
+                                        int(publish_dt.timestamp()), title, filename, images, content_md, error)
+        if saved:
+            self._mark_imported(url, output_dir)
+        return os.path.join(output_dir, filename), saved
+
+    def retry_failed(self):
+        """重试用到的各目录中已到期的失败条目（导入时没取得正文的文章、下载失败的图片）"""
+        for downloader in list(self._downloaders.values()):
+            downloader.retry_failed()
+
+    def close(self):
+        for downloader in self._downloaders.values():
+            downloader.get_manifest().close()
+
+
+def _report(filepath: str, saved: bool):
+    if saved:
+        print(f"✅ 已保存: {filepath}")
+    else:
+        print(f"⚠️  没有取得正文，已写入占位文件并加入重试队列: {filepath}")
+
+
 def download_single_article(url: str, output_dir: str, override_title: Optional[str], override_date: Optional[str]):
-    downloader = WeChatAlbumDownloader(url, output_dir=output_dir)
-
-    # 获取 HTML
-    html = fetch_article_html(downloader.session, url, downloader.headers)
-
-    # 标题与时间
-    title = override_title or extract_title(html)
-    publish_dt = extract_publish_datetime(html)
-    if override_date:
-        publish_dt = datetime.strptime(override_date, "%Y-%m-%d")
-
-    date_str = publish_dt.strftime("%Y-%m-%d")
-    time_str = publish_dt.strftime("%Y-%m-%d %H:%M:%S")
-    safe_title = downloader.sanitize_filename(title)
-    filename = f"{date_str}_{safe_title}.md"
-
-    os.makedirs(output_dir, exist_ok=True)
-
-    # 下载正文（含图片）
-    content_md = downloader.download_article_content(url, date_str, safe_title)
-
-    filepath = os.path.join(output_dir, filename)
-    with open(filepath, "w", encoding="utf-8") as f:
-        f.write(f"# {title}\n\n")
-        f.write(f"**发布时间**: {time_str}\n\n")
-        f.write(f"**原文链接**: [{url}]({url})\n\n")
-        f.write("---\n\n")
-        if content_md:
-            f.write(content_md)
+    """导入一篇文章，成功返回文件路径；页面下载失败或只写入了占位文件时返回 None"""
+    importer = ArticleImporter()
+    try:
+        try:
+            filepath, saved = importer.import_article(url, output_dir, override_title, override_date)
+        except Exception as e:
+            print(f"❌ 导入失败 ({url}): {e}")
+            return None
+        importer.retry_failed()
+    finally:
+        importer.close()
+    _report(filepath, saved)
+    return filepath if saved else None
+
+
+def read_url_list(path: str, default_dir: str) -> list[tuple[str, str]]:
+    """读取链接列表（- 为标准输入），返回 [(链接, 目标目录)]"""
+    f = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+    try:
+        items = []
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            url, _, output_dir = line.partition(' ')
+            items.append((url, output_dir.strip() or default_dir))
+        return items
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def import_batch(items: list[tuple[str, str]], jobs: int = 4) -> dict[str, int]:
+    """并发导入多篇文章，已导入的跳过，返回 {'imported', 'skipped', 'failed'}"""
+    start_time = time.monotonic()
+    importer = ArticleImporter()
+    stats = {'imported': 0, 'skipped': 0, 'failed': 0}
+    stats_lock = threading.Lock()
+
+    # 同一批里重复的链接只导入一次
+    unique = {}
+    for url, output_dir in items:
+        unique.setdefault((normalize_article_url(url), output_dir), (url, output_dir))
+
+    def run(item):
+        url, output_dir = item
+        if importer.is_imported(url, output_dir):
+            print(f"⏭️  已导入，跳过: {url}")
+            outcome = 'skipped'
         else:
-            f.write("*内容获取失败，请访问原文链接查看*")
+            try:
+                filepath, saved = importer.import_article(url, output_dir)
+                _report(filepath, saved)
+                outcome = 'imported' if saved else 'failed'
+            except Exception as e:
+                print(f"❌ 导入失败 ({url}): {e}")
+                outcome = 'failed'
+        with stats_lock:
+            stats[outcome] += 1
 
-    print(f"✅ 已保存: {filepath}")
-    return filepath
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(unique) or 1))) as pool:
+            list(pool.map(run, unique.values()))
+        importer.retry_failed()
+    finally:
+        importer.close()
+
+    print(f"\n导入完成，耗时 {time.monotonic() - start_time:.1f}s：新导入 {stats['imported']}，"
+          f"跳过 {stats['skipped']}，失败 {stats['failed']}")
+    return stats
 
 
 def main():
-    parser = argparse.ArgumentParser(description="单篇微信文章下载")
-    parser.add_argument("url", help="微信文章链接")
-    parser.add_argument("--dir", dest="output_dir", default="docs/单篇文章", help="输出目录，默认 docs/单篇文章")
-    parser.add_argument("--date", dest="date", help="自定义发布日期，格式 YYYY-MM-DD，可选")
-    parser.add_argument("--title", dest="title", help="自定义标题，可选")
+    parser = argparse.ArgumentParser(description="单篇 / 批量微信文章下载")
+    parser.add_argument("urls", nargs="*", help="微信文章链接，可以有多个")
+    parser.add_argument("--dir", dest="output_dir", default=DEFAULT_DIR, help=f"输出目录，默认 {DEFAULT_DIR}")
+    parser.add_argument("--file", "-i", dest="url_file", help="链接列表文件，- 为标准输入")
+    parser.add_argument("--jobs", "-j", type=int, default=4, help="批量导入时同时下载的文章数（默认 4）")
+    parser.add_argument("--date", dest="date", help="自定义发布日期，格式 YYYY-MM-DD，可选（仅单篇）")
+    parser.add_argument("--title", dest="title", help="自定义标题，可选（仅单篇）")
     args = parser.parse_args()
 
-    download_single_article(args.url, args.output_dir, args.title, args.date)
+    items = [(url, args.output_dir) for url in args.urls]
+    if args.url_file:
+        items += read_url_list(args.url_file, args.output_dir)
+    if not items:
+        parser.print_help()
+        return
+
+    if len(items) == 1 and not args.url_file:
+        if download_single_article(items[0][0], args.output_dir, args.title, args.date) is None:
+            sys.exit(1)
+        return
+    if args.title or args.date:
+        parser.error("--title / --date 只能用于单篇导入")
+    stats = import_batch(items, jobs=args.jobs)
+    if stats['failed']:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
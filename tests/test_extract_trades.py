@@ -0,0 +1,28 @@
+import pytest
+
+from extract_trades import detect_action
+
+
+@pytest.mark.parametrize('clause, action', [
+    # 打算、条件：记为计划
+    ('英伟达100以内会加仓', '计划加仓'),
+    ('140以内会考虑再买入', '计划建仓'),
+    ('台积电190左右会开始继续减仓一部分', '计划减仓'),
+    ('后来500左右又想着加仓', '计划加仓'),
+    ('后续还会在360美元再减仓一次', '计划减仓'),
+    ('如果跌到100就加仓', '计划加仓'),
+    ('设置105为防守价补仓', '计划加仓'),
+    # 已经发生的操作
+    ('我350美元减仓5%的设置被顺利触发', '减仓'),
+    ('190左右减了一部分', '减仓'),
+    ('在120左右加仓了', '加仓'),
+    ('抓住机会加仓', '加仓'),
+    ('分别加仓', '加仓'),
+    ('不得不减仓', '减仓'),
+    # 否定
+    ('没加仓', None),
+    ('不会考虑加仓', None),
+    ('我没再买入', None),
+])
+def test_detect_action(clause, action):
+    assert detect_action(clause) == action
@@ -0,0 +1,44 @@
+import os
+import shutil
+
+import near_duplicates
+from download_wechat_articles import WeChatAlbumDownloader
+from fake_wechat_server import ARTICLE_DIRNAME, FakeWeChatServer, article_fixture_name, make_fixtures
+from near_duplicates import REFERENCE_MARKER
+from rate_limiter import RateController
+
+
+def _download(server, output_dir, dedupe=True):
+    # 模拟新进程：不复用上一次的进程内索引
+    near_duplicates._shared.clear()
+    downloader = WeChatAlbumDownloader(server.album_url(), output_dir=output_dir,
+                                       rate_controller=RateController(enabled=False), dedupe=dedupe)
+    try:
+        downloader.download_all(skip_existing=False)
+    finally:
+        downloader.get_manifest().close()
+
+
+def test_redownloading_two_duplicates_keeps_a_body(tmp_path):
+    fixture_dir = str(tmp_path / 'fixtures')
+    album = make_fixtures(fixture_dir, articles=2, images_per_article=1, image_bytes=200)
+    # 第二篇是第一篇的转载：正文完全相同
+    pages = [os.path.join(fixture_dir, ARTICLE_DIRNAME, f'{article_fixture_name(a)}.html') for a in album]
+    shutil.copyfile(pages[0], pages[1])
+
+    output_dir = str(tmp_path / 'docs' / '测试公众号')
+    with FakeWeChatServer(fixture_dir) as server:
+        # 两篇都已有完整正文（例如之前用 --no-dedupe 下载的），再重新下载几次
+        _download(server, output_dir, dedupe=False)
+        for _ in range(3):
+            _download(server, output_dir)
+            documents = []
+            for name in sorted(os.listdir(output_dir)):
+                if name.endswith('.md'):
+                    with open(os.path.join(output_dir, name), 'r', encoding='utf-8') as f:
+                        documents.append(f.read())
+            assert len(documents) == 2
+            bodies = [document for document in documents if REFERENCE_MARKER not in document]
+            assert bodies, '两篇重复文章都只剩引用'
+            # 早的一篇保留正文
+            assert REFERENCE_MARKER not in documents[0]
@@ -0,0 +1,28 @@
+from datetime import datetime, timedelta
+
+from article_manifest import ArticleManifest, STATUS_DONE
+from watch_accounts import PostingCadence, load_post_times
+
+
+def test_manifest_with_one_row_keeps_filename_history(tmp_path):
+    # 首次同步后清单里只有刚下载的一篇，更早的文章只有文件名中的日期
+    first_day = datetime(2025, 1, 1)
+    for day in range(10):
+        (tmp_path / f"{(first_day + timedelta(days=day)):%Y-%m-%d}_文章{day}.md").write_text('', encoding='utf-8')
+    latest = int((first_day + timedelta(days=9, hours=21)).timestamp())
+    manifest = ArticleManifest(str(tmp_path))
+    try:
+        manifest.upsert(('1', '1'), 'https://mp.weixin.qq.com/s?mid=1&idx=1', latest, '文章9',
+                        '2025-01-10_文章9.md', '', [], STATUS_DONE)
+    finally:
+        manifest.close()
+
+    times, exact = load_post_times(str(tmp_path))
+    assert len(times) == 10
+    assert times[-1] == latest    # 同一天以清单的精确时间为准
+    assert exact == [latest]
+
+    cadence = PostingCadence(times, exact)
+    assert cadence.typical_gap == 24 * 3600
+    assert cadence.hour_share is None    # 精确时间太少，不统计常发文时段
+    assert cadence.describe() != '历史不足'
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+常驻同步：按每个公众号的发文规律安排轮询
+
+用法示例：
+  python3 watch_accounts.py                         常驻运行，Ctrl+C 退出
+  python3 watch_accounts.py 金渐层 只做主升不做调整    只监听指定公众号
+  python3 watch_accounts.py --min-interval 300 --max-interval 21600
+  python3 watch_accounts.py --plan                  只打印各公众号的发文规律和下次轮询时间
+
+与定时任务跑 download_wechat_articles.py all 相比，进程常驻：Session、连接、下载器和限速状态一直保持，
+每个公众号按自己的节奏轮询，而不是每次把所有公众号都探测一遍：
+  - 从清单和文件名日期读取最近的发布时间（同一天两边都有时用清单的精确时间），估计两篇之间的典型间隔，
+    用清单中的精确时间估计常发文的时段
+  - 轮询间隔约为典型间隔的 1/8，刚发过文时放慢，接近下一篇的预期时间、或处于常发文时段时加快，
+    限制在 --min-interval 和 --max-interval 之间，并带随机抖动
+发现新文章时增量同步该公众号，随后更新侧边栏；同步后重新估计发文规律。
+"""
+
+import argparse
+import heapq
+import os
+import random
+import re
+import statistics
+import time
+from datetime import datetime
+
+import generate_sidebar
+from article_manifest import ArticleManifest, MANIFEST_FILENAME
+from download_wechat_articles import WECHAT_ACCOUNTS, WeChatAlbumDownloader
+from http_cache import HttpCache
+from rate_limiter import RateController
+from run_metrics import RunMetrics
+
+DEFAULT_MIN_INTERVAL = 10 * 60
+DEFAULT_MAX_INTERVAL = 6 * 3600
+DEFAULT_INTERVAL = 3600      # 历史太少、无法估计规律时的轮询间隔
+
+HISTORY_SIZE = 60            # 参与估计的最近文章数
+MIN_HISTORY = 3
+POLLS_PER_GAP = 8            # 每个典型发文间隔内轮询的次数
+HOT_HOUR_SHARE = 0.15        # 某个时段（前后各一小时）的发文占比超过此值视为常发文时段
+POLL_JITTER = 0.1
+
+# 合集列表的缓存新鲜期要短于最短轮询间隔，否则会读到旧列表
+ALBUM_CACHE_TTL = 60
+
+_FILENAME_DATE = re.compile(r'^(\d{4}-\d{2}-\d{2})_.+\.md$')
+
+
+def load_post_times(output_dir, limit=HISTORY_SIZE):
+    """
+    最近的发布时间戳（从旧到新），以及其中来自清单的精确时间
+
+    清单只记录它建立之后下载的文章（首次同步后可能只有几篇），所以和文件名中的日期合并：
+    清单里没有的日期按中午计，同一天两边都有时用清单的时间。
+    """
+    exact = []
+    if os.path.exists(os.path.join(output_dir, MANIFEST_FILENAME)):
+        manifest = ArticleManifest(output_dir)
+        try:
+            exact = manifest.recent_create_times(limit)
+        finally:
+            manifest.close()
+    covered = {datetime.fromtimestamp(ts).strftime('%Y-%m-%d') for ts in exact}
+
+    dates = set()
+    if os.path.isdir(output_dir):
+        for name in os.listdir(output_dir):
+            match = _FILENAME_DATE.match(name)
+            if match and match.group(1) not in covered:
+                dates.add(match.group(1))
+    times = [datetime.strptime(date, '%Y-%m-%d').replace(hour=12).timestamp() for date in dates]
+    times = sorted(times + list(exact))[-limit:]
+    return times, [ts for ts in exact if ts >= times[0]] if times else []
+
+
+class PostingCadence:
+    """一个公众号的发文规律：典型间隔（中位数）和各小时的发文占比"""
+
+    def __init__(self, post_times, exact_times=None):
+        self.last_post = post_times[-1] if post_times else None
+        gaps = [b - a for a, b in zip(post_times, post_times[1:]) if b > a]
+        self.typical_gap = statistics.median(gaps) if len(gaps) >= MIN_HISTORY - 1 else None
+
+        # 每小时的发文占比（计入前后各一小时，发文时间有波动）；只用精确时间，只有日期的不统计时段
+        exact_times = post_times if exact_times is None else exact_times
+        self.hour_share = None
+        if len(exact_times) >= MIN_HISTORY:
+            counts = [0] * 24
+            for ts in exact_times:
+                counts[datetime.fromtimestamp(ts).hour] += 1
+            total = len(exact_times)
+            self.hour_share = [(counts[h - 1] + counts[h] + counts[(h + 1) % 24]) / total for h in range(24)]
+
+    def next_interval(self, now, min_interval=DEFAULT_MIN_INTERVAL, max_interval=DEFAULT_MAX_INTERVAL):
+        """距下次轮询的秒数"""
+        if self.typical_gap is None:
+            interval = DEFAULT_INTERVAL
+        else:
+            interval = self.typical_gap / POLLS_PER_GAP
+            since_last = now - self.last_post
+            if since_last < self.typical_gap * 0.5:
+                interval *= 2        # 刚发过文，下一篇一般不会马上来
+            elif since_last < self.typical_gap * 1.5:
+                interval /= 2        # 接近下一篇的预期时间
+
+        if self.hour_share is not None:
+            share = self.hour_share[datetime.fromtimestamp(now).hour]
+            if share >= HOT_HOUR_SHARE:
+                interval /= 3
+            elif share == 0:
+                interval *= 1.5
+
+        interval = min(max(interval, min_interval), max_interval)
+        return interval * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)
+
+    def describe(self):
+        if self.typical_gap is None:
+            return '历史不足'
+        text = f'典型间隔 {self.typical_gap / 3600:.1f} 小时'
+        if self.hour_share is not None:
+            hot = [h for h in range(24) if self.hour_share[h] >= HOT_HOUR_SHARE]
+            if hot:
+                text += f'，常发文时段 {",".join(f"{h}点" for h in hot)}'
+        return text
+
+
+class AccountWatcher:
+    """单个公众号：常驻的下载器和发文规律"""
+
+    def __init__(self, name, http_cache, rate_controller, metrics):
+        config = WECHAT_ACCOUNTS[name]
+        self.name = name
+        self.output_dir = config['output_dir']
+        self.downloader = WeChatAlbumDownloader(config['url'], output_dir=self.output_dir, http_cache=http_cache,
+                                                metrics=metrics, rate_controller=rate_controller)
+        self.result = {'account': name, 'status': '', 'success': 0, 'fail': 0, 'skip': 0, 'retried': 0,
+                       'elapsed': 0.0, 'polls': 0}
+        self.refresh_cadence()
+
+    def refresh_cadence(self):
+        self.cadence = PostingCadence(*load_post_times(self.output_dir))
+
+    def poll(self):
+        """检查一次，有新文章时增量同步，返回新下载的文章数"""
+        start_time = time.monotonic()
+        self.result['polls'] += 1
+        self.downloader.reset_run_state()
+        has_latest, latest_article, _ = self.downloader.check_if_latest_exists()
+        downloaded = 0
+        if latest_article is None:
+            self.result['status'] = '检查失败'
+        elif has_latest:
+            self.result['status'] = '已是最新'
+        else:
+            stats = self.downloader.download_all(reverse=True, download_content=True, skip_existing=True)
+            for key in ('success', 'fail', 'skip'):
+                self.result[key] += stats[key]
+            downloaded = stats['success']
+            self.result['status'] = '有失败' if stats['fail'] else '完成'
+            self.refresh_cadence()
+        # 重试队列中到期的文章和图片（没有到期条目时只查一次清单；连列表都取不到时不重试，免得白白增加失败次数）
+        if latest_article is not None:
+            retry_stats = self.downloader.retry_failed()
+            self.result['retried'] += retry_stats['articles'] + retry_stats['images']
+            downloaded += retry_stats['articles']
+        self.result['elapsed'] += time.monotonic() - start_time
+        return downloaded
+
+
+def print_plan(cadences, min_interval, max_interval):
+    """打印各公众号的发文规律和当前的轮询间隔"""
+    now = time.time()
+    for name, cadence in cadences.items():
+        interval = cadence.next_interval(now, min_interval, max_interval)
+        print(f"  {name:<16} {cadence.describe()}；当前轮询间隔约 {interval / 60:.0f} 分钟")
+
+
+def watch(names, min_interval=DEFAULT_MIN_INTERVAL, max_interval=DEFAULT_MAX_INTERVAL, prometheus_path=None):
+    metrics = RunMetrics()
+    http_cache = HttpCache(ttls={'album': ALBUM_CACHE_TTL})
+    rate_controller = RateController()
+    watchers = {name: AccountWatcher(name, http_cache, rate_controller, metrics) for name in names}
+
+    print(f"👀 常驻同步 {len(watchers)} 个公众号（Ctrl+C 退出）")
+    print_plan({name: watcher.cadence for name, watcher in watchers.items()}, min_interval, max_interval)
+
+    # 启动时每个公众号检查一次，错开几秒
+    queue = [(time.time() + i * 5, name) for i, name in enumerate(watchers)]
+    heapq.heapify(queue)
+    try:
+        while True:
+            due, name = heapq.heappop(queue)
+            wait_time = due - time.time()
+            if wait_time > 0:
+                time.sleep(wait_time)
+
+            watcher = watchers[name]
+            print(f"\n[{datetime.now().strftime('%m-%d %H:%M:%S')}] 检查 {name}")
+            try:
+                downloaded = watcher.poll()
+            except Exception as e:
+                print(f"  检查 {name} 出错: {e}")
+                watcher.result['status'] = f'出错: {e}'
+                downloaded = 0
+            if downloaded:
+                print(f"  新文章 {downloaded} 篇，更新侧边栏")
+                generate_sidebar.generate_sidebar_config(verbose=False)
+
+            interval = watcher.cadence.next_interval(time.time(), min_interval, max_interval)
+            heapq.heappush(queue, (time.time() + interval, name))
+            print(f"  下次检查 {datetime.fromtimestamp(time.time() + interval).strftime('%m-%d %H:%M')}"
+                  f"（{interval / 60:.0f} 分钟后）")
+            if prometheus_path:
+                metrics.write_prometheus(prometheus_path, [w.result for w in watchers.values()])
+    except KeyboardInterrupt:
+        print("\n已停止")
+        for watcher in watchers.values():
+            result = watcher.result
+            print(f"  {watcher.name:<16} 检查 {result['polls']} 次，新下载 {result['success']} 篇")
+    finally:
+        for watcher in watchers.values():
+            watcher.downloader.get_manifest().close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="常驻同步：按各公众号的发文规律轮询，有新文章时同步并更新侧边栏")
+    parser.add_argument("accounts", nargs="*", help="公众号名，默认全部")
+    parser.add_argument("--min-interval", type=float, default=DEFAULT_MIN_INTERVAL, help="最短轮询间隔（秒）")
+    parser.add_argument("--max-interval", type=float, default=DEFAULT_MAX_INTERVAL, help="最长轮询间隔（秒）")
+    parser.add_argument("--plan", action="store_true", help="只打印各公众号的发文规律和轮询间隔")
+    parser.add_argument("--prometheus", help="每次检查后写出 Prometheus 文本格式指标")
+    args = parser.parse_args()
+
+    names = args.accounts or list(WECHAT_ACCOUNTS)
+    unknown = [name for name in names if name not in WECHAT_ACCOUNTS]
+    if unknown:
+        parser.error(f"未知公众号: {', '.join(unknown)}（可用: {', '.join(WECHAT_ACCOUNTS)}）")
+
+    if args.plan:
+        cadences = {name: PostingCadence(*load_post_times(WECHAT_ACCOUNTS[name]['output_dir'])) for name in names}
+        print_plan(cadences, args.min_interval, args.max_interval)
+        return
+
+    watch(names, args.min_interval, args.max_interval, args.prometheus)
+
+
+if __name__ == "__main__":
+    main()
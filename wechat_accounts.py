@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+同步的公众号配置：名称 → 合集地址和输出目录
+
+单独成模块，download_wechat_articles、check_accounts 等都从这里读取（新增公众号时改这里）。
+"""
+
+WECHAT_ACCOUNTS = {
+    '金渐层': {
+        'url': 'https://mp.weixin.qq.com/mp/appmsgalbum?__biz=MzYzOTU1NTUzNw==&action=getalbum&album_id=4319967935826853894',
+        'output_dir': 'docs/金渐层'
+    },
+    '只做主升不做调整': {
+        'url': 'https://mp.weixin.qq.com/mp/appmsgalbum?__biz=MzI2NzA2Mzg3MQ==&action=getalbum&album_id=3822716899375087617',
+        'output_dir': 'docs/只做主升不做调整'
+    },
+    '社会观察从业者': {
+        'url': 'https://mp.weixin.qq.com/mp/appmsgalbum?__biz=Mzk4ODc3ODgyOQ==&action=getalbum&album_id=4290005100099387396',
+        'output_dir': 'docs/社会观察从业者'
+    },
+    '财务自由那些事': {
+        'url': 'https://mp.weixin.qq.com/mp/appmsgalbum?action=getalbum&__biz=MzUzNjE3NzQ3Nw==&scene=1&album_id=1319255999014043648&count=3#wechat_redirect',
+        'output_dir': 'docs/财务自由那些事'
+    }
+}